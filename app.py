@@ -2,8 +2,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import os
-import glob
+from data_loader import carregar_dataset, versao_dados
+from filter_index import IndiceFiltros
+from crime_cube import carregar_cubo
+from paged_query import PermutacoesOrdenacao
+from crime_query import MotorConsultas
+from result_cache import CACHE_RESULTADOS
 
 # Configuração da página
 st.set_page_config(
@@ -13,114 +17,92 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Função corrigida para carregar dados da pasta data_splits
-@st.cache_data
-def load_data(years_range=None):
+# Número máximo de combinações (período, colunas) mantidas em memória
+MAX_DATASETS = 8
+
+def load_data(years_range=None, columns=None):
     """
     Carrega dados de Chicago crimes da pasta data_splits
     years_range: tuple (start_year, end_year) ou None para todos os dados
-    """
-    try:
-        st.info("🔍 Iniciando carregamento de dados...")
-        
-        # Verificar se a pasta data_splits existe
-        if not os.path.exists("data_splits"):
-            st.error("❌ Pasta 'data_splits' não encontrada")
-            return pd.DataFrame()
+    columns: tuple com as colunas a carregar (ver COLUNAS_PAGINAS) ou None para todas
 
-        # Encontrar todos os arquivos de crimes na pasta data_splits
-        arquivos_encontrados = glob.glob("data_splits/chicago_crimes_*.csv")
-        
-        if not arquivos_encontrados:
-            st.error("❌ Nenhum arquivo de dados encontrado na pasta 'data_splits'")
-            return pd.DataFrame()
-        
-        st.info(f"📁 Encontrados {len(arquivos_encontrados)} arquivos")
-        
-        # Barra de progresso para carregamento
-        progress_text = st.empty()
-        progress_bar = st.progress(0)
-        
-        # Carregar e combinar todos os arquivos
-        partes = []
-        total_registros = 0
-        
-        for i, arquivo in enumerate(sorted(arquivos_encontrados)):
-            try:
-                # Atualizar progresso
-                progress_bar.progress((i + 1) / len(arquivos_encontrados))
-                progress_text.text(f"📁 Carregando {os.path.basename(arquivo)}...")
-                
-                # DEBUG: Mostrar arquivo atual
-                st.sidebar.write(f"🔄 Processando: {os.path.basename(arquivo)}")
-                
-                # Tentar carregar o arquivo
-                parte = pd.read_csv(arquivo)
-                st.sidebar.write(f"✅ {len(parte):,} registros carregados")
-                
-                # DEBUG: Mostrar colunas
-                st.sidebar.write(f"📊 Colunas: {list(parte.columns)}")
-                
-                # Processar coluna de data
-                if 'Date' in parte.columns:
-                    st.sidebar.write("🕒 Convertendo coluna 'Date'...")
-                    parte['Date'] = pd.to_datetime(parte['Date'], errors='coerce')
-                elif 'Data' in parte.columns:
-                    st.sidebar.write("🕒 Convertendo coluna 'Data'...")
-                    parte['Date'] = pd.to_datetime(parte['Data'], errors='coerce')
-                    parte = parte.drop('Data', axis=1)
-                else:
-                    st.warning(f"⚠️ Nenhuma coluna de data encontrada em {os.path.basename(arquivo)}")
-                
-                # Adicionar coluna de ano se não existir
-                if 'Year' not in parte.columns and 'Date' in parte.columns:
-                    parte['Year'] = parte['Date'].dt.year
-                    st.sidebar.write(f"📅 Ano extraído: {parte['Year'].min()}-{parte['Year'].max()}")
-                
-                partes.append(parte)
-                total_registros += len(parte)
-                st.sidebar.write(f"✅ Arquivo processado com sucesso")
-                
-            except Exception as e:
-                st.error(f"❌ ERRO no arquivo {os.path.basename(arquivo)}: {str(e)}")
-                st.sidebar.error(f"❌ Falha em: {os.path.basename(arquivo)}")
-                continue
-        
-        # Limpar barra de progresso
-        progress_text.empty()
-        progress_bar.empty()
-        
-        if not partes:
-            st.error("❌ Nenhum arquivo foi carregado com sucesso")
-            return pd.DataFrame()
-        
-        # Combinar todos os dados - CORREÇÃO AQUI
-        st.sidebar.info("🔄 Combinando todos os arquivos...")
-        try:
-            df_completo = pd.concat(partes, ignore_index=True)
-            st.success(f"✅ Dataset combinado: {len(df_completo):,} registros")
-            st.sidebar.success(f"🎉 Total: {len(df_completo):,} registros")
-        except Exception as e:
-            st.error(f"❌ Erro ao combinar dados: {e}")
-            return pd.DataFrame()
-        
-        # Aplicar filtro de período se especificado
-        if years_range is not None:
-            start_year, end_year = years_range
-            if 'Year' in df_completo.columns:
-                st.sidebar.info(f"🔍 Filtrando {start_year}-{end_year}...")
-                mask = (df_completo['Year'] >= start_year) & (df_completo['Year'] <= end_year)
-                df_completo = df_completo[mask].copy()
-                st.success(f"📅 Filtrado para {start_year}-{end_year}: {len(df_completo):,} registros")
-        
-        return df_completo
-        
-    except Exception as e:
-        st.error(f"❌ Erro crítico em load_data: {e}")
-        import traceback
-        st.code(traceback.format_exc())
-        return pd.DataFrame()
+    Retorna uma visão do dataset compartilhado entre todas as sessões: os dados
+    não são copiados e, com copy-on-write, alterações feitas pela página
+    (novas colunas, atribuições) não afetam o dataset original.
+    """
+    return _dataset_compartilhado(years_range, columns)[0].copy(deep=False)
+
+# Um único DataFrame por (período, colunas) no processo, sem cópia por chamada.
+# O carregamento é silencioso: o que aconteceu fica no relatório (ver load_report)
+@st.cache_resource(max_entries=MAX_DATASETS)
+def _dataset_compartilhado(years_range=None, columns=None):
+    """Lê e combina os arquivos de data_splits; retorna (DataFrame, relatório)"""
+    return carregar_dataset(years_range, columns)
+
+def load_report(years_range=None, columns=None):
+    """Relatório estruturado do carregamento feito por load_data (arquivos, registros, bytes, tempos)"""
+    return _dataset_compartilhado(years_range, columns)[1]
+
+@st.cache_resource(max_entries=MAX_DATASETS)
+def load_filter_index(years_range=None, columns=None):
+    """Índice de bitmaps (ver filter_index.py) do dataset retornado por load_data com os mesmos argumentos"""
+    return IndiceFiltros(_dataset_compartilhado(years_range, columns)[0])
+
+@st.cache_resource(max_entries=MAX_DATASETS)
+def load_sort_orders(years_range=None, columns=None):
+    """Permutações de ordenação (ver paged_query.py) do dataset retornado por load_data com os mesmos argumentos"""
+    return PermutacoesOrdenacao(_dataset_compartilhado(years_range, columns)[0])
+
+@st.cache_resource
+def load_cube():
+    """Cubo de contagens pré-agregado (ver crime_cube.py) do período completo, compartilhado entre as sessões"""
+    return carregar_cubo()
+
+@st.cache_resource(max_entries=MAX_DATASETS)
+def load_query_engine(years_range=None, columns=None):
+    """Executor de CrimeQuery (ver crime_query.py) sobre o dataset de load_data, seu índice e o cubo"""
+    df = _dataset_compartilhado(years_range, columns)[0]
+    # Chave dos resultados no cache: os arquivos de origem e a seleção, sem referência ao DataFrame
+    # (o número de linhas separa uma carga incompleta da completa)
+    chave = (versao_dados(), years_range, columns, len(df))
+    return MotorConsultas(df, load_filter_index(years_range, columns), load_cube(), chave=chave)
+
+def mostrar_relatorio_carga(relatorio):
+    """Exibe o relatório de carregamento de load_data"""
+    for erro in relatorio['erros']:
+        st.error(f"❌ {erro}")
+
+    if relatorio['arquivos']:
+        arquivos = pd.DataFrame(relatorio['arquivos'])
+        arquivos['bytes'] = (arquivos['bytes'] / 1e6).round(1)
+        arquivos['segundos'] = arquivos['segundos'].round(3)
+        arquivos = arquivos.rename(columns={
+            'arquivo': 'Arquivo', 'origem': 'Origem', 'registros': 'Registros',
+            'bytes': 'Tamanho (MB)', 'segundos': 'Tempo (s)'
+        })
+        st.dataframe(arquivos, width='stretch', hide_index=True)
+
+    col_rel1, col_rel2, col_rel3 = st.columns(3)
+    col_rel1.metric("Registros", f"{relatorio['registros']:,}")
+    col_rel2.metric("Memória", f"{relatorio['memoria'] / 1e6:,.1f} MB",
+                    f"{(relatorio['memoria'] - relatorio['memoria_bruta']) / 1e6:,.1f} MB vs. sem esquema",
+                    delta_color="inverse")
+    col_rel3.metric("Tempo de Carga", f"{relatorio['segundos']:.2f} s")
     
+def mostrar_cache_resultados():
+    """Painel de diagnóstico do cache de resultados compartilhado (ver result_cache.py)"""
+    estatisticas = CACHE_RESULTADOS.estatisticas()
+    col_cache1, col_cache2, col_cache3, col_cache4 = st.columns(4)
+    col_cache1.metric("Entradas", f"{estatisticas['entradas']:,}")
+    col_cache2.metric("Memória", f"{estatisticas['bytes_usados'] / 1e6:,.1f} MB",
+                      f"de {estatisticas['orcamento_bytes'] / 1e6:,.0f} MB", delta_color="off")
+    col_cache3.metric("Acertos / Falhas", f"{estatisticas['acertos']:,} / {estatisticas['falhas']:,}",
+                      f"{estatisticas['taxa_acerto']:.0%} de acerto", delta_color="off")
+    col_cache4.metric("Descartes", f"{estatisticas['descartes']:,}")
+    if st.button("🗑️ Limpar cache de resultados"):
+        CACHE_RESULTADOS.limpar()
+        st.rerun()
+
 # Título principal
 st.title("🔍 Dashboard para Estudo dos Crimes em Chicago")
 st.markdown("### Selecione uma das ferramentas abaixo para explorar os dados de criminalidade")
@@ -148,17 +130,18 @@ selected_period_label = st.sidebar.selectbox(
 selected_period = period_options[selected_period_label]
 
 
-# Carregar dados uma vez para toda a aplicação
-if 'df' not in st.session_state:
-    with st.spinner("Carregando dados de 2014-2024..."):
-        st.session_state.df = load_data(selected_period)
+# A sessão guarda apenas o período escolhido; os dados ficam no dataset compartilhado
+if 'periodo' not in st.session_state:
+    st.session_state.periodo = selected_period
 
 # Atualizar dados se o período mudar
 if st.sidebar.button("🔄 Atualizar Dados"):
-    with st.spinner("Atualizando dados..."):
-        st.session_state.df = load_data(selected_period)
+    st.session_state.periodo = selected_period
     st.rerun()
 
+with st.spinner("Carregando dados..."):
+    df = load_data(st.session_state.periodo)
+
 # Criar os 4 cards interativos
 col1, col2, col3, col4 = st.columns(4)
 
@@ -190,16 +173,22 @@ with col4:
 st.markdown("---")
 st.markdown("### 📋 Informações dos Dados Carregados")
 
-if not st.session_state.df.empty:
+with st.expander("⏱️ Relatório de Carregamento"):
+    mostrar_relatorio_carga(load_report(st.session_state.periodo))
+
+with st.expander("🧠 Cache de Resultados"):
+    mostrar_cache_resultados()
+
+if not df.empty:
     col_info1, col_info2, col_info3, col_info4 = st.columns(4)
     
     with col_info1:
-        st.metric("Total de Registros", f"{len(st.session_state.df):,}")
+        st.metric("Total de Registros", f"{len(df):,}")
     
     with col_info2:
-        if 'Date' in st.session_state.df.columns and not st.session_state.df['Date'].isna().all():
-            min_date = st.session_state.df['Date'].min()
-            max_date = st.session_state.df['Date'].max()
+        if 'Date' in df.columns and not df['Date'].isna().all():
+            min_date = df['Date'].min()
+            max_date = df['Date'].max()
             if pd.notna(min_date) and pd.notna(max_date):
                 date_range = f"{min_date.strftime('%Y')} a {max_date.strftime('%Y')}"
                 st.metric("Período", date_range)
@@ -209,15 +198,15 @@ if not st.session_state.df.empty:
             st.metric("Período", "Não disponível")
     
     with col_info3:
-        if 'Primary Type' in st.session_state.df.columns:
-            crime_types = st.session_state.df['Primary Type'].nunique()
+        if 'Primary Type' in df.columns:
+            crime_types = df['Primary Type'].nunique()
             st.metric("Tipos de Crime", crime_types)
         else:
             st.metric("Tipos de Crime", "N/A")
     
     with col_info4:
-        if 'District' in st.session_state.df.columns:
-            districts = st.session_state.df['District'].nunique()
+        if 'District' in df.columns:
+            districts = df['District'].nunique()
             st.metric("Distritos", districts)
         else:
             st.metric("Distritos", "N/A")
@@ -240,7 +229,6 @@ st.sidebar.success("✅ Aplicação carregada com sucesso!")
 
 # Mostrar informações dos dados no sidebar
 with st.sidebar.expander("ℹ️ Detalhes dos Dados Carregados"):
-    df = st.session_state.df
     if not df.empty:
         st.write(f"📈 **Total de registros**: {len(df):,}")
         
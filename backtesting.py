@@ -0,0 +1,99 @@
+# backtesting.py - Avaliação dos modelos da Predição com origem móvel (rolling origin)
+"""
+Em vez de um único corte treino/teste, cada fold treina até um ano e testa no
+ano seguinte, avançando a origem um ano por fold (2014-2024 dá até 10 folds).
+Os folds rodam em paralelo no pool da previsão em lote (ver batch_forecast.py)
+e passam pelo repositório de modelos: um fold com os mesmos dados e parâmetros
+de uma execução anterior (da página, do lote ou de outro backtest) é apenas lido.
+
+No Prophet, folds consecutivos formam cadeias: cada fold da cadeia espera o
+anterior e parte dos parâmetros dele (warm start, ver forecasting.prever_prophet).
+No Random Forest os folds são independentes: o warm start só acrescenta árvores
+a um modelo dos mesmos dados, e janelas de treino diferentes não reaproveitam nada.
+"""
+import math
+import pandas as pd
+from crime_cube import ARQUIVO_CUBO, carregar_cubo
+from data_loader import derivado_atualizado
+from forecasting import metricas_previsao
+from batch_forecast import PARAMETROS_PADRAO, executar_cadeias, montar_tabelas
+from config import BATCH_TIMEOUT, BATCH_WORKERS
+
+# Janela de treino: cresce a cada fold (desde o primeiro ano) ou desliza com tamanho fixo
+ESQUEMAS = ('Expansiva', 'Deslizante')
+METRICAS_BACKTEST = ['mape', 'mae', 'rmse']
+
+
+def folds_origem_movel(anos, janela_treino=3, esquema='Expansiva'):
+    """
+    Folds (anos de treino, ano de teste), um por ano de teste depois dos `janela_treino`
+    primeiros anos. Expansiva: treino desde o primeiro ano; Deslizante: os
+    `janela_treino` anos anteriores ao de teste.
+    """
+    if esquema not in ESQUEMAS:
+        raise ValueError(f"Esquema desconhecido: {esquema}")
+    anos = sorted(int(ano) for ano in anos)
+    folds = []
+    for posicao in range(janela_treino, len(anos)):
+        inicio = 0 if esquema == 'Expansiva' else posicao - janela_treino
+        folds.append((anos[inicio:posicao], anos[posicao]))
+    return folds
+
+
+def cadeias_folds(folds, modelo, workers):
+    """
+    Folds consecutivos agrupados para rodar em sequência. Prophet: até `workers` cadeias
+    de pelo menos dois folds (metade ou mais dos folds parte do anterior, sem abrir mão
+    do paralelismo); Random Forest: um fold por cadeia.
+    """
+    if modelo != 'Prophet' or len(folds) < 2:
+        return [[fold] for fold in folds]
+    n_cadeias = max(1, min(workers, len(folds) // 2))
+    tamanho = math.ceil(len(folds) / n_cadeias)
+    return [folds[inicio:inicio + tamanho] for inicio in range(0, len(folds), tamanho)]
+
+
+def resumir_backtest(metricas, previsoes):
+    """
+    Métricas agregadas do backtest: média e desvio padrão entre os folds concluídos
+    e as métricas calculadas sobre todos os dias de teste juntos.
+    """
+    concluidos = metricas[metricas['status'] == 'ok']
+    resumo = {}
+    if not concluidos.empty:
+        resumo['Média dos folds'] = concluidos[METRICAS_BACKTEST].mean()
+        resumo['Desvio entre folds'] = concluidos[METRICAS_BACKTEST].std()
+    validos = previsoes.dropna(subset=['y', 'yhat'])
+    if not validos.empty:
+        resumo['Todos os dias'] = pd.Series(metricas_previsao(validos['y'], validos['yhat']))[METRICAS_BACKTEST]
+    return pd.DataFrame(resumo).T[METRICAS_BACKTEST] if resumo else pd.DataFrame(columns=METRICAS_BACKTEST)
+
+
+def executar_backtest(modelo, crime, anos, janela_treino=3, esquema='Expansiva', parametros=None,
+                      distrito=None, workers=None, timeout=None, progresso=None):
+    """
+    Backtest de origem móvel de um modelo ('Prophet' ou 'Random Forest') para um tipo de crime.
+    Folds do Prophet rodam em cadeias com warm start (ver cadeias_folds).
+    progresso(concluídos, total, linha): chamado a cada fold concluído.
+    Retorna (métricas por fold, previsões diárias de todos os folds, resumo agregado).
+    """
+    folds = folds_origem_movel(anos, janela_treino, esquema)
+    if not folds:
+        raise ValueError(f"São necessários mais de {janela_treino} anos para o backtest")
+
+    parametros = {**PARAMETROS_PADRAO[modelo], **(parametros or {})}
+    timeout = BATCH_TIMEOUT if timeout is None else timeout
+
+    # Os processos leem o cubo do disco: garante que ele esteja gravado e atualizado
+    if not derivado_atualizado(ARQUIVO_CUBO):
+        carregar_cubo()
+
+    workers = workers or BATCH_WORKERS
+    linhas, previsoes = executar_cadeias([
+        [{'modelo': modelo, 'crime': crime, 'distrito': distrito, 'train_years': train_years,
+          'test_year': test_year, 'parametros': parametros, 'timeout': timeout}
+         for train_years, test_year in cadeia]
+        for cadeia in cadeias_folds(folds, modelo, workers)
+    ], workers, progresso)
+    metricas, previsoes = montar_tabelas(linhas, previsoes, ['ano_teste'])
+    return metricas, previsoes, resumir_backtest(metricas, previsoes)
@@ -0,0 +1,318 @@
+# batch_forecast.py - Previsão em lote de todos os tipos de crime (e distritos) em paralelo
+"""
+Treina o Prophet ou o Random Forest da página de Predição para cada tipo de
+crime (e, opcionalmente, para cada tipo em cada distrito) em um pool de
+processos, gravando a tabela de métricas e as previsões diárias em Parquet.
+
+Uso:
+    python batch_forecast.py --modelo prophet --treino 2020 2023 --teste 2024 --por-distrito
+
+Os modelos passam pelo repositório de modelos (ver model_store.py): combinações
+já treinadas, no lote ou na página, são apenas lidas.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import warnings
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from config import BATCH_WORKERS, BATCH_TIMEOUT, BATCH_OUTPUT_DIR
+from crime_cube import carregar_cubo
+from crime_query import CrimeQuery, MotorConsultas
+from forecasting import (dividir_treino_teste, preparar_features_rf, prever_prophet, prever_random_forest,
+                         metricas_previsao)
+from model_store import MODELOS
+
+MODELOS_LOTE = ('Prophet', 'Random Forest')
+
+# Parâmetros padrão de cada modelo (os mesmos da barra lateral da página)
+PARAMETROS_PADRAO = {
+    'Prophet': {'seasonality_mode': 'multiplicative', 'include_holidays': True},
+    'Random Forest': {'n_estimators': 100, 'lags_dias': 14},
+}
+
+# Cubo lido uma vez por processo do pool
+_cubo_processo = None
+
+
+def _iniciar_processo():
+    """Silencia os logs do Stan e os avisos nos processos do pool"""
+    warnings.filterwarnings('ignore')
+    for nome in ('cmdstanpy', 'prophet'):
+        logger = logging.getLogger(nome)
+        # Com um handler já presente, o cmdstanpy não instala o seu (que mostra o INFO de cada ajuste)
+        logger.addHandler(logging.NullHandler())
+        logger.setLevel(logging.WARNING)
+
+
+def _cubo():
+    global _cubo_processo
+    if _cubo_processo is None:
+        _cubo_processo = carregar_cubo()
+    return _cubo_processo
+
+
+class TempoEsgotado(Exception):
+    """Modelo passou do tempo máximo. Não é um TimeoutError (OSError): o cmdstanpy o trocaria por
+    RuntimeError e o Prophet recomeçaria a otimização com outro algoritmo."""
+
+
+@contextmanager
+def _limite_tempo(segundos):
+    """TempoEsgotado se o bloco passar de `segundos` (via SIGALRM; sem limite onde não há o sinal)"""
+    if not segundos or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def estourou(signum, frame):
+        raise TempoEsgotado(f"modelo passou de {segundos} s")
+
+    anterior = signal.signal(signal.SIGALRM, estourou)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+
+def _identificacao(modelo, crime, distrito, train_years, test_year, **_):
+    """Colunas que identificam um modelo na tabela de métricas"""
+    return {'modelo': modelo, 'crime': crime, 'distrito': distrito,
+            'treino_inicio': min(train_years), 'treino_fim': max(train_years), 'ano_teste': test_year}
+
+
+def prever_tarefa(modelo, crime, distrito, train_years, test_year, parametros, timeout=None):
+    """
+    Série diária, treino e previsão de um tipo de crime (distrito None = cidade toda).
+    Retorna (linha de métricas, previsões diárias ou None se falhou).
+    """
+    linha = {**_identificacao(modelo, crime, distrito, train_years, test_year), 'status': 'ok', 'erro': None}
+    previsoes = None
+    inicio = time.perf_counter()
+    try:
+        with _limite_tempo(timeout):
+            consulta = CrimeQuery(types=[crime], years=[*train_years, test_year],
+                                  districts=None if distrito is None else [distrito])
+            dados_diarios = MotorConsultas(None, cubo=_cubo()).serie_diaria(consulta, preencher=True)
+            if dados_diarios.empty:
+                raise ValueError("sem ocorrências no período")
+            dados_treino, dados_teste, data_corte = dividir_treino_teste(dados_diarios, train_years)
+            if dados_teste.empty:
+                raise ValueError(f"sem dados em {test_year}")
+
+            if modelo == 'Prophet':
+                # O SIGALRM só interrompe o Python: o CmdStan recebe o mesmo prazo e é
+                # encerrado pelo cmdstanpy ao estourar, em vez de seguir rodando sozinho
+                resultados, _, info = prever_prophet(dados_treino, dados_teste, repositorio=MODELOS,
+                                                     prazo=inicio + timeout if timeout else None,
+                                                     crime=crime, distrito=distrito, **parametros)
+            else:
+                train, test, _ = preparar_features_rf(dados_treino, dados_teste, data_corte, parametros['lags_dias'])
+                if train.vazio or test.vazio:
+                    raise ValueError("dados insuficientes após os lags")
+                # Uma thread por modelo: o paralelismo é entre os processos do pool
+                resultados, _, info = prever_random_forest(train, test, repositorio=MODELOS, n_jobs=1,
+                                                           crime=crime, distrito=distrito, **parametros)
+
+        validos = resultados.dropna(subset=['y', 'yhat'])
+        linha.update(metricas_previsao(validos['y'], validos['yhat']))
+        linha.update(dias_treino=len(dados_treino), dias_teste=len(validos), do_repositorio=info['do_repositorio'],
+                     segundos_economizados=info.get('segundos_economizados'),
+                     economia_estimada=info.get('economia_estimada'))
+        previsoes = resultados.assign(modelo=modelo, crime=crime, distrito=distrito, ano_teste=test_year)
+    except (TempoEsgotado, TimeoutError) as e:
+        linha.update(status='timeout', erro=str(e))
+    except Exception as e:
+        linha.update(status='erro', erro=str(e))
+    linha['segundos'] = time.perf_counter() - inicio
+    return linha, previsoes
+
+
+def tarefas_lote(cubo, tipos=None, por_distrito=False):
+    """(tipo, distrito) de cada modelo: a cidade toda para cada tipo e, se pedido, cada distrito"""
+    tipos = cubo.valores('Primary Type') if tipos is None else list(tipos)
+    tarefas = [(crime, None) for crime in tipos]
+    if por_distrito:
+        tarefas += [(crime, distrito) for crime in tipos for distrito in cubo.valores('District')]
+    return tarefas
+
+
+def prever_lote(modelo, train_years, test_year, parametros=None, tipos=None, por_distrito=False,
+                workers=None, timeout=None, progresso=None, cubo=None):
+    """
+    Previsões de todos os tipos de crime (ver tarefas_lote) em um pool de processos.
+    timeout: segundos por modelo (padrão config.BATCH_TIMEOUT; 0 = sem limite).
+    progresso(concluídas, total, linha): chamado a cada modelo concluído.
+    Retorna (métricas, previsões): uma linha por modelo e uma linha por dia de teste.
+    """
+    parametros = {**PARAMETROS_PADRAO[modelo], **(parametros or {})}
+    train_years = [int(ano) for ano in train_years]
+    test_year = int(test_year)
+    timeout = BATCH_TIMEOUT if timeout is None else timeout
+
+    # Garante o cubo persistido antes de abrir os processos (cada um o lê do disco)
+    tarefas = tarefas_lote(cubo if cubo is not None else carregar_cubo(), tipos, por_distrito)
+
+    linhas, previsoes = executar_tarefas([
+        {'modelo': modelo, 'crime': crime, 'distrito': distrito, 'train_years': train_years,
+         'test_year': test_year, 'parametros': parametros, 'timeout': timeout}
+        for crime, distrito in tarefas
+    ], workers, progresso)
+    return montar_tabelas(linhas, previsoes, ['crime', 'distrito'])
+
+
+def executar_tarefas(tarefas, workers=None, progresso=None):
+    """
+    Roda prever_tarefa com cada dict de argumentos em um pool de processos.
+    progresso(concluídas, total, linha): chamado a cada modelo concluído.
+    Retorna (linhas de métricas, previsões), na ordem em que os modelos terminaram.
+    """
+    return executar_cadeias([[tarefa] for tarefa in tarefas], workers, progresso)
+
+
+def executar_cadeias(cadeias, workers=None, progresso=None):
+    """
+    Como executar_tarefas, para listas de tarefas (cadeias): as cadeias rodam em paralelo
+    e as tarefas de uma cadeia em sequência, cada uma enviada ao pool quando a anterior
+    termina (e pode partir do modelo que ela gravou no repositório).
+    """
+    linhas = []
+    previsoes = []
+    total = sum(len(cadeia) for cadeia in cadeias)
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or BATCH_WORKERS, mp_context=contexto,
+                             initializer=_iniciar_processo) as executor:
+        pendentes = {}
+
+        def registrar(linha, previsao):
+            linhas.append(linha)
+            if previsao is not None:
+                previsoes.append(previsao)
+            if progresso is not None:
+                progresso(len(linhas), total, linha)
+
+        def enviar(cadeia, posicao):
+            try:
+                pendentes[executor.submit(prever_tarefa, **cadeia[posicao])] = (cadeia, posicao)
+            except (BrokenProcessPool, RuntimeError) as e:
+                # Pool quebrado por um processo que morreu: o resto da cadeia não roda mais
+                for tarefa in cadeia[posicao:]:
+                    registrar({**_identificacao(**tarefa), 'status': 'erro', 'erro': str(e)}, None)
+
+        for cadeia in cadeias:
+            if cadeia:
+                enviar(cadeia, 0)
+        while pendentes:
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                cadeia, posicao = pendentes.pop(futuro)
+                try:
+                    linha, previsao = futuro.result()
+                except Exception as e:
+                    # Processo encerrado à força (memória, sinal) quebra o pool: esta e as demais tarefas
+                    # pendentes falham aqui e as próximas de cada cadeia em enviar; o que já terminou fica
+                    linha, previsao = {**_identificacao(**cadeia[posicao]), 'status': 'erro', 'erro': str(e)}, None
+                registrar(linha, previsao)
+                if posicao + 1 < len(cadeia):
+                    enviar(cadeia, posicao + 1)
+    return linhas, previsoes
+
+
+def rotulo_economia(estimada):
+    """
+    Como apresentar o tempo economizado pelo warm start: "medido" só se todos os modelos
+    o mediram (Random Forest); estimado (Prophet) ou desconhecido vira "estimativa".
+    estimada: flag economia_estimada de um modelo ou a coluna dela na tabela de métricas.
+    """
+    valores = list(estimada) if isinstance(estimada, pd.Series) else [estimada]
+    return "medido" if all(valor in (False,) for valor in valores) else "estimativa"
+
+
+def montar_tabelas(linhas, previsoes, ordenar_por):
+    """Tabelas de métricas (uma linha por modelo) e de previsões (uma linha por dia de teste)"""
+    identificacao = ['modelo', 'crime', 'distrito', 'ano_teste']
+    metricas = pd.DataFrame(linhas)
+    metricas['distrito'] = metricas['distrito'].astype('Int16')
+    metricas = metricas.sort_values(ordenar_por, na_position='first', ignore_index=True)
+
+    if previsoes:
+        previsoes = pd.concat(previsoes, ignore_index=True)
+        previsoes['distrito'] = previsoes['distrito'].astype('Int16')
+        previsoes = previsoes[identificacao + [coluna for coluna in previsoes.columns if coluna not in identificacao]]
+    else:
+        previsoes = pd.DataFrame(columns=identificacao + ['ds', 'y', 'yhat'])
+    return metricas, previsoes
+
+
+def salvar_lote(metricas, previsoes, modelo, pasta=None):
+    """Grava metricas.parquet e previsoes.parquet em uma pasta nova do lote; retorna a pasta"""
+    destino = os.path.join(pasta or BATCH_OUTPUT_DIR,
+                           f"lote_{time.strftime('%Y%m%d_%H%M%S')}_{modelo.lower().replace(' ', '_')}")
+    os.makedirs(destino, exist_ok=True)
+    metricas.to_parquet(os.path.join(destino, 'metricas.parquet'), index=False)
+    previsoes.to_parquet(os.path.join(destino, 'previsoes.parquet'), index=False)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modelo', choices=['prophet', 'random_forest'], default='prophet')
+    parser.add_argument('--treino', nargs=2, type=int, metavar=('INICIO', 'FIM'),
+                        help="Anos de treino (padrão: os 3 anos anteriores ao de teste)")
+    parser.add_argument('--teste', type=int, help="Ano de teste (padrão: último ano dos dados)")
+    parser.add_argument('--tipos', nargs='+', help="Tipos de crime (padrão: todos)")
+    parser.add_argument('--por-distrito', action='store_true', help="Também um modelo por tipo em cada distrito")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Processos em paralelo")
+    parser.add_argument('--timeout', type=int, default=BATCH_TIMEOUT, help="Segundos por modelo (0 = sem limite)")
+    parser.add_argument('--saida', default=BATCH_OUTPUT_DIR, help="Pasta onde o lote é gravado")
+    parser.add_argument('--sazonalidade', choices=['multiplicative', 'additive'], default='multiplicative')
+    parser.add_argument('--sem-feriados', action='store_true', help="Prophet sem os feriados dos EUA")
+    parser.add_argument('--arvores', type=int, default=100, help="Árvores do Random Forest")
+    parser.add_argument('--lags', type=int, default=14, help="Lags (dias) do Random Forest")
+    args = parser.parse_args()
+
+    modelo = 'Prophet' if args.modelo == 'prophet' else 'Random Forest'
+    if modelo == 'Prophet':
+        parametros = {'seasonality_mode': args.sazonalidade, 'include_holidays': not args.sem_feriados}
+    else:
+        parametros = {'n_estimators': args.arvores, 'lags_dias': args.lags}
+
+    cubo = carregar_cubo()
+    anos = cubo.valores('Year')
+    test_year = args.teste or anos[-1]
+    train_years = list(range(args.treino[0], args.treino[1] + 1)) if args.treino else \
+        [ano for ano in anos if test_year - 3 <= ano < test_year]
+    if not train_years:
+        parser.error("nenhum ano de treino antes do ano de teste")
+
+    def progresso(concluidas, total, linha):
+        local = 'cidade' if linha['distrito'] is None else f"distrito {linha['distrito']}"
+        detalhe = f"MAPE {linha['mape']:.1f}%" if linha['status'] == 'ok' else linha['erro']
+        print(f"[{concluidas}/{total}] {linha['crime']} ({local}): {linha['status']} - {detalhe}", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    metricas, previsoes = prever_lote(modelo, train_years, test_year, parametros, tipos=args.tipos,
+                                      por_distrito=args.por_distrito, workers=args.workers,
+                                      timeout=args.timeout, progresso=progresso, cubo=cubo)
+    destino = salvar_lote(metricas, previsoes, modelo, args.saida)
+
+    falhas = int((metricas['status'] != 'ok').sum())
+    print(f"{len(metricas)} modelos ({falhas} com falha) em {time.perf_counter() - inicio:.1f} s -> {destino}")
+    aquecidos = metricas['segundos_economizados'].dropna() if 'segundos_economizados' in metricas else []
+    if len(aquecidos):
+        print(f"{len(aquecidos)} com warm start: ~{aquecidos.sum():.1f} s economizados "
+              f"({rotulo_economia(metricas.loc[aquecidos.index, 'economia_estimada'])})")
+    return 1 if falhas == len(metricas) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
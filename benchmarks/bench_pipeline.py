@@ -0,0 +1,343 @@
+# bench_pipeline.py - Benchmark do pipeline carga -> filtro -> agregação -> renderização
+"""
+Gera partições sintéticas no formato dos CSVs de Chicago (chicago_crimes_AAAA_AAAA.csv)
+e mede, para cada tamanho, o tempo e o pico de memória de cada etapa que as
+páginas executam: carga (fria, a partir do CSV, e quente, a partir do cache
+Parquet), índice e cubo, a cadeia de filtros de cada página, as séries
+temporais, as features do Random Forest, o DBSCAN e o mapa folium.
+
+Uso:
+    python benchmarks/bench_pipeline.py --linhas 1M,10M,50M --saida resultados.json
+
+Sem --linhas, roda os três tamanhos acima; ao fim, uma tabela com o tempo de
+cada etapa por tamanho vai para a saída de erros (o JSON traz o detalhe).
+
+Cada tamanho roda em um processo separado (DATA_DIR é lido na importação e o
+pico de RSS é por processo). Os dados gerados ficam em --pasta e são
+reaproveitados entre execuções com o mesmo tamanho; o cache (.cache) é sempre
+apagado antes da carga fria. O pico de memória de cada etapa é medido com
+tracemalloc (alocações do Python e do numpy; buffers do Arrow aparecem em
+arrow_mb); --sem-tracemalloc mede só os tempos, sem o custo do rastreamento.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ANOS = range(2014, 2025)
+PERIODOS = [(2014, 2015), (2016, 2017), (2018, 2019), (2020, 2021), (2022, 2023), (2024, 2024)]
+
+# Distribuição aproximada dos tipos mais comuns no dataset real
+TIPOS_CRIME = {
+    'THEFT': 0.22, 'BATTERY': 0.18, 'CRIMINAL DAMAGE': 0.11, 'ASSAULT': 0.08,
+    'DECEPTIVE PRACTICE': 0.07, 'OTHER OFFENSE': 0.06, 'NARCOTICS': 0.06, 'BURGLARY': 0.05,
+    'MOTOR VEHICLE THEFT': 0.05, 'ROBBERY': 0.04, 'CRIMINAL TRESPASS': 0.03,
+    'WEAPONS VIOLATION': 0.03, 'HOMICIDE': 0.02,
+}
+DESCRICOES = ['SIMPLE', '$500 AND UNDER', 'OVER $500', 'DOMESTIC BATTERY SIMPLE', 'TO VEHICLE', 'RETAIL THEFT']
+LOCAIS = ['STREET', 'RESIDENCE', 'APARTMENT', 'SIDEWALK', 'PARKING LOT/GARAGE(NON.RESID.)', 'SMALL RETAIL STORE']
+DISTRITOS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 15, 16, 17, 18, 19, 20, 22, 24, 25, 31]
+
+LINHAS_POR_BLOCO = 1_000_000
+
+
+TAMANHOS_PADRAO = ['1M', '10M', '50M']
+
+
+def ler_tamanho(texto):
+    """'1M', '500k' ou '2000000' -> número de linhas"""
+    texto = texto.strip().lower().replace('_', '')
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(texto[-1], 1)
+    return int(float(texto.rstrip('km')) * multiplicador)
+
+
+def commit_atual():
+    """Hash do commit do repositório (com sufixo -dirty se houver alterações)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RAIZ,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if alterado else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Geração dos dados ---
+
+def gerar_bloco(rng, ano, n, primeiro_id):
+    """n ocorrências sintéticas de um ano, com as colunas e formatos do export de Chicago"""
+    inicio = pd.Timestamp(f"{ano}-01-01").value // 10**9
+    segundos = inicio + rng.integers(0, (366 if ano % 4 == 0 else 365) * 86400, n)
+    datas = pd.to_datetime(segundos, unit='s')
+
+    distritos = rng.choice(DISTRITOS, n).astype(float)
+    distritos[rng.random(n) < 0.001] = np.nan
+    latitudes = rng.normal(41.84, 0.08, n)
+    longitudes = rng.normal(-87.67, 0.06, n)
+    sem_coordenadas = rng.random(n) < 0.01
+    latitudes[sem_coordenadas] = np.nan
+    longitudes[sem_coordenadas] = np.nan
+
+    ids = np.arange(primeiro_id, primeiro_id + n)
+    return pd.DataFrame({
+        'ID': ids,
+        'Case Number': 'J' + pd.Series(ids).astype(str),
+        'Date': datas.strftime('%m/%d/%Y %I:%M:%S %p'),
+        'Block': '001XX W MADISON ST',
+        'IUCR': '0820',
+        'Primary Type': rng.choice(list(TIPOS_CRIME), n, p=np.array(list(TIPOS_CRIME.values())) / sum(TIPOS_CRIME.values())),
+        'Description': rng.choice(DESCRICOES, n),
+        'Location Description': rng.choice(LOCAIS, n),
+        'Arrest': rng.random(n) < 0.2,
+        'Domestic': rng.random(n) < 0.15,
+        'Beat': rng.integers(111, 2535, n),
+        'District': distritos,
+        'Ward': rng.integers(1, 51, n).astype(float),
+        'Community Area': rng.integers(1, 78, n).astype(float),
+        'FBI Code': '06',
+        'X Coordinate': 1.17e6,
+        'Y Coordinate': 1.9e6,
+        'Year': ano,
+        'Updated On': '01/01/2025 12:00:00 AM',
+        'Latitude': latitudes,
+        'Longitude': longitudes,
+        'Location': '(41.8, -87.6)',
+    })
+
+
+def gerar_dados(pasta, linhas, semente=42):
+    """Grava as partições de 2 anos com `linhas` ocorrências no total (mesmo número por ano)"""
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    por_ano = np.full(len(ANOS), linhas // len(ANOS))
+    por_ano[:linhas % len(ANOS)] += 1
+    linhas_ano = dict(zip(ANOS, por_ano))
+
+    proximo_id = 10_000_000
+    for inicio, fim in PERIODOS:
+        destino = os.path.join(pasta, f"chicago_crimes_{inicio}_{fim}.csv")
+        temporario = f"{destino}.tmp"
+        cabecalho = True
+        for ano in range(inicio, fim + 1):
+            restantes = int(linhas_ano[ano])
+            while restantes > 0:
+                n = min(restantes, LINHAS_POR_BLOCO)
+                gerar_bloco(rng, ano, n, proximo_id).to_csv(
+                    temporario, mode='w' if cabecalho else 'a', header=cabecalho, index=False)
+                cabecalho = False
+                proximo_id += n
+                restantes -= n
+        os.replace(temporario, destino)
+
+    with open(os.path.join(pasta, 'LINHAS'), 'w') as arquivo:
+        arquivo.write(str(linhas))
+
+
+def dados_prontos(pasta, linhas):
+    """Os dados de `pasta` foram gerados por completo com o mesmo número de linhas"""
+    marcador = os.path.join(pasta, 'LINHAS')
+    if not os.path.exists(marcador):
+        return False
+    with open(marcador) as arquivo:
+        return arquivo.read().strip() == str(linhas)
+
+
+# --- Medição ---
+
+class Medidor:
+    """Tempo, pico de memória (tracemalloc) e RSS máximo de cada etapa"""
+
+    def __init__(self, rastrear_memoria=True):
+        self.rastrear_memoria = rastrear_memoria
+        self.etapas = {}
+
+    def medir(self, nome, funcao):
+        import pyarrow as pa
+        from result_cache import CACHE_RESULTADOS
+
+        # Cada etapa começa com o cache de resultados vazio (mede o cálculo, não o acerto)
+        CACHE_RESULTADOS.limpar()
+        if self.rastrear_memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao()
+        finally:
+            segundos = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1] if self.rastrear_memoria else None
+            if self.rastrear_memoria:
+                tracemalloc.stop()
+
+        self.etapas[nome] = {
+            'segundos': round(segundos, 4),
+            'pico_mb': round(pico / 2**20, 1) if pico is not None else None,
+            'arrow_mb': round(pa.total_allocated_bytes() / 2**20, 1),
+            'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        print(f"  {nome:<28} {segundos:9.3f} s", file=sys.stderr)
+        return resultado
+
+
+def executar_pipeline(pasta, linhas, rastrear_memoria=True):
+    """Roda as etapas das páginas sobre os dados de `pasta` (DATA_DIR já deve apontar para ela)"""
+    sys.path.insert(0, RAIZ)
+    from data_loader import CACHE_DIR, carregar_dataset
+    from filter_index import IndiceFiltros
+    from crime_cube import carregar_cubo
+    from crime_query import CrimeQuery, MotorConsultas
+    from paged_query import ConsultaPaginada, PermutacoesOrdenacao
+    from timeseries import GRANULARIDADES, agregar_serie
+    from stats_summary import resumo_diario
+    from forecasting import matriz_features
+    from spatial import (MAX_PONTOS_DBSCAN, amostrar_pontos, mapa_base, executar_dbscan,
+                         adicionar_mapa_calor, adicionar_pontos)
+
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    medidor = Medidor(rastrear_memoria)
+    anos = list(ANOS)
+
+    # Carga: CSV -> cache Parquet, depois a leitura do cache
+    medidor.medir('carga_fria', lambda: carregar_dataset((2014, 2024)))
+    df, _ = medidor.medir('carga_quente', lambda: carregar_dataset((2014, 2024)))
+    indice = medidor.medir('indice_filtros', lambda: IndiceFiltros(df))
+    cubo = medidor.medir('cubo_construcao', carregar_cubo)
+    ordenacoes = PermutacoesOrdenacao(df)
+    motor = MotorConsultas(df, indice, cubo)
+
+    # Página 01: filtros padrão mais período do dia e distritos, primeira página ordenada
+    consulta_01 = CrimeQuery(years=[2022, 2023, 2024], types=['THEFT', 'BATTERY', 'ASSAULT'],
+                             hours=range(18, 24), districts=DISTRITOS[:12])
+
+    def pagina_01():
+        tabela = ConsultaPaginada(df, motor.linhas(consulta_01), ordenacoes)
+        return (tabela, motor.contar_por(consulta_01, 'Primary Type'),
+                motor.taxa_prisao(consulta_01), motor.dias_distintos(consulta_01))
+    tabela_01, *_ = medidor.medir('filtro_01_estatistica', pagina_01)
+
+    # Ordenação por data (mais recentes primeiro): a primeira página inclui a permutação
+    # do dataset; a segunda, de outra consulta ordenada, já a encontra pronta
+    medidor.medir('ordenacao_01_primeira_pagina',
+                  lambda: tabela_01.ordenar('Date', crescente=False).pagina(1, 100))
+    medidor.medir('ordenacao_01_pagina_seguinte',
+                  lambda: tabela_01.ordenar('Date', crescente=False).pagina(2, 100))
+
+    # Página 02: séries nas três granularidades e estatísticas diárias
+    consulta_02 = CrimeQuery(types=['THEFT', 'BATTERY', 'ASSAULT'], years=[2022, 2023, 2024])
+    medidor.medir('filtro_02_total', lambda: motor.total(consulta_02))
+    for granularidade in GRANULARIDADES:
+        medidor.medir(f'serie_temporal_{granularidade.lower()}',
+                      lambda: agregar_serie(motor.serie_diaria(consulta_02), granularidade))
+    medidor.medir('resumo_diario_02', lambda: resumo_diario(cubo, consulta_02.types, consulta_02.years))
+
+    # Página 03: série diária completa de um tipo e as features do Random Forest
+    consulta_03 = CrimeQuery(types=['THEFT'], years=anos)
+    diaria = medidor.medir('filtro_03_serie_diaria', lambda: motor.serie_diaria(consulta_03, preencher=True))
+    medidor.medir('features_random_forest', lambda: matriz_features(diaria['ds'], diaria['y'].to_numpy(), 90))
+
+    # Página 04: registros dentro de Chicago, DBSCAN e mapa
+    consulta_04 = CrimeQuery(types=['THEFT', 'BATTERY', 'ASSAULT'], years=[2022, 2023, 2024],
+                             months=range(1, 13), bbox=(41.6, 42.1, -88.0, -87.5))
+    pontos = medidor.medir('filtro_04_espacial', lambda: motor.dataframe(consulta_04))
+    coords = pontos[['Latitude', 'Longitude']].to_numpy()
+    if len(coords) > MAX_PONTOS_DBSCAN:
+        coords = coords[np.random.default_rng(0).choice(len(coords), MAX_PONTOS_DBSCAN, replace=False)]
+    medidor.medir('dbscan', lambda: executar_dbscan(coords, 0.01, 10))
+
+    def mapa(adicionar):
+        m = mapa_base()
+        adicionar(m, amostrar_pontos(pontos))
+        return m.get_root().render()
+    medidor.medir('mapa_calor', lambda: mapa(adicionar_mapa_calor))
+    medidor.medir('mapa_pontos', lambda: mapa(adicionar_pontos))
+
+    return {'linhas': linhas, 'linhas_carregadas': len(df), 'etapas': medidor.etapas}
+
+
+def rodar_tamanho(pasta_base, linhas, rastrear_memoria):
+    """Gera (se preciso) os dados de um tamanho e roda o pipeline em um processo separado"""
+    pasta = os.path.join(pasta_base, f"linhas_{linhas}")
+    geracao = None
+    if not dados_prontos(pasta, linhas):
+        print(f"Gerando {linhas:,} linhas em {pasta}...", file=sys.stderr)
+        inicio = time.perf_counter()
+        gerar_dados(pasta, linhas)
+        geracao = round(time.perf_counter() - inicio, 2)
+
+    print(f"Pipeline com {linhas:,} linhas:", file=sys.stderr)
+    comando = [sys.executable, os.path.abspath(__file__), '--processo-filho', str(linhas), '--pasta', pasta]
+    if not rastrear_memoria:
+        comando.append('--sem-tracemalloc')
+    ambiente = dict(os.environ, CRIMES_DATA_DIR=pasta, CRIMES_ARROW_MMAP='0')
+    saida = subprocess.run(comando, env=ambiente, stdout=subprocess.PIPE, check=True, cwd=RAIZ).stdout
+    resultado = json.loads(saida)
+    resultado['geracao_segundos'] = geracao
+    return resultado
+
+
+def ler_tamanhos(textos):
+    """['1M,10M', '50M'] -> [1000000, 10000000, 50000000] (separados por vírgula ou espaço)"""
+    return [ler_tamanho(parte) for texto in textos for parte in texto.split(',') if parte.strip()]
+
+
+def tabela_por_tamanho(tamanhos):
+    """Segundos de cada etapa (linhas) por tamanho do dataset (colunas)"""
+    tabela = pd.DataFrame({f"{resultado['linhas']:,}": {nome: etapa['segundos']
+                                                         for nome, etapa in resultado['etapas'].items()}
+                           for resultado in tamanhos})
+    tabela.index.name = 'etapa (s)'
+    return tabela
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', nargs='+', default=TAMANHOS_PADRAO,
+                        help="Tamanhos do dataset, separados por vírgula ou espaço (padrão: 1M,10M,50M)")
+    parser.add_argument('--pasta', default=os.path.join(tempfile.gettempdir(), 'bench_crimes'),
+                        help="Pasta dos dados gerados (reaproveitados entre execuções)")
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados (padrão: saída padrão)")
+    parser.add_argument('--sem-tracemalloc', action='store_true',
+                        help="Não rastreia o pico de memória por etapa (tempos sem o custo do tracemalloc)")
+    parser.add_argument('--processo-filho', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.processo_filho is not None:
+        json.dump(executar_pipeline(args.pasta, args.processo_filho, not args.sem_tracemalloc), sys.stdout)
+        return
+
+    resultados = {
+        'commit': commit_atual(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'tracemalloc': not args.sem_tracemalloc,
+        'tamanhos': [rodar_tamanho(args.pasta, linhas, not args.sem_tracemalloc)
+                     for linhas in ler_tamanhos(args.linhas)],
+    }
+    print(f"\n{tabela_por_tamanho(resultados['tamanhos']).to_string()}", file=sys.stderr)
+
+    texto = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# config.py - Configurações de desempenho do dashboard
+# Todos os valores podem ser sobrescritos por variáveis de ambiente (CRIMES_*)
+import os
+
+
+def _env_int(nome, padrao):
+    """Lê um inteiro de uma variável de ambiente, com valor padrão"""
+    valor = os.environ.get(nome)
+    return int(valor) if valor else padrao
+
+
+def _env_bool(nome, padrao):
+    """Lê um booleano (1/0, true/false) de uma variável de ambiente, com valor padrão"""
+    valor = os.environ.get(nome)
+    return valor.strip().lower() in ('1', 'true', 'yes', 'sim') if valor else padrao
+
+
+# Pasta com os CSVs divididos em períodos (o cache Parquet/Arrow fica em DATA_DIR/.cache)
+DATA_DIR = os.environ.get("CRIMES_DATA_DIR", "data_splits")
+
+# Carregamento paralelo dos arquivos de data_splits
+INGEST_WORKERS = _env_int("CRIMES_INGEST_WORKERS", os.cpu_count() or 1)
+INGEST_EXECUTOR = os.environ.get("CRIMES_INGEST_EXECUTOR", "thread")  # 'thread' ou 'process'
+
+# Linhas por bloco na conversão dos CSVs para o cache Parquet (limita o pico de memória)
+CSV_CHUNK_ROWS = _env_int("CRIMES_CSV_CHUNK_ROWS", 500_000)
+
+# Dataset compartilhado entre processos: lê um único arquivo Arrow IPC mapeado
+# em memória (construído a partir de data_splits na primeira execução).
+# Útil com vários servidores Streamlit na mesma máquina.
+ARROW_MMAP = _env_bool("CRIMES_ARROW_MMAP", False)
+
+# Exportação da Análise Estatística: linhas escritas por bloco (limita a memória
+# usada para gerar o arquivo) e pasta dos arquivos temporários (padrão do sistema).
+# O botão de download do Streamlit guarda o arquivo inteiro em memória: arquivos
+# maiores que EXPORT_DOWNLOAD_BYTES não são oferecidos. Arquivos de sessões
+# encerradas são removidos depois de EXPORT_MAX_HOURS.
+EXPORT_CHUNK_ROWS = _env_int("CRIMES_EXPORT_CHUNK_ROWS", 100_000)
+EXPORT_DIR = os.environ.get("CRIMES_EXPORT_DIR") or None
+EXPORT_DOWNLOAD_BYTES = _env_int("CRIMES_EXPORT_DOWNLOAD_MB", 512) * 1024 * 1024
+EXPORT_MAX_HOURS = _env_int("CRIMES_EXPORT_MAX_HOURS", 6)
+
+# Orçamento de memória do cache de resultados compartilhado entre as sessões
+# (linhas filtradas, séries e agregados); ao passar do limite, os menos usados saem
+RESULT_CACHE_BYTES = _env_int("CRIMES_RESULT_CACHE_MB", 256) * 1024 * 1024
+
+# Repositório de modelos treinados na Predição (Prophet e Random Forest):
+# pasta (padrão DATA_DIR/.cache/modelos), tamanho total e idade máxima das entradas
+MODEL_STORE_DIR = os.environ.get("CRIMES_MODEL_DIR") or os.path.join(DATA_DIR, ".cache", "modelos")
+MODEL_STORE_BYTES = _env_int("CRIMES_MODEL_STORE_MB", 512) * 1024 * 1024
+MODEL_STORE_MAX_DAYS = _env_int("CRIMES_MODEL_STORE_DAYS", 30)
+
+# Previsão em lote (todos os tipos de crime, opcionalmente por distrito): processos
+# em paralelo, tempo máximo de cada modelo em segundos e pasta dos resultados
+BATCH_WORKERS = _env_int("CRIMES_BATCH_WORKERS", os.cpu_count() or 1)
+BATCH_TIMEOUT = _env_int("CRIMES_BATCH_TIMEOUT", 300)
+BATCH_OUTPUT_DIR = os.environ.get("CRIMES_BATCH_DIR", "previsoes_lote")
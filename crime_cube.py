@@ -0,0 +1,218 @@
+# crime_cube.py - Cubo de contagens pré-agregado (dia × hora × tipo × distrito × prisão)
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_loader import (CACHE_DIR, VERSAO_CACHE, carregar_dataset, derivado_atualizado, arquivo_temporario,
+                         substituir_arquivo)
+
+# Cubo persistido ao lado do cache dos dados
+ARQUIVO_CUBO = os.path.join(CACHE_DIR, f"cubo_crimes.v{VERSAO_CACHE}.parquet")
+CHAVE_CATEGORIAS = b'cubo_categorias'
+
+# Colunas do dataset necessárias para montar o cubo
+COLUNAS_CUBO = ('EpochDay', 'Year', 'Hour', 'Primary Type', 'District', 'Arrest', 'Latitude', 'Longitude')
+
+# Limites geográficos de Chicago (coordenadas fora deles são consideradas inválidas)
+LIMITES_CHICAGO = {
+    'lat_min': 41.6, 'lat_max': 42.1,
+    'lng_min': -88.0, 'lng_max': -87.5
+}
+
+# Dimensões do cubo; as categóricas são guardadas como códigos (-1 = ausente)
+DIMENSOES = ('EpochDay', 'Year', 'Hour', 'Primary Type', 'District', 'Arrest', 'NaCidade')
+DIMENSOES_CATEGORICAS = ('Primary Type', 'District')
+
+
+class CuboCrimes:
+    """
+    Contagens de ocorrências agregadas por EpochDay, Year, Hour, Primary Type,
+    District, Arrest e NaCidade (coordenadas válidas dentro de Chicago).
+    Métricas e gráficos das páginas são respondidos a partir das contagens,
+    sem varrer os registros individuais.
+    """
+
+    def __init__(self, colunas, n, categorias):
+        self.colunas = colunas          # dimensão -> np.ndarray (códigos para as categóricas)
+        self.n = n                      # contagem de ocorrências de cada célula
+        self.categorias = categorias    # dimensão categórica -> np.ndarray de valores
+        self._derivadas = {}
+
+    @classmethod
+    def construir(cls, df):
+        """Agrega o dataset (ver COLUNAS_CUBO) no cubo de contagens"""
+        if 'Latitude' in df.columns and 'Longitude' in df.columns:
+            na_cidade = (
+                df['Latitude'].between(LIMITES_CHICAGO['lat_min'], LIMITES_CHICAGO['lat_max']) &
+                df['Longitude'].between(LIMITES_CHICAGO['lng_min'], LIMITES_CHICAGO['lng_max'])
+            ).fillna(False).to_numpy(dtype=bool)
+        else:
+            na_cidade = np.zeros(len(df), dtype=bool)
+
+        # Colunas ausentes no dataset entram no cubo como valores ausentes
+        def coluna_ou_vazia(dimensao):
+            return df[dimensao] if dimensao in df.columns else pd.Series(np.nan, index=df.index)
+
+        chaves = {'NaCidade': na_cidade}
+        categorias = {}
+        for dimensao in ('EpochDay', 'Year', 'Hour', 'Arrest'):
+            # Valores ausentes viram -1 para caber em arrays inteiros
+            chaves[dimensao] = coluna_ou_vazia(dimensao).astype('float64').fillna(-1).to_numpy().astype(np.int32)
+        for dimensao in DIMENSOES_CATEGORICAS:
+            codigos, valores = pd.factorize(coluna_ou_vazia(dimensao), sort=True)
+            chaves[dimensao] = codigos.astype(np.int32)
+            categorias[dimensao] = np.asarray(valores)
+
+        contagens = pd.DataFrame(chaves).groupby(list(DIMENSOES), sort=False).size()
+        celulas = contagens.index.to_frame(index=False)
+        colunas = {
+            'EpochDay': celulas['EpochDay'].to_numpy(np.int32),
+            'Year': celulas['Year'].to_numpy(np.int16),
+            'Hour': celulas['Hour'].to_numpy(np.int8),
+            'Primary Type': celulas['Primary Type'].to_numpy(np.int16),
+            'District': celulas['District'].to_numpy(np.int16),
+            'Arrest': celulas['Arrest'].to_numpy(np.int8),
+            'NaCidade': celulas['NaCidade'].to_numpy(bool),
+        }
+        return cls(colunas, contagens.to_numpy(np.int32), categorias)
+
+    # --- Persistência ---
+
+    def salvar(self, caminho=ARQUIVO_CUBO):
+        """Grava o cubo em Parquet (escrita atômica)"""
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tabela = pa.table({**self.colunas, 'n': self.n})
+        categorias = {dimensao: valores.tolist() for dimensao, valores in self.categorias.items()}
+        tabela = tabela.replace_schema_metadata({CHAVE_CATEGORIAS: json.dumps(categorias)})
+        temporario = arquivo_temporario(caminho)
+        try:
+            pq.write_table(tabela, temporario)
+            substituir_arquivo(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    @classmethod
+    def ler(cls, caminho=ARQUIVO_CUBO):
+        """Lê um cubo gravado por salvar"""
+        tabela = pq.read_table(caminho)
+        categorias = json.loads(tabela.schema.metadata[CHAVE_CATEGORIAS])
+        colunas = {dimensao: tabela[dimensao].to_numpy() for dimensao in DIMENSOES}
+        return cls(colunas, tabela['n'].to_numpy(),
+                   {dimensao: np.asarray(valores) for dimensao, valores in categorias.items()})
+
+    # --- Consultas ---
+
+    def coluna(self, dimensao):
+        """Array da dimensão (inclui Month e Weekday, derivadas de EpochDay)"""
+        if dimensao in self.colunas:
+            return self.colunas[dimensao]
+        if dimensao not in self._derivadas:
+            dias = self.colunas['EpochDay'].astype('datetime64[D]')
+            if dimensao == 'Month':
+                derivada = (dias.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+            elif dimensao == 'Weekday':
+                # 1970-01-01 foi uma quinta-feira; 0 = segunda-feira
+                derivada = ((self.colunas['EpochDay'].astype(np.int64) + 3) % 7).astype(np.int8)
+            else:
+                raise KeyError(dimensao)
+            derivada[self.colunas['EpochDay'] < 0] = -1
+            self._derivadas[dimensao] = derivada
+        return self._derivadas[dimensao]
+
+    def valores(self, dimensao):
+        """Valores distintos (ordenados) de uma dimensão, sem os ausentes"""
+        if dimensao in self.categorias:
+            return self.categorias[dimensao].tolist()
+        valores = np.unique(self.coluna(dimensao))
+        return valores[valores >= 0].tolist()
+
+    def bitmap(self, dimensao, selecionados):
+        """Máscara das células cujo valor na dimensão está entre os selecionados"""
+        if dimensao in self.categorias:
+            codigos = np.flatnonzero(np.isin(self.categorias[dimensao], list(selecionados)))
+            return np.isin(self.colunas[dimensao], codigos)
+        return np.isin(self.coluna(dimensao), np.asarray(list(selecionados), dtype=np.int64))
+
+    def todas(self):
+        """Máscara com todas as células"""
+        return np.ones(len(self.n), dtype=bool)
+
+    def filtrar(self, selecoes):
+        """
+        selecoes: dict dimensão -> valores aceitos; None não filtra (mesmo formato
+        de IndiceFiltros). Retorna a máscara das células selecionadas.
+        """
+        mascara = self.todas()
+        for dimensao, selecionados in selecoes.items():
+            if selecionados is not None:
+                mascara &= self.bitmap(dimensao, selecionados)
+        return mascara
+
+    def total(self, mascara=None):
+        """Número de ocorrências nas células selecionadas"""
+        return int(self.n.sum() if mascara is None else self.n[mascara].sum())
+
+    def contar_por(self, dimensao, mascara=None):
+        """Ocorrências por valor da dimensão (apenas valores com ocorrências), em ordem de valor"""
+        coluna = self.coluna(dimensao).astype(np.int64)
+        n = self.n
+        if mascara is not None:
+            coluna, n = coluna[mascara], n[mascara]
+        validos = coluna >= 0
+        coluna, n = coluna[validos], n[validos]
+        if len(coluna) == 0:
+            return pd.Series(dtype='int64')
+
+        deslocamento = coluna.min()
+        contagens = np.bincount(coluna - deslocamento, weights=n).astype(np.int64)
+        posicoes = np.flatnonzero(contagens)
+        if dimensao in self.categorias:
+            indice = self.categorias[dimensao][posicoes + deslocamento]
+        else:
+            indice = posicoes + deslocamento
+        return pd.Series(contagens[posicoes], index=indice)
+
+    def dias_distintos(self, mascara=None):
+        """Número de dias com pelo menos uma ocorrência"""
+        return len(self.contar_por('EpochDay', mascara))
+
+    def taxa_prisao(self, mascara=None):
+        """Proporção de ocorrências com prisão (registros sem a informação são ignorados)"""
+        por_prisao = self.contar_por('Arrest', mascara)
+        informados = por_prisao.sum()
+        return float(por_prisao.get(1, 0) / informados) if informados else 0.0
+
+    def serie_diaria(self, mascara=None, preencher=False):
+        """
+        Ocorrências por dia (colunas ds, y).
+        preencher: inclui com zero os dias sem ocorrências entre o primeiro e o último dia.
+        """
+        por_dia = self.contar_por('EpochDay', mascara)
+        if preencher and len(por_dia):
+            por_dia = por_dia.reindex(np.arange(por_dia.index.min(), por_dia.index.max() + 1), fill_value=0)
+        return pd.DataFrame({
+            'ds': pd.to_datetime(np.asarray(por_dia.index, dtype=np.int64), unit='D'),
+            'y': por_dia.to_numpy(),
+        })
+
+
+def carregar_cubo():
+    """Lê o cubo persistido ou o constrói a partir de data_splits quando ausente ou desatualizado"""
+    if derivado_atualizado(ARQUIVO_CUBO):
+        return CuboCrimes.ler()
+
+    df, relatorio = carregar_dataset(columns=COLUNAS_CUBO)
+    cubo = CuboCrimes.construir(df)
+    if relatorio['erros']:
+        # Leitura incompleta: o cubo fica apenas em memória, para não ser servido truncado
+        # nas próximas execuções (derivado_atualizado só compara datas de modificação)
+        return cubo
+    try:
+        cubo.salvar()
+    except OSError:
+        # Sem permissão de escrita: o cubo fica apenas em memória
+        pass
+    return cubo
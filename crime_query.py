@@ -0,0 +1,190 @@
+# crime_query.py - Consulta declarativa única para as quatro páginas
+from dataclasses import dataclass, fields
+import numpy as np
+import pandas as pd
+from crime_cube import LIMITES_CHICAGO, DIMENSOES
+from timeseries import serie_diaria
+from result_cache import CACHE_RESULTADOS
+
+# Campo da consulta -> coluna do dataset
+COLUNAS_CONSULTA = {
+    'years': 'Year',
+    'types': 'Primary Type',
+    'months': 'Month',
+    'hours': 'Hour',
+    'districts': 'District',
+}
+
+# Limites de Chicago como tupla (lat_min, lat_max, lng_min, lng_max)
+BBOX_CHICAGO = (LIMITES_CHICAGO['lat_min'], LIMITES_CHICAGO['lat_max'],
+                LIMITES_CHICAGO['lng_min'], LIMITES_CHICAGO['lng_max'])
+
+
+def _normalizar_valores(valores):
+    """Valores aceitos como tupla ordenada e sem repetição (None = sem filtro)"""
+    if valores is None:
+        return None
+    return tuple(sorted({v.item() if isinstance(v, np.generic) else v for v in valores}))
+
+
+def _normalizar_bbox(bbox):
+    """Aceita None, um dict como LIMITES_CHICAGO ou a tupla (lat_min, lat_max, lng_min, lng_max)"""
+    if bbox is None:
+        return None
+    if isinstance(bbox, dict):
+        bbox = (bbox['lat_min'], bbox['lat_max'], bbox['lng_min'], bbox['lng_max'])
+    return tuple(float(limite) for limite in bbox)
+
+
+@dataclass(frozen=True)
+class CrimeQuery:
+    """
+    Seleção de ocorrências. Cada filtro é uma coleção de valores aceitos
+    (None = sem filtro); bbox restringe às coordenadas dentro dos limites.
+    Os valores são normalizados na criação, então seleções iguais feitas em
+    páginas diferentes são consultas iguais (e a mesma chave de cache).
+    """
+    years: tuple = None
+    types: tuple = None
+    months: tuple = None
+    hours: tuple = None
+    districts: tuple = None
+    bbox: tuple = None
+
+    def __post_init__(self):
+        for campo in COLUNAS_CONSULTA:
+            object.__setattr__(self, campo, _normalizar_valores(getattr(self, campo)))
+        object.__setattr__(self, 'bbox', _normalizar_bbox(self.bbox))
+
+    def selecoes(self):
+        """Filtros por coluna do dataset (formato de IndiceFiltros e CuboCrimes), sem a bbox"""
+        return {coluna: getattr(self, campo) for campo, coluna in COLUNAS_CONSULTA.items()
+                if getattr(self, campo) is not None}
+
+    def selecoes_cubo(self):
+        """Filtros no cubo, ou None se o cubo não responde à consulta (bbox diferente de Chicago)"""
+        if self.bbox not in (None, BBOX_CHICAGO):
+            return None
+        selecoes = self.selecoes()
+        if self.bbox is not None:
+            selecoes['NaCidade'] = (True,)
+        return selecoes
+
+    def __str__(self):
+        partes = [f"{campo.name}={getattr(self, campo.name)}" for campo in fields(self)
+                  if getattr(self, campo.name) is not None]
+        return f"CrimeQuery({', '.join(partes)})"
+
+
+class MotorConsultas:
+    """
+    Executa CrimeQuery pelo caminho mais rápido disponível:
+    - contagens e séries diárias: cubo de contagens (quando a consulta cabe no cubo);
+    - linhas: índice de bitmaps para as colunas indexadas, completando com uma
+      varredura apenas das linhas candidatas (colunas não indexadas e bbox);
+    - sem cubo ou índice: varredura do DataFrame.
+    Os resultados ficam no cache de resultados do processo (ver result_cache.py),
+    chaveados pela consulta normalizada e pela chave do dataset: um identificador
+    pequeno (ver data_loader.versao_dados) para que o cache não segure o DataFrame
+    depois que o motor sair de uso. Sem chave, o próprio motor entra nas chaves.
+    """
+
+    def __init__(self, df, indice=None, cubo=None, chave=None):
+        self.df = df
+        self.indice = indice
+        self.cubo = cubo
+        self.chave = self if chave is None else chave
+
+    # --- Linhas ---
+
+    def linhas(self, consulta, filtro=None):
+        """
+        Posições (ordenadas) das linhas do DataFrame que atendem à consulta.
+        filtro: FiltroIncremental da sessão sobre o mesmo índice, para reaproveitar
+        o resultado anterior quando só um filtro mudou (se não houver resultado guardado).
+        """
+        return CACHE_RESULTADOS.obter((self.chave, consulta, 'linhas'), lambda: self._calcular_linhas(consulta, filtro))
+
+    def _calcular_linhas(self, consulta, filtro):
+        selecoes = consulta.selecoes()
+        indexadas = {}
+        if self.indice is not None:
+            indexadas = {coluna: valores for coluna, valores in selecoes.items()
+                         if coluna in self.indice.bitmaps}
+
+        if indexadas or (filtro is not None and self.indice is not None):
+            bitmap = filtro.avaliar(indexadas) if filtro is not None else self.indice.filtrar_bitmap(indexadas)
+            posicoes = self.indice.linhas(bitmap)
+        else:
+            posicoes = np.arange(len(self.df))
+
+        # Colunas sem índice e bbox: varredura só das linhas candidatas
+        mascara = np.ones(len(posicoes), dtype=bool)
+        for coluna, valores in selecoes.items():
+            if coluna not in indexadas:
+                mascara &= self.df[coluna].take(posicoes).isin(valores).to_numpy()
+        if consulta.bbox is not None:
+            lat_min, lat_max, lng_min, lng_max = consulta.bbox
+            mascara &= (
+                self.df['Latitude'].take(posicoes).between(lat_min, lat_max) &
+                self.df['Longitude'].take(posicoes).between(lng_min, lng_max)
+            ).fillna(False).to_numpy(dtype=bool)
+        return posicoes if mascara.all() else posicoes[mascara]
+
+    def dataframe(self, consulta, filtro=None):
+        """Linhas da consulta materializadas"""
+        return self.df.take(self.linhas(consulta, filtro))
+
+    # --- Agregados ---
+
+    def celulas(self, consulta, filtro=None):
+        """Máscara das células do cubo (filtro: FiltroIncremental da sessão sobre o cubo)"""
+        selecoes = consulta.selecoes_cubo()
+        return filtro.avaliar(selecoes) if filtro is not None else self.cubo.filtrar(selecoes)
+
+    def _usa_cubo(self, consulta, dimensao=None):
+        return (self.cubo is not None and consulta.selecoes_cubo() is not None
+                and (dimensao is None or dimensao in DIMENSOES or dimensao in ('Month', 'Weekday')))
+
+    def total(self, consulta, filtro=None):
+        """Número de ocorrências da consulta (filtro: como em celulas, usado se não houver resultado memorizado)"""
+        if self._usa_cubo(consulta):
+            return CACHE_RESULTADOS.obter((self.cubo, consulta, 'total'),
+                              lambda: self.cubo.total(self.celulas(consulta, filtro)))
+        return CACHE_RESULTADOS.obter((self.chave, consulta, 'total'), lambda: len(self.linhas(consulta)))
+
+    def contar_por(self, consulta, dimensao, filtro=None):
+        """Ocorrências por valor da coluna (apenas valores com ocorrências), em ordem de valor"""
+        if self._usa_cubo(consulta, dimensao):
+            contagens = CACHE_RESULTADOS.obter((self.cubo, consulta, 'contar_por', dimensao),
+                                   lambda: self.cubo.contar_por(dimensao, self.celulas(consulta, filtro)))
+        else:
+            contagens = CACHE_RESULTADOS.obter((self.chave, consulta, 'contar_por', dimensao),
+                                   lambda: self.df[dimensao].take(self.linhas(consulta))
+                                   .value_counts().sort_index().loc[lambda s: s > 0])
+        return contagens.copy(deep=False)
+
+    def dias_distintos(self, consulta, filtro=None):
+        """Número de dias com pelo menos uma ocorrência"""
+        return len(self.contar_por(consulta, 'EpochDay', filtro))
+
+    def taxa_prisao(self, consulta, filtro=None):
+        """Proporção de ocorrências com prisão (registros sem a informação são ignorados)"""
+        por_prisao = self.contar_por(consulta, 'Arrest', filtro)
+        informados = por_prisao.sum()
+        # Índice 0/1 no cubo e False/True na varredura
+        presos = por_prisao[por_prisao.index == 1].sum()
+        return float(presos / informados) if informados else 0.0
+
+    def serie_diaria(self, consulta, preencher=False):
+        """Ocorrências por dia (colunas ds, y); ver timeseries.serie_diaria"""
+        if self._usa_cubo(consulta):
+            return serie_diaria(self.cubo, consulta.selecoes_cubo(), preencher)
+
+        def calcular():
+            por_dia = self.df['EpochDay'].take(self.linhas(consulta)).value_counts().sort_index()
+            if preencher and len(por_dia):
+                por_dia = por_dia.reindex(np.arange(por_dia.index.min(), por_dia.index.max() + 1), fill_value=0)
+            return pd.DataFrame({'ds': pd.to_datetime(np.asarray(por_dia.index, dtype=np.int64), unit='D'),
+                                 'y': por_dia.to_numpy()})
+        return CACHE_RESULTADOS.obter((self.chave, consulta, 'serie_diaria', preencher), calcular).copy(deep=False)
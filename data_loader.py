@@ -0,0 +1,638 @@
+# data_loader.py - Leitura dos arquivos de data_splits com cache colunar (Parquet)
+import os
+import re
+import glob
+import json
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+from config import DATA_DIR, INGEST_WORKERS, INGEST_EXECUTOR, ARROW_MMAP, CSV_CHUNK_ROWS
+
+# Copy-on-write: filtros e cópias rasas compartilham os dados até alguém escrever,
+# o que permite entregar visões do dataset em memória sem duplicá-lo
+pd.set_option('mode.copy_on_write', True)
+
+# CSVs divididos em períodos de 2 anos (pasta DATA_DIR, ver config.py)
+PADRAO_ARQUIVOS = "chicago_crimes_*.csv"
+PADRAO_PERIODO = re.compile(r"chicago_crimes_(\d{4})_(\d{4})\.csv$")
+
+# Cache colunar gerado na primeira leitura de cada arquivo
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+VERSAO_CACHE = 3  # Incrementar sempre que o formato gravado no cache mudar
+
+# Dataset completo em Arrow IPC (sem compressão), aberto via memory map para que
+# vários processos do Streamlit compartilhem as mesmas páginas do cache do SO
+ARQUIVO_IPC = os.path.join(CACHE_DIR, f"chicago_crimes.v{VERSAO_CACHE}.arrow")
+
+# Esquema de tipos aplicado na carga: category para textos com poucos valores
+# distintos, bool para flags, float32 para coordenadas e inteiros pequenos
+SCHEMA = {
+    'Primary Type': 'category',
+    'Description': 'category',
+    'Location Description': 'category',
+    'Arrest': 'bool',
+    'Domestic': 'bool',
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+    'Year': 'int16',
+    'District': 'int8',
+    'Beat': 'int16',
+    'Ward': 'int8',
+    'Community Area': 'int8',
+    # Campos de tempo derivados de Date na carga (ver adicionar_campos_tempo)
+    'Hour': 'int8',
+    'Weekday': 'int8',     # 0 = segunda-feira
+    'Month': 'int8',
+    'DayOfYear': 'int16',  # 1 a 366 não cabe em int8
+    'EpochDay': 'int32',   # Dias desde 1970-01-01
+}
+COLUNAS_CATEGORICAS = [coluna for coluna, tipo in SCHEMA.items() if tipo == 'category']
+
+# Tipos de leitura das colunas do CSV fora do SCHEMA. Sem eles, cada bloco do CSV
+# infere os seus (IUCR "0820" vira número em um bloco e "041A" é texto no seguinte)
+# e o bloco não cabe no esquema do cache (ver tipos_leitura_csv).
+TIPOS_LEITURA = {'ID': 'Int64', 'X Coordinate': 'float64', 'Y Coordinate': 'float64'}
+
+# Equivalentes anuláveis usados quando a coluna tem valores ausentes
+TIPOS_ANULAVEIS = {'bool': 'boolean', 'int8': 'Int8', 'int16': 'Int16', 'int32': 'Int32'}
+VALORES_FLAG = {'true': True, 'false': False, 'y': True, 'n': False,
+                '1': True, '0': False, '1.0': True, '0.0': False}
+
+# Formato das datas no export de Chicago (ex.: 01/05/2014 03:15:00 PM)
+FORMATO_DATA = "%m/%d/%Y %I:%M:%S %p"
+DIAS_SEMANA = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Chave dos metadados Parquet com a memória das colunas antes do esquema
+CHAVE_MEMORIA_BRUTA = b'crimes_memoria_bruta'
+
+# Colunas do DataFrame carregado por cada página (None = todas as colunas);
+# as páginas 02 e 03 não carregam o DataFrame, só o cubo de contagens
+COLUNAS_PAGINAS = {
+    'analise_estatistica': None,  # Navegação e exportação do banco completo
+    'analise_espacial': ('Date', 'Year', 'Month', 'Primary Type', 'District', 'Arrest', 'Latitude', 'Longitude'),
+}
+
+
+def listar_arquivos():
+    """Lista os arquivos CSV de crimes disponíveis em data_splits"""
+    return sorted(glob.glob(os.path.join(DATA_DIR, PADRAO_ARQUIVOS)))
+
+
+def versao_dados():
+    """Identificador pequeno e estável do conteúdo de data_splits: versão do cache e modificação de cada arquivo"""
+    return (VERSAO_CACHE, tuple((os.path.basename(arquivo), os.stat(arquivo).st_mtime_ns)
+                                for arquivo in listar_arquivos()))
+
+
+def catalogo_particoes():
+    """
+    Mapeia cada arquivo de data_splits para o período que ele contém.
+    Retorna lista de (ano_inicio, ano_fim, arquivo); arquivos fora do padrão
+    de nome recebem (None, None) e são sempre lidos.
+    """
+    catalogo = []
+    for arquivo in listar_arquivos():
+        periodo = PADRAO_PERIODO.search(os.path.basename(arquivo))
+        if periodo:
+            catalogo.append((int(periodo.group(1)), int(periodo.group(2)), arquivo))
+        else:
+            catalogo.append((None, None, arquivo))
+    return catalogo
+
+
+def selecionar_particoes(years_range=None):
+    """Arquivos cujo período se sobrepõe a years_range (todos se None)"""
+    if years_range is None:
+        return [arquivo for _, _, arquivo in catalogo_particoes()]
+
+    start_year, end_year = years_range
+    selecionados = []
+    for inicio, fim, arquivo in catalogo_particoes():
+        if inicio is None or (inicio <= end_year and fim >= start_year):
+            selecionados.append(arquivo)
+    return selecionados
+
+
+def particoes_cobertas(arquivos, years_range):
+    """Indica se todos os arquivos estão inteiramente dentro de years_range"""
+    if years_range is None:
+        return True
+    start_year, end_year = years_range
+    periodos = {arquivo: (inicio, fim) for inicio, fim, arquivo in catalogo_particoes()}
+    for arquivo in arquivos:
+        inicio, fim = periodos.get(arquivo, (None, None))
+        if inicio is None or inicio < start_year or fim > end_year:
+            return False
+    return True
+
+
+def caminho_cache(arquivo_csv):
+    """Caminho do arquivo Parquet correspondente a um CSV de data_splits"""
+    nome = os.path.splitext(os.path.basename(arquivo_csv))[0]
+    return os.path.join(CACHE_DIR, f"{nome}.v{VERSAO_CACHE}.parquet")
+
+
+def cache_atualizado(arquivo_csv):
+    """Indica se o cache Parquet existe e não é mais antigo que o CSV de origem"""
+    arquivo_cache = caminho_cache(arquivo_csv)
+    if not os.path.exists(arquivo_cache):
+        return False
+    return os.path.getmtime(arquivo_cache) >= os.path.getmtime(arquivo_csv)
+
+
+def preparar_chunk(chunk):
+    """
+    Normaliza um bloco lido do CSV: colunas de data e ano, campos de tempo e SCHEMA.
+    Retorna (DataFrame, memória em bytes de cada coluna antes do esquema).
+    """
+    # Processar coluna de data
+    if 'Date' in chunk.columns:
+        chunk['Date'] = converter_datas(chunk['Date'])
+    elif 'Data' in chunk.columns:
+        chunk['Date'] = converter_datas(chunk['Data'])
+        chunk = chunk.drop('Data', axis=1)
+
+    # Adicionar coluna de ano se não existir
+    if 'Year' not in chunk.columns and 'Date' in chunk.columns:
+        chunk['Year'] = chunk['Date'].dt.year
+
+    memoria_bruta = chunk.memory_usage(deep=True, index=False).to_dict()
+    chunk = adicionar_campos_tempo(chunk)
+    return aplicar_schema(chunk), memoria_bruta
+
+
+def filtrar_periodo_colunas(df, years_range=None, colunas=None):
+    """Aplica o filtro de período (pela coluna Year) e a projeção de colunas"""
+    if years_range is not None and 'Year' in df.columns:
+        start_year, end_year = years_range
+        df = df[(df['Year'] >= start_year) & (df['Year'] <= end_year)]
+    if colunas is not None:
+        df = df[[coluna for coluna in colunas if coluna in df.columns]]
+    return df
+
+
+def tipos_leitura_csv(arquivo_csv):
+    """
+    dtype do read_csv, igual em todos os blocos: TIPOS_LEITURA, category e texto
+    (flags) para as colunas desses tipos no SCHEMA e texto para as demais fora dele.
+    As numéricas do SCHEMA são convertidas bloco a bloco por aplicar_schema.
+    """
+    tipos = {}
+    for coluna in pd.read_csv(arquivo_csv, nrows=0).columns:
+        tipo = SCHEMA.get(coluna)
+        if tipo is None:
+            tipos[coluna] = TIPOS_LEITURA.get(coluna, 'str')
+        elif tipo in ('category', 'bool'):
+            tipos[coluna] = 'category' if tipo == 'category' else 'str'
+    return tipos
+
+
+def esquema_arrow_fixo(esquema):
+    """
+    Esquema Arrow com índices de dicionário int32, válido para todos os blocos de um arquivo
+    (o do primeiro bloco, no cache, ou o dos tipos das colunas, na exportação).
+    Colunas sem nenhum valor (tipo null) passam a texto.
+    """
+    campos = []
+    for campo in esquema:
+        if pa.types.is_null(campo.type):
+            campo = campo.with_type(pa.string())
+        elif pa.types.is_dictionary(campo.type):
+            valores = pa.string() if pa.types.is_null(campo.type.value_type) else campo.type.value_type
+            campo = campo.with_type(pa.dictionary(pa.int32(), valores))
+        campos.append(campo)
+    return pa.schema(campos, metadata=esquema.metadata)
+
+
+def arquivo_temporario(destino):
+    """Arquivo temporário exclusivo na pasta do destino: escritas concorrentes (threads ou processos) não colidem"""
+    descritor, caminho = tempfile.mkstemp(prefix=f"{os.path.basename(destino)}.", suffix='.tmp',
+                                          dir=os.path.dirname(destino))
+    os.close(descritor)
+    return caminho
+
+
+def substituir_arquivo(temporario, destino):
+    """Move o temporário para o destino; se falhar, outro escritor já gravou o mesmo arquivo"""
+    try:
+        os.replace(temporario, destino)
+    except OSError:
+        pass
+
+
+def converter_csv(arquivo_csv, colunas=None, years_range=None, chunk_rows=None):
+    """
+    Lê um CSV em blocos de tamanho fixo, aplicando o SCHEMA a cada bloco e
+    gravando-o no cache Parquet (um row group por bloco). O pico de memória
+    depende do tamanho do bloco e da seleção, não do tamanho do arquivo.
+    colunas/years_range: projeção e período do DataFrame retornado (o cache guarda tudo).
+    Retorna (DataFrame selecionado, memória bruta por coluna, total de linhas do arquivo).
+    """
+    destino = caminho_cache(arquivo_csv)
+    temporario = None
+    escritor = None
+    esquema = None
+    gravar = True
+    selecionados = []
+    memoria_bruta = {}
+    total_linhas = 0
+
+    try:
+        for chunk in pd.read_csv(arquivo_csv, chunksize=chunk_rows or CSV_CHUNK_ROWS,
+                                 dtype=tipos_leitura_csv(arquivo_csv)):
+            chunk, memoria_chunk = preparar_chunk(chunk)
+            total_linhas += len(chunk)
+            for coluna, valor in memoria_chunk.items():
+                memoria_bruta[coluna] = memoria_bruta.get(coluna, 0) + valor
+
+            if gravar:
+                tabela = pa.Table.from_pandas(chunk, preserve_index=False)
+                try:
+                    if escritor is None:
+                        os.makedirs(CACHE_DIR, exist_ok=True)
+                        temporario = arquivo_temporario(destino)
+                        esquema = esquema_arrow_fixo(tabela.schema)
+                        escritor = pq.ParquetWriter(temporario, esquema)
+                    escritor.write_table(tabela.cast(esquema))
+                except OSError:
+                    # Sem permissão de escrita: segue apenas com o CSV
+                    gravar = False
+
+            selecionados.append(filtrar_periodo_colunas(chunk, years_range, colunas))
+            del chunk
+
+        if escritor is not None and gravar:
+            escritor.add_key_value_metadata({CHAVE_MEMORIA_BRUTA: json.dumps(memoria_bruta)})
+            escritor.close()
+            escritor = None
+            substituir_arquivo(temporario, destino)
+    finally:
+        if escritor is not None:
+            escritor.close()
+        if temporario is not None and os.path.exists(temporario):
+            os.remove(temporario)
+
+    if not selecionados:
+        return pd.DataFrame(), memoria_bruta, total_linhas
+    return concatenar_partes(selecionados), memoria_bruta, total_linhas
+
+
+def converter_datas(serie):
+    """Converte datas no FORMATO_DATA; só valores em outro formato passam pela inferência"""
+    datas = pd.to_datetime(serie, format=FORMATO_DATA, errors='coerce')
+    fora_do_formato = datas.isna() & serie.notna()
+    if fora_do_formato.any():
+        datas[fora_do_formato] = pd.to_datetime(serie[fora_do_formato], format='mixed', errors='coerce')
+    return datas
+
+
+def adicionar_campos_tempo(parte):
+    """Calcula uma única vez hora, dia da semana, mês, dia do ano e dia desde 1970 a partir de Date"""
+    if 'Date' not in parte.columns:
+        return parte
+    datas = parte['Date'].dt
+    parte['Hour'] = datas.hour
+    parte['Weekday'] = datas.dayofweek
+    parte['Month'] = datas.month
+    parte['DayOfYear'] = datas.dayofyear
+    parte['EpochDay'] = (parte['Date'] - pd.Timestamp('1970-01-01')).dt.days
+    return parte
+
+
+def _converter_flag(serie):
+    """Converte flags ('true'/'false', 'Y'/'N', 0/1) para bool"""
+    valores = serie.astype(str).str.strip().str.lower().map(VALORES_FLAG)
+    return valores.astype('boolean' if valores.isna().any() else 'bool')
+
+
+def aplicar_schema(parte):
+    """Converte as colunas presentes em parte para os tipos declarados em SCHEMA"""
+    for coluna, tipo in SCHEMA.items():
+        if coluna not in parte.columns:
+            continue
+        if str(parte[coluna].dtype) in (tipo, TIPOS_ANULAVEIS.get(tipo)):
+            continue
+
+        serie = parte[coluna]
+        if tipo == 'category':
+            parte[coluna] = serie.astype('category')
+        elif tipo == 'bool':
+            parte[coluna] = _converter_flag(serie)
+        elif tipo.startswith('int'):
+            # Inteiros com valores ausentes usam o tipo anulável (Int8, Int16)
+            serie = pd.to_numeric(serie, errors='coerce')
+            parte[coluna] = serie.astype(TIPOS_ANULAVEIS[tipo] if serie.isna().any() else tipo)
+        else:
+            parte[coluna] = pd.to_numeric(serie, errors='coerce').astype(tipo)
+    return parte
+
+
+def memoria_bytes(df):
+    """Memória ocupada pelo DataFrame, incluindo o conteúdo das strings"""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def ler_memoria_bruta(arquivo_cache):
+    """Memória por coluna antes do esquema, gravada nos metadados do cache"""
+    metadados = pq.read_metadata(arquivo_cache).metadata or {}
+    if CHAVE_MEMORIA_BRUTA not in metadados:
+        return {}
+    return json.loads(metadados[CHAVE_MEMORIA_BRUTA])
+
+
+def carregar_particao(arquivo_csv, colunas=None, years_range=None):
+    """
+    Carrega um arquivo de data_splits, preferindo o cache Parquet.
+    colunas: lista de colunas a ler (None para todas); colunas inexistentes são ignoradas.
+    years_range: mantém apenas os registros do período (None para todos).
+    Retorna (DataFrame, info) onde info traz a origem ('parquet' ou 'csv') e a
+    memória das colunas lidas antes ('memoria_bruta') e depois ('memoria') do SCHEMA.
+    """
+    if cache_atualizado(arquivo_csv):
+        arquivo_cache = caminho_cache(arquivo_csv)
+        disponiveis = pq.read_schema(arquivo_cache).names
+        if colunas is not None:
+            colunas = [coluna for coluna in colunas if coluna in disponiveis]
+        # O período é resolvido pelo leitor Parquet (estatísticas de Year por row group)
+        filtros = None
+        if years_range is not None and 'Year' in disponiveis:
+            filtros = [('Year', '>=', years_range[0]), ('Year', '<=', years_range[1])]
+        parte = aplicar_schema(pd.read_parquet(arquivo_cache, columns=colunas, filters=filtros))
+        memoria_bruta = ler_memoria_bruta(arquivo_cache)
+        total_linhas = pq.read_metadata(arquivo_cache).num_rows
+        origem = 'parquet'
+    else:
+        # Leitura em blocos: grava o cache completo e retorna só a seleção
+        parte, memoria_bruta, total_linhas = converter_csv(arquivo_csv, colunas, years_range)
+        origem = 'csv'
+
+    proporcao = len(parte) / total_linhas if total_linhas else 0
+    info = {
+        'origem': origem,
+        'memoria_bruta': int(sum(memoria_bruta.get(coluna, 0) for coluna in parte.columns) * proporcao),
+        'memoria': memoria_bytes(parte),
+    }
+    return parte, info
+
+
+def concatenar_partes(partes):
+    """Concatena as partes preservando as colunas categóricas"""
+    for coluna in COLUNAS_CATEGORICAS:
+        if not all(coluna in parte.columns for parte in partes):
+            continue
+        if not all(isinstance(parte[coluna].dtype, pd.CategoricalDtype) for parte in partes):
+            continue
+        # Unificar as categorias para o concat não converter a coluna em object
+        try:
+            categorias = union_categoricals([parte[coluna] for parte in partes]).categories
+        except TypeError:
+            continue
+        for parte in partes:
+            parte[coluna] = parte[coluna].cat.set_categories(categorias)
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def _carregar_arquivo(arquivo, colunas, years_range=None):
+    """
+    Carrega um arquivo para carregar_dataset (executado nos workers do pool).
+    Retorna (DataFrame ou None, registro do relatório ou None, mensagem de erro ou None).
+    """
+    nome = os.path.basename(arquivo)
+    inicio = time.perf_counter()
+    try:
+        # Carregar do cache Parquet (ou do CSV, se o cache estiver desatualizado)
+        parte, info = carregar_particao(arquivo, colunas, years_range)
+    except Exception as e:
+        return None, None, f"Erro no arquivo {nome}: {e}"
+
+    lido = caminho_cache(arquivo) if info['origem'] == 'parquet' else arquivo
+    registro = {
+        'arquivo': nome,
+        'origem': info['origem'],
+        'registros': len(parte),
+        'bytes': os.path.getsize(lido),
+        'memoria_bruta': info['memoria_bruta'],
+        'segundos': time.perf_counter() - inicio,
+    }
+    return parte, registro, None
+
+
+def carregar_arquivos(arquivos, colunas=None, years_range=None, workers=None, executor=None):
+    """
+    Carrega vários arquivos em paralelo, mantendo a ordem de entrada.
+    workers/executor: padrão em config (INGEST_WORKERS, INGEST_EXECUTOR = 'thread' ou 'process').
+    Retorna a lista de resultados de _carregar_arquivo.
+    """
+    workers = min(workers or INGEST_WORKERS, len(arquivos))
+    if workers <= 1:
+        return [_carregar_arquivo(arquivo, colunas, years_range) for arquivo in arquivos]
+
+    pool = ProcessPoolExecutor if (executor or INGEST_EXECUTOR) == 'process' else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor_pool:
+        return list(executor_pool.map(_carregar_arquivo, arquivos,
+                                      [colunas] * len(arquivos), [years_range] * len(arquivos)))
+
+
+def novo_relatorio():
+    """Relatório de carregamento vazio (preenchido por carregar_dataset)"""
+    return {
+        'arquivos': [],       # Um dicionário por arquivo lido
+        'erros': [],          # Mensagens de falha (arquivos ignorados, dados ausentes)
+        'registros': 0,
+        'memoria_bruta': 0,   # Memória das colunas antes do SCHEMA
+        'memoria': 0,         # Memória do DataFrame final
+        'segundos': 0.0,
+    }
+
+
+def carregar_dataset_particoes(years_range=None, columns=None):
+    """
+    Lê e combina os arquivos de data_splits sem nenhuma saída na interface.
+    years_range: tuple (start_year, end_year) ou None para todos os dados
+    columns: colunas a carregar ou None para todas
+    Retorna (DataFrame, relatório); arquivos com erro são ignorados e registrados no relatório.
+    """
+    inicio = time.perf_counter()
+    relatorio = novo_relatorio()
+
+    def finalizar(df):
+        relatorio['registros'] = len(df)
+        relatorio['memoria'] = memoria_bytes(df)
+        relatorio['segundos'] = time.perf_counter() - inicio
+        return df, relatorio
+
+    try:
+        # Verificar se a pasta data_splits existe
+        if not os.path.exists(DATA_DIR):
+            relatorio['erros'].append(f"Pasta '{DATA_DIR}' não encontrada")
+            return finalizar(pd.DataFrame())
+
+        # Encontrar apenas os arquivos cujo período se sobrepõe ao solicitado
+        arquivos = selecionar_particoes(years_range)
+        if not arquivos:
+            relatorio['erros'].append(f"Nenhum arquivo de dados encontrado na pasta '{DATA_DIR}' para o período selecionado")
+            return finalizar(pd.DataFrame())
+
+        # Período e colunas são aplicados na leitura de cada arquivo; o filtro de
+        # período só é necessário se algum arquivo ultrapassar o intervalo
+        periodo_leitura = None if particoes_cobertas(arquivos, years_range) else years_range
+        colunas_leitura = list(columns) if columns is not None else None
+
+        # Arquivos com erro são ignorados sem interromper o carregamento dos demais
+        partes = []
+        for parte, registro, erro in carregar_arquivos(sorted(arquivos), colunas_leitura, periodo_leitura):
+            if erro:
+                relatorio['erros'].append(erro)
+                continue
+
+            if 'Date' not in parte.columns and (columns is None or 'Date' in columns):
+                relatorio['erros'].append(f"Nenhuma coluna de data encontrada em {registro['arquivo']}")
+
+            partes.append(parte)
+            relatorio['memoria_bruta'] += registro.pop('memoria_bruta')
+            relatorio['arquivos'].append(registro)
+
+        if not partes:
+            relatorio['erros'].append("Nenhum arquivo foi carregado com sucesso")
+            return finalizar(pd.DataFrame())
+
+        return finalizar(concatenar_partes(partes))
+
+    except Exception as e:
+        relatorio['erros'].append(f"Erro crítico em load_data: {e}")
+        return finalizar(pd.DataFrame())
+
+
+def derivado_atualizado(caminho):
+    """Indica se um arquivo derivado de data_splits existe e não é mais antigo que nenhum CSV de origem"""
+    if not os.path.exists(caminho):
+        return False
+    arquivos = listar_arquivos()
+    if not arquivos:
+        return True
+    return os.path.getmtime(caminho) >= max(os.path.getmtime(arquivo) for arquivo in arquivos)
+
+
+def ipc_atualizado():
+    """Indica se o arquivo Arrow IPC existe e não é mais antigo que nenhum CSV de origem"""
+    return derivado_atualizado(ARQUIVO_IPC)
+
+
+def gravar_ipc(df, memoria_bruta):
+    """Grava o dataset completo em Arrow IPC sem compressão (escrita atômica)"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temporario = arquivo_temporario(ARQUIVO_IPC)
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[CHAVE_MEMORIA_BRUTA] = json.dumps(memoria_bruta).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    try:
+        with pa.OSFile(temporario, 'wb') as destino:
+            with pa.ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        substituir_arquivo(temporario, ARQUIVO_IPC)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def construir_ipc():
+    """Monta o arquivo Arrow IPC a partir de data_splits; retorna o relatório da leitura"""
+    df, relatorio = carregar_dataset_particoes()
+    if df.empty or relatorio['erros']:
+        # Leitura incompleta: não grava o arquivo compartilhado, que seria lido truncado
+        # por todos os processos (ipc_atualizado só compara datas de modificação)
+        return relatorio
+
+    # Memória por coluna antes do esquema, somada a partir dos caches Parquet
+    memoria_bruta = {}
+    for arquivo in listar_arquivos():
+        if cache_atualizado(arquivo):
+            for coluna, valor in ler_memoria_bruta(caminho_cache(arquivo)).items():
+                memoria_bruta[coluna] = memoria_bruta.get(coluna, 0) + valor
+
+    gravar_ipc(df, memoria_bruta)
+    return relatorio
+
+
+def ler_ipc(years_range=None, columns=None):
+    """
+    Abre o arquivo Arrow IPC via memory map e aplica período e colunas.
+    Sem filtro de período, as colunas numéricas sem nulos referenciam
+    diretamente as páginas mapeadas (sem cópia).
+    Retorna (DataFrame, memória bruta estimada em bytes).
+    """
+    tabela = pa.ipc.open_file(pa.memory_map(ARQUIVO_IPC, 'r')).read_all()
+    total_linhas = tabela.num_rows
+    metadados = tabela.schema.metadata or {}
+    memoria_bruta = json.loads(metadados.get(CHAVE_MEMORIA_BRUTA, b'{}'))
+
+    if years_range is not None and 'Year' in tabela.column_names:
+        start_year, end_year = years_range
+        anos = tabela['Year']
+        tabela = tabela.filter(pc.and_(pc.greater_equal(anos, start_year), pc.less_equal(anos, end_year)))
+    if columns is not None:
+        tabela = tabela.select([coluna for coluna in columns if coluna in tabela.column_names])
+
+    df = aplicar_schema(tabela.to_pandas(split_blocks=True))
+    proporcao = len(df) / total_linhas if total_linhas else 0
+    return df, int(sum(memoria_bruta.get(coluna, 0) for coluna in df.columns) * proporcao)
+
+
+def carregar_dataset_ipc(years_range=None, columns=None):
+    """
+    Carrega o dataset do arquivo Arrow IPC mapeado em memória, construindo-o a
+    partir de data_splits quando ausente ou desatualizado.
+    Retorna (DataFrame, relatório) como carregar_dataset_particoes.
+    """
+    inicio = time.perf_counter()
+    relatorio = novo_relatorio()
+
+    if not ipc_atualizado():
+        relatorio_construcao = construir_ipc()
+        if not ipc_atualizado():
+            # Arquivo não gravado (leitura incompleta ou sem permissão): lê direto das partições
+            return carregar_dataset_particoes(years_range, columns)
+        relatorio['arquivos'].extend(relatorio_construcao['arquivos'])
+        relatorio['erros'].extend(relatorio_construcao['erros'])
+
+    inicio_leitura = time.perf_counter()
+    df, memoria_bruta = ler_ipc(years_range, columns)
+    relatorio['arquivos'].append({
+        'arquivo': os.path.basename(ARQUIVO_IPC),
+        'origem': 'arrow-mmap',
+        'registros': len(df),
+        'bytes': os.path.getsize(ARQUIVO_IPC),
+        'segundos': time.perf_counter() - inicio_leitura,
+    })
+    relatorio['registros'] = len(df)
+    relatorio['memoria_bruta'] = memoria_bruta
+    relatorio['memoria'] = memoria_bytes(df)
+    relatorio['segundos'] = time.perf_counter() - inicio
+    return df, relatorio
+
+
+def carregar_dataset(years_range=None, columns=None, usar_mmap=None):
+    """
+    Carrega o dataset de crimes sem nenhuma saída na interface.
+    usar_mmap: lê o arquivo Arrow IPC mapeado em memória (padrão em config.ARROW_MMAP);
+    se falhar, volta para a leitura dos arquivos de data_splits.
+    Retorna (DataFrame, relatório).
+    """
+    if ARROW_MMAP if usar_mmap is None else usar_mmap:
+        try:
+            return carregar_dataset_ipc(years_range, columns)
+        except Exception as e:
+            df, relatorio = carregar_dataset_particoes(years_range, columns)
+            relatorio['erros'].insert(0, f"Arrow IPC indisponível ({e}); dados lidos de {DATA_DIR}")
+            return df, relatorio
+
+    return carregar_dataset_particoes(years_range, columns)
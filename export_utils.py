@@ -0,0 +1,88 @@
+# export_utils.py - Exportação em blocos da seleção da Análise Estatística
+import os
+import gzip
+import time
+import glob
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import EXPORT_CHUNK_ROWS, EXPORT_DIR, EXPORT_MAX_HOURS
+from data_loader import esquema_arrow_fixo
+
+# Formato -> (extensão do arquivo, tipo MIME)
+FORMATOS_EXPORTACAO = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+PREFIXO_EXPORTACAO = "chicago_crimes_"
+
+
+def _escrever_csv(blocos, arquivo):
+    """Escreve os blocos em CSV (cabeçalho só no primeiro bloco)"""
+    for numero, bloco in enumerate(blocos):
+        bloco.to_csv(arquivo, index=False, header=(numero == 0))
+
+
+def _escrever_parquet(blocos, caminho):
+    """
+    Escreve cada bloco como um row group do arquivo Parquet. O esquema vem dos tipos
+    das colunas, não dos valores do primeiro bloco (coluna só com nulos ali não vira null).
+    """
+    escritor = None
+    try:
+        for bloco in blocos:
+            if escritor is None:
+                esquema = esquema_arrow_fixo(pa.Schema.from_pandas(bloco.iloc[:0], preserve_index=False))
+                escritor = pq.ParquetWriter(caminho, esquema)
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar_consulta(consulta, formato, chunk_rows=None):
+    """
+    Grava a seleção (ConsultaPaginada, na ordem de exibição) em um arquivo
+    temporário no formato escolhido, bloco a bloco: a memória usada depende
+    do tamanho do bloco, não do tamanho da seleção.
+    Retorna o caminho do arquivo; quem chama deve removê-lo (ver remover_exportacao).
+    """
+    extensao, _ = FORMATOS_EXPORTACAO[formato]
+    blocos = consulta.blocos(chunk_rows or EXPORT_CHUNK_ROWS)
+    limpar_exportacoes_antigas()
+
+    descritor, caminho = tempfile.mkstemp(prefix=PREFIXO_EXPORTACAO, suffix=f".{extensao}", dir=EXPORT_DIR)
+    os.close(descritor)
+    try:
+        if formato == "Parquet":
+            _escrever_parquet(blocos, caminho)
+        elif formato == "CSV (gzip)":
+            with gzip.open(caminho, 'wt', encoding='utf-8', newline='') as arquivo:
+                _escrever_csv(blocos, arquivo)
+        else:
+            with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+                _escrever_csv(blocos, arquivo)
+    except Exception:
+        remover_exportacao(caminho)
+        raise
+    return caminho
+
+
+def remover_exportacao(caminho):
+    """Remove um arquivo gerado por exportar_consulta (ignora se já não existir)"""
+    if caminho and os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def limpar_exportacoes_antigas(max_horas=EXPORT_MAX_HOURS):
+    """Remove as exportações com mais de max_horas (de sessões encerradas sem removê-las)"""
+    limite = time.time() - max_horas * 3600
+    pasta = EXPORT_DIR or tempfile.gettempdir()
+    for caminho in glob.glob(os.path.join(pasta, f"{PREFIXO_EXPORTACAO}*")):
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            # Removido por outra sessão ao mesmo tempo
+            pass
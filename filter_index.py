@@ -0,0 +1,134 @@
+# filter_index.py - Índice de bitmaps para os filtros da barra lateral
+import numpy as np
+import pandas as pd
+
+# Colunas indexadas para os filtros das páginas (ver crime_query.COLUNAS_CONSULTA)
+COLUNAS_INDICE = ('Year', 'Primary Type', 'District', 'Hour', 'Month')
+
+
+class IndiceFiltros:
+    """
+    Índice invertido do dataset: para cada valor de cada coluna indexada guarda
+    um bitmap compactado (np.packbits) com as linhas que têm aquele valor.
+    Filtrar é unir (OR) os bitmaps dos valores selecionados em cada coluna e
+    intersectar (AND) as colunas; só as linhas finais são materializadas.
+    """
+
+    def __init__(self, df, colunas=COLUNAS_INDICE):
+        self.n_linhas = len(df)
+        self.bitmaps = {}
+        for coluna in colunas:
+            if coluna in df.columns:
+                self.bitmaps[coluna] = self._construir_bitmaps(df[coluna])
+
+    def _construir_bitmaps(self, serie):
+        """Um bitmap por valor distinto da coluna (valores ausentes não entram no índice)"""
+        codigos, valores = pd.factorize(serie, sort=True)
+        return {valor: np.packbits(codigos == codigo) for codigo, valor in enumerate(valores)}
+
+    def valores(self, coluna):
+        """Valores distintos indexados da coluna, em ordem"""
+        return list(self.bitmaps[coluna].keys())
+
+    def bitmap(self, coluna, selecionados):
+        """União dos bitmaps dos valores selecionados (valores fora do índice são ignorados)"""
+        resultado = np.zeros((self.n_linhas + 7) // 8, dtype=np.uint8)
+        bitmaps_coluna = self.bitmaps[coluna]
+        for valor in selecionados:
+            if valor in bitmaps_coluna:
+                resultado |= bitmaps_coluna[valor]
+        return resultado
+
+    def filtrar_bitmap(self, selecoes):
+        """
+        selecoes: dict coluna -> valores aceitos; None (ou coluna ausente) não filtra.
+        Retorna o bitmap das linhas que atendem a todos os filtros.
+        """
+        resultado = None
+        for coluna, selecionados in selecoes.items():
+            if selecionados is None:
+                continue
+            bitmap_coluna = self.bitmap(coluna, selecionados)
+            resultado = bitmap_coluna if resultado is None else (resultado & bitmap_coluna)
+
+        if resultado is None:
+            resultado = self.todas()
+        return resultado
+
+    def todas(self):
+        """Bitmap com todas as linhas (bits de preenchimento do último byte zerados)"""
+        return np.packbits(np.ones(self.n_linhas, dtype=bool))
+
+    def filtrar(self, selecoes):
+        """Como filtrar_bitmap, mas retorna as posições (ordenadas) das linhas selecionadas"""
+        return self.linhas(self.filtrar_bitmap(selecoes))
+
+    def linhas(self, bitmap):
+        """Converte um bitmap nas posições das linhas marcadas"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_linhas))
+
+    def contar(self, bitmap):
+        """Número de linhas marcadas no bitmap"""
+        return int(np.bitwise_count(bitmap).sum())
+
+
+class FiltroIncremental:
+    """
+    Avalia seleções sobre um índice reaproveitando o resultado da avaliação anterior.
+    Serve para IndiceFiltros (bitmaps compactados) e para CuboCrimes (máscaras
+    booleanas): ambos oferecem bitmap(coluna, selecionados) e todas().
+
+    Quando só uma coluna muda em relação à seleção anterior:
+    - redução (valores removidos): o resultado anterior perde as linhas dos valores removidos;
+    - ampliação (valores acrescentados): entram só as linhas dos novos valores que
+      atendem às demais colunas.
+    Outras mudanças recalculam a seleção inteira.
+    """
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.selecoes = {}      # coluna -> frozenset dos valores aceitos
+        self.bitmaps = {}       # coluna -> bitmap da seleção da coluna
+        self.resultado = None
+        self.ultima_avaliacao = None  # 'completa', 'reduzida', 'ampliada' ou 'reaproveitada'
+
+    def avaliar(self, selecoes):
+        """selecoes no formato de IndiceFiltros.filtrar_bitmap; retorna o bitmap do resultado"""
+        novas = {coluna: frozenset(valores) for coluna, valores in selecoes.items() if valores is not None}
+        mudancas = [coluna for coluna in set(novas) | set(self.selecoes)
+                    if novas.get(coluna) != self.selecoes.get(coluna)]
+
+        if self.resultado is not None and not mudancas:
+            self.ultima_avaliacao = 'reaproveitada'
+        elif self.resultado is not None and len(mudancas) == 1 and mudancas[0] in novas and mudancas[0] in self.selecoes:
+            coluna = mudancas[0]
+            antigas, atuais = self.selecoes[coluna], novas[coluna]
+            if atuais <= antigas:
+                removidas = self.indice.bitmap(coluna, antigas - atuais)
+                self.bitmaps[coluna] = self.bitmaps[coluna] & ~removidas
+                self.resultado = self.resultado & ~removidas
+                self.ultima_avaliacao = 'reduzida'
+            elif atuais >= antigas:
+                acrescimo = self.indice.bitmap(coluna, atuais - antigas)
+                self.bitmaps[coluna] = self.bitmaps[coluna] | acrescimo
+                for outra, bitmap_outra in self.bitmaps.items():
+                    if outra != coluna:
+                        acrescimo = acrescimo & bitmap_outra
+                self.resultado = self.resultado | acrescimo
+                self.ultima_avaliacao = 'ampliada'
+            else:
+                self._avaliar_completa(novas)
+        else:
+            self._avaliar_completa(novas)
+
+        self.selecoes = novas
+        return self.resultado
+
+    def _avaliar_completa(self, novas):
+        """Recalcula os bitmaps de todas as colunas e o resultado"""
+        self.bitmaps = {coluna: self.indice.bitmap(coluna, valores) for coluna, valores in novas.items()}
+        resultado = self.indice.todas()
+        for bitmap_coluna in self.bitmaps.values():
+            resultado = resultado & bitmap_coluna
+        self.resultado = resultado
+        self.ultima_avaliacao = 'completa'
@@ -0,0 +1,353 @@
+# forecasting.py - Preparação das séries diárias e features para os modelos de predição
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+import holidays
+from sklearn.metrics import mean_absolute_error, mean_squared_error, mean_absolute_percentage_error
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+from model_store import hash_dados
+
+
+def dividir_treino_teste(dados_diarios, train_years):
+    """
+    Divide a série diária (ds, y) no fim do último ano de treino.
+    Retorna (treino, teste, data de corte); ValueError se o corte estiver fora da série.
+    """
+    ultimo_ano_treino = max(train_years)
+    data_corte = pd.Timestamp(f"{ultimo_ano_treino}-12-31")
+
+    if data_corte < dados_diarios['ds'].min() or data_corte > dados_diarios['ds'].max():
+        raise ValueError(f"Data de corte {data_corte.strftime('%d/%m/%Y')} fora do range dos dados")
+
+    dados_treino = dados_diarios[dados_diarios['ds'] <= data_corte]
+    dados_teste = dados_diarios[dados_diarios['ds'] > data_corte]
+    return dados_treino, dados_teste, data_corte
+
+
+# Estação do ano (hemisfério norte) de cada mês, indexada pelo mês (1 a 12)
+# 0 = inverno, 1 = primavera, 2 = verão, 3 = outono
+ESTACAO_POR_MES = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+
+# Features de calendário, na ordem das colunas de matriz_features
+FEATURES_CALENDARIO = ['day_of_week', 'day_of_month', 'month', 'year', 'quarter', 'week_of_year',
+                       'is_weekend', 'is_holiday', 'season', 'is_year_end']
+JANELAS_MEDIA_MOVEL = (7, 30)
+
+
+@lru_cache(maxsize=32)
+def _feriados_eua(ano_inicio, ano_fim):
+    """Dias dos feriados dos EUA (datetime64[D]) entre os anos"""
+    return np.array(sorted(holidays.US(years=range(ano_inicio, ano_fim + 1))), dtype='datetime64[D]')
+
+
+def nomes_features(lags_dias):
+    """Nomes das colunas de matriz_features"""
+    return (FEATURES_CALENDARIO + [f'lag_{lag}d' for lag in range(1, lags_dias + 1)]
+            + [f'rolling_mean_{janela}d' for janela in JANELAS_MEDIA_MOVEL])
+
+
+def matriz_features(datas, y, lags_dias=30):
+    """
+    Features temporais DIÁRIAS de uma série (datas, contagens) para scikit-learn, como
+    uma matriz float32 C-contígua (linhas = dias, colunas = nomes_features(lags_dias)).
+    Os lags saem de uma única janela deslizante sobre a série (NaN onde o lag cai antes
+    do início); feriados e estações vêm de tabelas indexadas, sem laços em Python.
+    """
+    datas = pd.DatetimeIndex(datas)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    X = np.empty((n, len(nomes_features(lags_dias))), dtype=np.float32)
+    if n == 0:
+        return X
+
+    # Calendário
+    meses = datas.month.to_numpy()
+    dias_semana = datas.dayofweek.to_numpy()
+    X[:, 0] = dias_semana
+    X[:, 1] = datas.day
+    X[:, 2] = meses
+    X[:, 3] = datas.year
+    X[:, 4] = datas.quarter
+    X[:, 5] = datas.isocalendar().week.to_numpy()
+    X[:, 6] = dias_semana >= 5
+
+    # Feriados: tabela com um booleano por dia entre a primeira e a última data
+    dias = datas.to_numpy().astype('datetime64[D]')
+    primeiro, ultimo = dias.min(), dias.max()
+    feriados = _feriados_eua(int(datas.year.min()), int(datas.year.max()))
+    feriados = feriados[(feriados >= primeiro) & (feriados <= ultimo)]
+    e_feriado = np.zeros((ultimo - primeiro).astype(np.int64) + 1, dtype=bool)
+    e_feriado[(feriados - primeiro).astype(np.int64)] = True
+    X[:, 7] = e_feriado[(dias - primeiro).astype(np.int64)]
+
+    X[:, 8] = ESTACAO_POR_MES[meses]
+    X[:, 9] = meses >= 11  # Final de ano
+
+    # Lags: a janela i da série precedida de NaN é y[i-lags], ..., y[i-1]; invertida, lag_1d ... lag_Nd
+    coluna = len(FEATURES_CALENDARIO)
+    if lags_dias:
+        precedida = np.concatenate([np.full(lags_dias, np.nan), y])
+        X[:, coluna:coluna + lags_dias] = sliding_window_view(precedida[:-1], lags_dias)[:, ::-1]
+        coluna += lags_dias
+
+    # Médias móveis (incluindo o dia, com as janelas incompletas no início) por somas acumuladas
+    acumulado = np.concatenate([[0.0], np.cumsum(y)])
+    fim = np.arange(1, n + 1)
+    for janela in JANELAS_MEDIA_MOVEL:
+        inicio = np.maximum(fim - janela, 0)
+        X[:, coluna] = (acumulado[fim] - acumulado[inicio]) / (fim - inicio)
+        coluna += 1
+    return X
+
+
+@dataclass(frozen=True, eq=False)
+class TrechoFeatures:
+    """Trecho da série pronto para o scikit-learn: datas, features (float32 C-contígua) e alvo"""
+    datas: pd.DatetimeIndex
+    X: np.ndarray
+    y: np.ndarray
+
+    def __len__(self):
+        return len(self.y)
+
+    @property
+    def vazio(self):
+        return len(self.y) == 0
+
+
+def ajustar_prophet(dados_treino, periodos, seasonality_mode='multiplicative', include_holidays=True, init=None,
+                    prazo=None):
+    """
+    Treina o Prophet na série diária (ds, y) e prevê os `periodos` dias seguintes ao treino.
+    init: parâmetros iniciais da otimização (ver parametros_iniciais_prophet); sem eles, parte do zero.
+    prazo: instante (time.perf_counter) em que a otimização tem de parar; ao estourar, o processo
+    do CmdStan é encerrado pelo próprio cmdstanpy e sobe TimeoutError.
+    Retorna (modelo, previsão, segundos da otimização); ImportError se o Prophet não estiver instalado.
+    """
+    from prophet import Prophet
+
+    model = Prophet(
+        seasonality_mode=seasonality_mode,
+        yearly_seasonality=True,
+        weekly_seasonality=True,
+        daily_seasonality=False
+    )
+
+    # Adicionar feriados se selecionado
+    if include_holidays:
+        model.add_country_holidays(country_name='US')
+
+    # Só a otimização é medida: é o que o warm start encurta
+    argumentos = {}
+    if init is not None:
+        argumentos['init'] = init
+    inicio = time.perf_counter()
+    if prazo is not None:
+        argumentos['timeout'] = max(prazo - inicio, 0.01)
+    model.fit(dados_treino, **argumentos)
+    segundos_ajuste = time.perf_counter() - inicio
+
+    future = model.make_future_dataframe(periods=periodos, freq='D', include_history=False)
+    return model, model.predict(future), segundos_ajuste
+
+
+def parametros_iniciais_prophet(model):
+    """
+    Parâmetros ajustados de um Prophet no formato do `init` do fit (warm start).
+    delta e beta com outro tamanho no novo treino (changepoints, feriados) são
+    trocados pelos valores padrão pelo próprio Prophet.
+    """
+    return {
+        'k': float(model.params['k'][0][0]),
+        'm': float(model.params['m'][0][0]),
+        'sigma_obs': float(model.params['sigma_obs'][0][0]),
+        'delta': np.asarray(model.params['delta'][0]),
+        'beta': np.asarray(model.params['beta'][0]),
+    }
+
+
+def preparar_features_rf(dados_treino, dados_teste, data_corte, lags_dias):
+    """
+    Features diárias da série completa (treino + teste), sem os dias iniciais sem lags,
+    divididas na data de corte. Retorna (treino, teste, nomes das features), com
+    treino e teste como TrechoFeatures.
+    """
+    serie = pd.concat([dados_treino, dados_teste]).sort_values('ds')
+    datas = pd.DatetimeIndex(serie['ds'])
+    y = serie['y'].to_numpy()
+    X = matriz_features(datas, y, lags_dias)
+
+    completos = ~np.isnan(X).any(axis=1)
+    trechos = []
+    for selecao in (completos & (datas <= data_corte), completos & (datas > data_corte)):
+        trechos.append(TrechoFeatures(datas[selecao], X[selecao], y[selecao]))
+    return trechos[0], trechos[1], nomes_features(lags_dias)
+
+
+def ajustar_random_forest(train, n_estimators, random_state=42, n_jobs=-1):
+    """Normaliza as features e treina o Random Forest em um TrechoFeatures; retorna (modelo, scaler)"""
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(train.X)
+
+    model_rf = RandomForestRegressor(
+        n_estimators=n_estimators,
+        random_state=random_state,
+        n_jobs=n_jobs
+    )
+    model_rf.fit(X_train_scaled, train.y)
+    return model_rf, scaler
+
+
+def ampliar_random_forest(model_rf, train, n_estimators, n_jobs=-1):
+    """
+    Acrescenta árvores (warm_start), até n_estimators, a um Random Forest já treinado no
+    mesmo trecho (features normalizadas). Com o mesmo random_state, o resultado é igual
+    ao do treino do zero.
+    """
+    model_rf.set_params(warm_start=True, n_estimators=n_estimators, n_jobs=n_jobs)
+    model_rf.fit(train.X, train.y)
+    model_rf.set_params(warm_start=False)
+    return model_rf
+
+
+def _obter_modelo(repositorio, tipo, dados, config, treinar, **metadados):
+    """
+    Artefatos do modelo pelo repositório (ver model_store.py) ou treinados agora se não houver repositório.
+    treinar() retorna (artefatos, informações do treino), como em ModelStore.obter.
+    """
+    if repositorio is not None:
+        return repositorio.obter(repositorio.chave(tipo, dados, config), treinar, config=config,
+                                 dados=hash_dados(dados), **metadados)
+    inicio = time.perf_counter()
+    artefatos, info_treino = treinar()
+    return artefatos, {'do_repositorio': False, 'segundos': time.perf_counter() - inicio, **info_treino}
+
+
+def _modelo_base(repositorio, tipo, compativel, distancia):
+    """
+    Modelo salvo para o warm start: a entrada do tipo que passa em compativel(meta)
+    com a menor distancia(meta). Retorna (metadados, artefatos) ou (None, None).
+    """
+    if repositorio is None:
+        return None, None
+    for meta in sorted(filter(compativel, repositorio.entradas(tipo)), key=distancia):
+        artefatos = repositorio.carregar(meta['chave'])
+        if artefatos is not None:
+            return meta, artefatos
+    return None, None
+
+
+def _segundos_frio(meta):
+    """Tempo da otimização do zero do modelo salvo (estimado, se ele próprio veio de um warm start)"""
+    return meta.get('segundos_frio') or meta.get('segundos_ajuste') or meta['segundos_treino']
+
+
+def prever_prophet(dados_treino, dados_teste, seasonality_mode='multiplicative', include_holidays=True,
+                   repositorio=None, prazo=None, **metadados):
+    """
+    Previsão do Prophet para os dias de teste. Sem modelo salvo para estes dados, o treino
+    parte dos parâmetros do modelo salvo do mesmo crime com a janela de treino mais próxima.
+    prazo: fim do tempo da otimização (ver ajustar_prophet); não entra na chave do modelo.
+    Retorna (resultados com ds, y, yhat, yhat_lower e yhat_upper, artefatos do modelo, info do repositório).
+    """
+    config = {
+        'seasonality_mode': seasonality_mode,
+        'include_holidays': include_holidays,
+        'periodos': len(dados_teste),
+    }
+    inicio, fim = dados_treino['ds'].min(), dados_treino['ds'].max()
+    metadados.update(treino_inicio=inicio.strftime('%Y-%m-%d'), treino_fim=fim.strftime('%Y-%m-%d'),
+                     dias_treino=len(dados_treino))
+
+    def compativel(meta):
+        return ('treino_inicio' in meta and meta.get('crime') == metadados.get('crime')
+                and meta.get('distrito') == metadados.get('distrito')
+                and meta['config']['seasonality_mode'] == seasonality_mode
+                and meta['config']['include_holidays'] == include_holidays)
+
+    def distancia(meta):
+        return abs(pd.Timestamp(meta['treino_inicio']) - inicio) + abs(pd.Timestamp(meta['treino_fim']) - fim)
+
+    def treinar():
+        base, artefatos_base = _modelo_base(repositorio, 'prophet', compativel, distancia)
+        if base is not None:
+            try:
+                init = parametros_iniciais_prophet(artefatos_base['modelo'])
+                model, previsao, segundos_ajuste = ajustar_prophet(dados_treino, init=init, prazo=prazo, **config)
+                # Tempo de otimização do zero proporcional ao tamanho da série: estimado a partir
+                # do ajuste do modelo salvo (outra série, outra execução), não medido agora
+                segundos_frio = _segundos_frio(base) * len(dados_treino) / base['dias_treino']
+                return {'modelo': model, 'previsao': previsao}, {
+                    'aquecimento': f"parâmetros do modelo treinado de {base['treino_inicio']} a {base['treino_fim']}",
+                    'segundos_ajuste': segundos_ajuste,
+                    'segundos_frio': segundos_frio,
+                    'segundos_economizados': segundos_frio - segundos_ajuste,
+                    'economia_estimada': True,
+                }
+            except RuntimeError:
+                # Otimização falhou partindo do modelo salvo: treina do zero
+                pass
+        model, previsao, segundos_ajuste = ajustar_prophet(dados_treino, prazo=prazo, **config)
+        return {'modelo': model, 'previsao': previsao}, {'segundos_ajuste': segundos_ajuste}
+
+    artefatos, info = _obter_modelo(repositorio, 'prophet', dados_treino, config, treinar, **metadados)
+    forecast_test = artefatos['previsao'][['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return pd.merge(dados_teste, forecast_test, on='ds', how='left'), artefatos, info
+
+
+def prever_random_forest(train, test, n_estimators, lags_dias, repositorio=None, n_jobs=-1, **metadados):
+    """
+    Previsão do Random Forest para os dias de teste (treino/teste de preparar_features_rf).
+    Sem modelo salvo para estes dados e parâmetros, mas com um de menos árvores no mesmo
+    treino, as árvores que faltam são acrescentadas a ele.
+    Retorna (resultados com ds, y e yhat, artefatos do modelo, info do repositório).
+    """
+    config = {'n_estimators': n_estimators, 'lags_dias': lags_dias}
+    dados = hash_dados((train.X, train.y))
+
+    def compativel(meta):
+        return (meta.get('dados') == dados and meta['config']['lags_dias'] == lags_dias
+                and meta['config']['n_estimators'] < n_estimators)
+
+    def treinar():
+        # O que tiver mais árvores
+        base, artefatos_base = _modelo_base(repositorio, 'random_forest', compativel,
+                                            lambda meta: -meta['config']['n_estimators'])
+        if base is None:
+            return dict(zip(('modelo', 'scaler'), ajustar_random_forest(train, n_estimators, n_jobs=n_jobs))), {}
+
+        scaler = artefatos_base['scaler']
+        arvores_base = base['config']['n_estimators']
+        treino_normalizado = TrechoFeatures(train.datas, scaler.transform(train.X), train.y)
+        inicio = time.perf_counter()
+        model_rf = ampliar_random_forest(artefatos_base['modelo'], treino_normalizado, n_estimators, n_jobs)
+        segundos_ajuste = time.perf_counter() - inicio
+        # Tempo de treino do zero proporcional ao número de árvores (medido nas acrescentadas, nesta máquina)
+        segundos_frio = segundos_ajuste * n_estimators / (n_estimators - arvores_base)
+        return {'modelo': model_rf, 'scaler': scaler}, {
+            'aquecimento': f"{n_estimators - arvores_base} árvores acrescentadas às {arvores_base} do modelo salvo",
+            'segundos_ajuste': segundos_ajuste,
+            'segundos_frio': segundos_frio,
+            'segundos_economizados': segundos_frio - segundos_ajuste,
+            'economia_estimada': False,
+        }
+
+    artefatos, info = _obter_modelo(repositorio, 'random_forest', (train.X, train.y), config, treinar, **metadados)
+    y_pred = artefatos['modelo'].predict(artefatos['scaler'].transform(test.X))
+    resultados = pd.DataFrame({'ds': test.datas, 'y': test.y, 'yhat': y_pred})
+    return resultados, artefatos, info
+
+
+def metricas_previsao(y_real, y_previsto):
+    """MAPE (%), MAE, MSE e RMSE de uma previsão"""
+    mse = mean_squared_error(y_real, y_previsto)
+    return {
+        'mape': mean_absolute_percentage_error(y_real, y_previsto) * 100,
+        'mae': mean_absolute_error(y_real, y_previsto),
+        'mse': mse,
+        'rmse': float(np.sqrt(mse)),
+    }
@@ -0,0 +1,201 @@
+# model_store.py - Repositório em disco dos modelos treinados na Predição
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from importlib import metadata
+import joblib
+import numpy as np
+import pandas as pd
+from config import MODEL_STORE_DIR, MODEL_STORE_BYTES, MODEL_STORE_MAX_DAYS
+
+VERSAO_REPOSITORIO = 1  # Incrementar sempre que o formato gravado mudar
+ARQUIVO_META = "meta.json"
+
+# Biblioteca de cada tipo de modelo (a versão entra na chave: modelos gravados
+# por outra versão não são reaproveitados)
+BIBLIOTECAS = {'prophet': 'prophet', 'random_forest': 'scikit-learn'}
+
+
+def hash_dados(dados):
+    """Hash do conteúdo dos dados de treino: DataFrame (valores, índice e colunas), array ou tupla deles"""
+    resumo = hashlib.sha256()
+    if isinstance(dados, (tuple, list)):
+        for parte in dados:
+            resumo.update(hash_dados(parte).encode())
+    elif isinstance(dados, np.ndarray):
+        resumo.update(f"{dados.dtype.str}{dados.shape}".encode())
+        resumo.update(np.ascontiguousarray(dados).tobytes())
+    else:
+        resumo.update(json.dumps([str(coluna) for coluna in dados.columns]).encode())
+        resumo.update(pd.util.hash_pandas_object(dados, index=True).to_numpy().tobytes())
+    return resumo.hexdigest()
+
+
+def _versao_biblioteca(tipo):
+    try:
+        return metadata.version(BIBLIOTECAS[tipo])
+    except (KeyError, metadata.PackageNotFoundError):
+        return None
+
+
+def _gravar_artefato(pasta, nome, objeto):
+    """Prophet em JSON, DataFrames em Parquet e o restante (sklearn, listas) com joblib"""
+    if type(objeto).__module__.startswith('prophet'):
+        from prophet.serialize import model_to_json
+        with open(os.path.join(pasta, f"{nome}.prophet.json"), 'w') as arquivo:
+            arquivo.write(model_to_json(objeto))
+    elif isinstance(objeto, pd.DataFrame):
+        objeto.to_parquet(os.path.join(pasta, f"{nome}.parquet"))
+    else:
+        joblib.dump(objeto, os.path.join(pasta, f"{nome}.joblib"))
+
+
+def _ler_artefato(caminho):
+    """Artefato gravado por _gravar_artefato: (nome, objeto)"""
+    arquivo = os.path.basename(caminho)
+    if arquivo.endswith('.prophet.json'):
+        from prophet.serialize import model_from_json
+        with open(caminho) as entrada:
+            return arquivo[:-len('.prophet.json')], model_from_json(entrada.read())
+    if arquivo.endswith('.parquet'):
+        return arquivo[:-len('.parquet')], pd.read_parquet(caminho)
+    return arquivo[:-len('.joblib')], joblib.load(caminho)
+
+
+def _tamanho_pasta(pasta):
+    return sum(entrada.stat().st_size for entrada in os.scandir(pasta) if entrada.is_file())
+
+
+class ModelStore:
+    """
+    Modelos treinados (e o que deles se deriva: scaler, previsões) gravados em
+    disco, uma pasta por chave. A chave é o hash dos dados de treino, da
+    configuração e da versão da biblioteca, então a mesma combinação (crime,
+    anos, hiperparâmetros) é treinada uma única vez, mesmo entre processos.
+    Entradas não usadas há mais de max_dias saem primeiro; depois, as usadas há
+    mais tempo até o total caber em max_bytes.
+    """
+
+    def __init__(self, pasta=MODEL_STORE_DIR, max_bytes=MODEL_STORE_BYTES, max_dias=MODEL_STORE_MAX_DAYS):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self.max_dias = max_dias
+
+    def chave(self, tipo, dados, config):
+        """Chave de um modelo: tipo, dados de treino e configuração (dict serializável)"""
+        resumo = hashlib.sha256()
+        resumo.update(json.dumps({
+            'versao': VERSAO_REPOSITORIO,
+            'tipo': tipo,
+            'biblioteca': _versao_biblioteca(tipo),
+            'config': config,
+        }, sort_keys=True, default=str).encode())
+        resumo.update(hash_dados(dados).encode())
+        return f"{tipo}-{resumo.hexdigest()[:32]}"
+
+    def _pasta_entrada(self, chave):
+        return os.path.join(self.pasta, chave)
+
+    def carregar(self, chave):
+        """Artefatos gravados na chave (dict nome -> objeto), ou None se não houver entrada válida"""
+        pasta = self._pasta_entrada(chave)
+        meta = os.path.join(pasta, ARQUIVO_META)
+        if not os.path.exists(meta):
+            return None
+        try:
+            artefatos = dict(_ler_artefato(entrada.path) for entrada in os.scandir(pasta)
+                             if entrada.name != ARQUIVO_META)
+            os.utime(meta)  # Último uso, para o descarte
+        except Exception:
+            # Entrada corrompida ou removida durante a leitura: treina de novo
+            return None
+        return artefatos
+
+    def salvar(self, chave, artefatos, **metadados):
+        """Grava os artefatos da chave (gravação atômica) e aplica os limites do repositório"""
+        destino = self._pasta_entrada(chave)
+        temporario = None
+        try:
+            # Pasta temporária exclusiva: threads e processos gravando a mesma chave não colidem
+            os.makedirs(self.pasta, exist_ok=True)
+            temporario = tempfile.mkdtemp(prefix=f"{chave}.", suffix='.tmp', dir=self.pasta)
+            for nome, objeto in artefatos.items():
+                _gravar_artefato(temporario, nome, objeto)
+            with open(os.path.join(temporario, ARQUIVO_META), 'w') as arquivo:
+                json.dump({'chave': chave, 'criado': time.time(), **metadados}, arquivo, default=str)
+            try:
+                os.rename(temporario, destino)
+            except OSError:
+                # Outro processo gravou a mesma chave primeiro
+                pass
+        except OSError:
+            # Sem permissão de escrita: o modelo só não é reaproveitado
+            pass
+        finally:
+            if temporario is not None:
+                shutil.rmtree(temporario, ignore_errors=True)
+        self.descartar()
+
+    def obter(self, chave, treinar, **metadados):
+        """
+        Artefatos da chave, treinando apenas se não estiverem gravados. treinar() retorna
+        (dict de artefatos, dict de informações do treino), gravadas junto com os metadados.
+        Retorna (artefatos, info) com info['do_repositorio'], info['segundos'] (tempo de
+        leitura ou de treino) e, se treinou agora, as informações do treino.
+        """
+        inicio = time.perf_counter()
+        artefatos = self.carregar(chave)
+        if artefatos is not None:
+            return artefatos, {'do_repositorio': True, 'segundos': time.perf_counter() - inicio}
+
+        artefatos, info_treino = treinar()
+        segundos = time.perf_counter() - inicio
+        self.salvar(chave, artefatos, segundos_treino=segundos, **info_treino, **metadados)
+        return artefatos, {'do_repositorio': False, 'segundos': segundos, **info_treino}
+
+    def entradas(self, tipo=None):
+        """
+        Entradas gravadas (só as do tipo, se informado): metadados, bytes e último uso,
+        das usadas há mais tempo para as mais recentes
+        """
+        if not os.path.isdir(self.pasta):
+            return []
+        entradas = []
+        for entrada in os.scandir(self.pasta):
+            meta = os.path.join(entrada.path, ARQUIVO_META)
+            if entrada.name.endswith('.tmp') or not os.path.exists(meta):
+                continue
+            if tipo is not None and not entrada.name.startswith(f"{tipo}-"):
+                continue
+            try:
+                with open(meta) as arquivo:
+                    dados = json.load(arquivo)
+                dados['bytes'] = _tamanho_pasta(entrada.path)
+                dados['ultimo_uso'] = os.path.getmtime(meta)
+            except (OSError, ValueError):
+                continue
+            entradas.append(dados)
+        return sorted(entradas, key=lambda dados: dados['ultimo_uso'])
+
+    def descartar(self):
+        """Remove as entradas expiradas e, se preciso, as usadas há mais tempo até caber no limite"""
+        entradas = self.entradas()
+        limite_idade = time.time() - self.max_dias * 86400
+        total = sum(dados['bytes'] for dados in entradas)
+        for dados in entradas:
+            if dados['ultimo_uso'] >= limite_idade and total <= self.max_bytes:
+                break
+            shutil.rmtree(self._pasta_entrada(dados['chave']), ignore_errors=True)
+            total -= dados['bytes']
+
+    def limpar(self):
+        """Remove todas as entradas"""
+        for dados in self.entradas():
+            shutil.rmtree(self._pasta_entrada(dados['chave']), ignore_errors=True)
+
+
+# Instância única do processo
+MODELOS = ModelStore()
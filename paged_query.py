@@ -0,0 +1,94 @@
+# paged_query.py - Consulta preguiçosa e paginada sobre as linhas filtradas do dataset
+import numpy as np
+import pandas as pd
+
+
+class PermutacoesOrdenacao:
+    """
+    Permutações de ordenação das colunas de um DataFrame, calculadas uma única
+    vez por coluna (na primeira vez em que a coluna é ordenada) e reutilizadas
+    por todas as consultas sobre o mesmo DataFrame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._permutacoes = {}
+
+    def permutacao(self, coluna):
+        """
+        Retorna (validos, nulos): posições das linhas com valor em ordem crescente
+        (estável) e posições das linhas sem valor, na ordem original.
+        """
+        if coluna not in self._permutacoes:
+            # Códigos ordenados pelo valor: funciona para números, datas, textos e categorias
+            codigos, _ = pd.factorize(self.df[coluna], sort=True)
+            validos = np.flatnonzero(codigos >= 0)
+            validos = validos[np.argsort(codigos[validos], kind='stable')]
+            self._permutacoes[coluna] = (validos, np.flatnonzero(codigos < 0))
+        return self._permutacoes[coluna]
+
+
+class ConsultaPaginada:
+    """
+    Seleção de linhas de um DataFrame guardada apenas como posições.
+    Nada é materializado até que uma página (ou uma coluna) seja pedida.
+    linhas: posições ordenadas das linhas selecionadas (None = todas as linhas).
+    """
+
+    def __init__(self, df, linhas=None, ordenacoes=None, coluna=None, crescente=True):
+        self.df = df
+        self.linhas = linhas
+        self.ordenacoes = ordenacoes
+        self.coluna = coluna
+        self.crescente = crescente
+        self._ordem = None
+
+    def __len__(self):
+        return len(self.df) if self.linhas is None else len(self.linhas)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    def ordenar(self, coluna, crescente=True):
+        """Nova consulta com as mesmas linhas ordenadas pela coluna (nulos no final)"""
+        if self.ordenacoes is None:
+            self.ordenacoes = PermutacoesOrdenacao(self.df)
+        return ConsultaPaginada(self.df, self.linhas, self.ordenacoes, coluna, crescente)
+
+    def ordem(self):
+        """Posições das linhas selecionadas na ordem de exibição"""
+        if self._ordem is None:
+            if self.coluna is None:
+                self._ordem = np.arange(len(self.df)) if self.linhas is None else self.linhas
+            else:
+                validos, nulos = self.ordenacoes.permutacao(self.coluna)
+                if self.linhas is not None:
+                    # A permutação do dataset é restrita à seleção sem reordenar nada
+                    marcadas = np.zeros(len(self.df), dtype=bool)
+                    marcadas[self.linhas] = True
+                    validos, nulos = validos[marcadas[validos]], nulos[marcadas[nulos]]
+                if not self.crescente:
+                    validos = validos[::-1]
+                self._ordem = np.concatenate([validos, nulos])
+        return self._ordem
+
+    def pagina(self, numero, tamanho=100):
+        """Materializa apenas as linhas da página (numeradas a partir de 1)"""
+        inicio = (numero - 1) * tamanho
+        return self.df.take(self.ordem()[inicio:inicio + tamanho])
+
+    def blocos(self, tamanho):
+        """Gera a seleção, na ordem de exibição, em DataFrames de no máximo `tamanho` linhas"""
+        ordem = self.ordem()
+        for inicio in range(0, len(ordem), tamanho):
+            yield self.df.take(ordem[inicio:inicio + tamanho])
+
+    def coluna_selecionada(self, coluna):
+        """Valores de uma única coluna nas linhas selecionadas (ordem original)"""
+        serie = self.df[coluna]
+        return serie if self.linhas is None else serie.take(self.linhas)
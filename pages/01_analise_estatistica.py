@@ -12,7 +12,13 @@ st.set_page_config(page_title="Análise Estatística - Crimes Chicago", page_ico
 
 # Importa a função load_data do app.py principal
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from app import load_data
+from app import load_data, load_filter_index, load_sort_orders, load_query_engine
+from data_loader import COLUNAS_PAGINAS, DIAS_SEMANA
+from paged_query import ConsultaPaginada
+from filter_index import FiltroIncremental
+from crime_query import CrimeQuery
+from export_utils import FORMATOS_EXPORTACAO, exportar_consulta, remover_exportacao
+from config import EXPORT_DOWNLOAD_BYTES
 
 def main():
     # Título e navegação
@@ -25,7 +31,10 @@ def main():
 
     # Carregar dados completos (2014-2024) para permitir a seleção
     with st.spinner("Carregando dados de 2014-2024..."):
-        df_full = load_data((2014, 2024))
+        df_full = load_data((2014, 2024), COLUNAS_PAGINAS['analise_estatistica'])
+        indice = load_filter_index((2014, 2024), COLUNAS_PAGINAS['analise_estatistica'])
+        ordenacoes = load_sort_orders((2014, 2024), COLUNAS_PAGINAS['analise_estatistica'])
+        motor = load_query_engine((2014, 2024), COLUNAS_PAGINAS['analise_estatistica'])
 
     # Verificar se os dados foram carregados corretamente
     if df_full is None or df_full.empty:
@@ -38,7 +47,8 @@ def main():
     #### TIPOS DE FILTRO ####
 
     # FILTRO TEMPORAL - Agora com todos os anos de 2014-2024
-    anos_disponiveis = sorted(df_full['Year'].unique())
+    # As opções vêm do índice de filtros (valores já ordenados, sem varrer a tabela)
+    anos_disponiveis = indice.valores('Year')
     anos_selecionados = st.sidebar.multiselect(
         "Selecione os anos para análise:",
         options=anos_disponiveis,
@@ -46,7 +56,7 @@ def main():
     )
 
     # FILTRO POR TIPO DE CRIME - usar df_full para ter todas as opções
-    crime_types_full = sorted(df_full['Primary Type'].unique())
+    crime_types_full = indice.valores('Primary Type')
     selected_crime = st.sidebar.multiselect("Selecione o tipo de crime:", crime_types_full, default=crime_types_full)
 
     # Filtro por período do dia
@@ -66,7 +76,7 @@ def main():
     # Filtro adicional por distrito 
     distritos = None
     if 'District' in df_full.columns:
-        distritos_disponiveis = sorted(df_full['District'].unique())
+        distritos_disponiveis = indice.valores('District')
         distritos = st.sidebar.multiselect(
             "Selecione os distritos:",
             distritos_disponiveis,
@@ -74,34 +84,44 @@ def main():
         )
 
     ### APLICAÇÃO DOS FILTROS ###
-    df_filtrado = df_full.copy()
+    # Os filtros formam uma CrimeQuery: as linhas saem do índice de bitmaps e
+    # as métricas do cubo de contagens (ver crime_query.py)
+    filtros_consulta = {}
 
     # Aplicar filtro de anos
     if anos_selecionados:
-        df_filtrado = df_filtrado[df_filtrado['Year'].isin(anos_selecionados)]
+        filtros_consulta['years'] = anos_selecionados
         st.sidebar.info(f"📅 Analisando dados de: {sorted(anos_selecionados)}")
     else:
-        df_filtrado = df_filtrado[df_filtrado['Year'].isin([2024, 2023, 2022])]  # Padrão: anos mais recentes
+        filtros_consulta['years'] = [2024, 2023, 2022]  # Padrão: anos mais recentes
         st.sidebar.info("📅 Usando anos mais recentes (2022-2024) como padrão")
 
     # Aplicar filtro de tipo de crime
     if selected_crime:
-        df_filtrado = df_filtrado[df_filtrado['Primary Type'].isin(selected_crime)]
-
-    # Aplicar filtro de período do dia
-    if periodo_selecionado != "Todo o dia" and 'Date' in df_filtrado.columns:
-        # Extrair hora da data para filtrar
-        df_filtrado = df_filtrado.copy()  # Garantir que estamos trabalhando com uma cópia
-        df_filtrado['Hora'] = df_filtrado['Date'].dt.hour
-        hora_i, hora_f = periods[periodo_selecionado]
-        df_filtrado = df_filtrado[
-            (df_filtrado['Hora'] >= hora_i) & 
-            (df_filtrado['Hora'] <= hora_f)
-        ]
+        filtros_consulta['types'] = selected_crime
+
+    # Aplicar filtro de período do dia (o dia todo não filtra)
+    hora_i, hora_f = periods[periodo_selecionado]
+    if (hora_i, hora_f) != (0, 23):
+        filtros_consulta['hours'] = range(hora_i, hora_f + 1)
 
     # Aplicar filtro de distrito 
-    if distritos is not None and 'District' in df_filtrado.columns:
-        df_filtrado = df_filtrado[df_filtrado['District'].isin(distritos)]
+    # Com todos os distritos selecionados não há o que filtrar (inclui registros sem distrito)
+    if distritos is not None and len(distritos) < len(distritos_disponiveis):
+        filtros_consulta['districts'] = distritos
+
+    consulta = CrimeQuery(**filtros_consulta)
+
+    # Filtros incrementais da sessão (linhas no índice e células no cubo): mudar um
+    # único filtro reaproveita o resultado do rerun anterior
+    filtros = st.session_state.get('filtros_estatistica')
+    if filtros is None or filtros[0].indice is not motor.indice or filtros[1].indice is not motor.cubo:
+        filtros = (FiltroIncremental(motor.indice), FiltroIncremental(motor.cubo))
+        st.session_state.filtros_estatistica = filtros
+    filtro_linhas, filtro_cubo = filtros
+
+    # A seleção guarda só as posições das linhas; as páginas são extraídas sob demanda
+    df_filtrado = ConsultaPaginada(df_full, motor.linhas(consulta, filtro_linhas), ordenacoes)
 
     ### VALIDAÇÃO DE DADOS FILTRADOS ###
     if df_filtrado.empty:
@@ -109,10 +129,14 @@ def main():
         
         # Mostrar dados originais se os filtros não retornarem nada
         st.info("Mostrando dados sem filtros aplicados:")
-        df_filtrado = df_full.copy()
+        df_filtrado = ConsultaPaginada(df_full, None, ordenacoes)
+        consulta = CrimeQuery()
     else:
         st.success(f"✅ **{len(df_filtrado):,} registros** encontrados com os filtros aplicados")
 
+    # Métricas e gráficos são respondidos pelo cubo de contagens com a mesma consulta
+    contagem_tipos = motor.contar_por(consulta, 'Primary Type', filtro_cubo).sort_values(ascending=False)
+
     ### Exibição quantitativa da análise ###
     st.header("📈 Visão Geral dos Dados Selecionados")
 
@@ -120,12 +144,12 @@ def main():
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_crimes = len(df_filtrado)
+        total_crimes = motor.total(consulta, filtro_cubo)
         st.metric("Total de crimes", f"{total_crimes:,}")
 
     with col2:
         if not df_filtrado.empty and 'Date' in df_filtrado.columns:
-            dias_unicos = df_filtrado['Date'].dt.date.nunique()
+            dias_unicos = motor.dias_distintos(consulta, filtro_cubo)
             if dias_unicos > 0:
                 crimes_por_dia = total_crimes / dias_unicos
                 st.metric("Média de crimes por dia", f"{crimes_por_dia:.1f}")
@@ -136,22 +160,19 @@ def main():
 
     with col3:
         if not df_filtrado.empty and 'Arrest' in df_filtrado.columns:
-            taxa_arrest = (df_filtrado['Arrest'].mean() * 100)
+            taxa_arrest = (motor.taxa_prisao(consulta, filtro_cubo) * 100)
             st.metric("Taxa de Prisões", f"{taxa_arrest:.1f}%")
         else:
-            if not df_filtrado.empty and 'Date' in df_filtrado.columns:
-                # Extrair hora se não existir
-                if 'Hora' not in df_filtrado.columns:
-                    df_filtrado['Hora'] = df_filtrado['Date'].dt.hour
-                hora_pico = df_filtrado['Hora'].mode()
-                hora_pico = hora_pico.iloc[0] if not hora_pico.empty else "N/D"
+            if not df_filtrado.empty and 'Hour' in df_filtrado.columns:
+                crimes_hora = motor.contar_por(consulta, 'Hour', filtro_cubo)
+                hora_pico = crimes_hora.idxmax() if not crimes_hora.empty else "N/D"
                 st.metric("Horário de Pico", f"{hora_pico}h")
             else:
                 st.metric("Horário de Pico", "N/D")
 
     with col4:
         if not df_filtrado.empty and 'Primary Type' in df_filtrado.columns:
-            principal_crime = df_filtrado['Primary Type'].value_counts().idxmax()
+            principal_crime = contagem_tipos.index[0]
             st.metric("Tipo de crime mais comum", principal_crime)
         else:
             st.metric("Tipo de crime mais comum", "N/D")
@@ -166,7 +187,7 @@ def main():
         st.subheader("Distribuição por Tipo de Crime")
         if not df_filtrado.empty and 'Primary Type' in df_filtrado.columns:
             # Gráfico de pizza para tipos de crime
-            crime_counts = df_filtrado['Primary Type'].value_counts().head(10)
+            crime_counts = contagem_tipos.head(10)
             fig_pizza = px.pie(
                 values=crime_counts.values,
                 names=crime_counts.index,
@@ -178,12 +199,8 @@ def main():
 
     with col2:
         st.subheader("Crimes por Hora do Dia")
-        if not df_filtrado.empty and 'Date' in df_filtrado.columns:
-            # Garantir que temos a coluna Hora
-            if 'Hora' not in df_filtrado.columns:
-                df_filtrado['Hora'] = df_filtrado['Date'].dt.hour
-            
-            crimes_por_hora = df_filtrado['Hora'].value_counts().sort_index()
+        if not df_filtrado.empty and 'Hour' in df_filtrado.columns:
+            crimes_por_hora = motor.contar_por(consulta, 'Hour', filtro_cubo)
             
             fig_hora = px.bar(
                 x=crimes_por_hora.index,
@@ -206,7 +223,16 @@ def main():
         st.write(f"Mostrando {len(df_filtrado)} registros:")
         
         if not df_filtrado.empty:
-            # Paginação simples
+            # Ordenação pela permutação pré-calculada da coluna (sem ordenar a seleção)
+            col_ord1, col_ord2 = st.columns([3, 1])
+            with col_ord1:
+                coluna_ordem = st.selectbox("Ordenar por:", ["(ordem original)"] + list(df_full.columns))
+            with col_ord2:
+                crescente = st.radio("Ordem:", ["Crescente", "Decrescente"], horizontal=True) == "Crescente"
+            if coluna_ordem != "(ordem original)":
+                df_filtrado = df_filtrado.ordenar(coluna_ordem, crescente)
+
+            # Paginação simples: só as linhas da página são materializadas
             page_size = 100
             total_pages = max(1, (len(df_filtrado) + page_size - 1) // page_size)
             
@@ -214,7 +240,7 @@ def main():
             start_idx = (page - 1) * page_size
             end_idx = min(start_idx + page_size, len(df_filtrado))
             
-            st.dataframe(df_filtrado.iloc[start_idx:end_idx], width='stretch')
+            st.dataframe(df_filtrado.pagina(page, page_size), width='stretch')
             
             st.write(f"Página {page} de {total_pages} | Registros {start_idx+1} a {end_idx}")
         else:
@@ -228,22 +254,20 @@ def main():
             
             with col1:
                 st.write("**Distribuição por Tipo de Crime:**")
-                crime_percentages = df_filtrado['Primary Type'].value_counts(normalize=True) * 100
+                crime_percentages = contagem_tipos / contagem_tipos.sum() * 100
                 for crime_type, percentage in crime_percentages.head(10).items():
                     st.write(f"• {crime_type}: **{percentage:.1f}%**")
                 
                 st.write("**Informações Gerais:**")
-                st.write(f"• Total de tipos distintos: **{df_filtrado['Primary Type'].nunique()}**")
-                if 'Date' in df_filtrado.columns:
-                    dias_unicos = df_filtrado['Date'].dt.date.nunique()
-                    st.write(f"• Período coberto: **{dias_unicos} dias**")
+                st.write(f"• Total de tipos distintos: **{len(contagem_tipos)}**")
+                st.write(f"• Período coberto: **{motor.dias_distintos(consulta, filtro_cubo)} dias**")
             
             with col2:
                 st.write("**Padrões Temporais:**")
-                if 'Date' in df_filtrado.columns:
-                    df_filtrado['Dia_Semana'] = df_filtrado['Date'].dt.day_name()
-                    dias_ordenados = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                    crimes_dia = df_filtrado['Dia_Semana'].value_counts().reindex(dias_ordenados, fill_value=0)
+                if 'Weekday' in df_filtrado.columns:
+                    # Weekday: 0 = segunda-feira
+                    crimes_dia = motor.contar_por(consulta, 'Weekday', filtro_cubo).reindex(range(7), fill_value=0)
+                    crimes_dia.index = DIAS_SEMANA
                     
                     st.write("**Crimes por dia da semana:**")
                     for dia, count in crimes_dia.items():
@@ -261,15 +285,47 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                # Download CSV
-                csv = df_filtrado.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download como CSV",
-                    data=csv,
-                    file_name=f"chicago_crimes_filtrados_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+                formato = st.selectbox("Formato:", list(FORMATOS_EXPORTACAO))
+                extensao, mime = FORMATOS_EXPORTACAO[formato]
+
+                # O arquivo só é gerado quando pedido e vale para os filtros, a ordem e o formato atuais
+                assinatura = (consulta, df_filtrado.coluna, df_filtrado.crescente, formato)
+                exportacao = st.session_state.get('exportacao')
+                if exportacao and exportacao['assinatura'] != assinatura:
+                    # Filtros, ordem ou formato mudaram: o arquivo gerado não vale mais
+                    remover_exportacao(exportacao['caminho'])
+                    exportacao = st.session_state.exportacao = None
+
+                if st.button("⚙️ Gerar arquivo para download", width='stretch'):
+                    if exportacao:
+                        remover_exportacao(exportacao['caminho'])
+                    with st.spinner("Gerando arquivo..."):
+                        caminho = exportar_consulta(df_filtrado, formato)
+                    exportacao = {
+                        'assinatura': assinatura,
+                        'caminho': caminho,
+                        'nome': f"chicago_crimes_filtrados_{datetime.now().strftime('%Y%m%d_%H%M')}.{extensao}",
+                    }
+                    st.session_state.exportacao = exportacao
+
+                # O botão de download guarda o arquivo inteiro em memória (o Streamlit não
+                # faz streaming): o pico é o tamanho do arquivo, limitado a EXPORT_DOWNLOAD_BYTES
+                if exportacao and os.path.exists(exportacao['caminho']) and \
+                        os.path.getsize(exportacao['caminho']) > EXPORT_DOWNLOAD_BYTES:
+                    st.warning(f"⚠️ Arquivo de {os.path.getsize(exportacao['caminho']) / 1024**2:,.0f} MB acima do "
+                               f"limite de download ({EXPORT_DOWNLOAD_BYTES / 1024**2:,.0f} MB). "
+                               "Use CSV (gzip) ou Parquet, ou restrinja os filtros.")
+                    remover_exportacao(exportacao['caminho'])
+                    exportacao = st.session_state.exportacao = None
+                if exportacao and os.path.exists(exportacao['caminho']):
+                    with open(exportacao['caminho'], 'rb') as arquivo:
+                        st.download_button(
+                            label=f"📥 Download como {formato}",
+                            data=arquivo,
+                            file_name=exportacao['nome'],
+                            mime=mime,
+                            width='stretch'
+                        )
             
             with col2:
                 # Estatísticas do dataset
@@ -277,8 +333,12 @@ def main():
                 st.write(f"• Registros: {len(df_filtrado):,}")
                 st.write(f"• Colunas: {len(df_filtrado.columns)}")
                 if 'Date' in df_filtrado.columns:
-                    st.write(f"• Período: {df_filtrado['Date'].min().strftime('%d/%m/%Y')} a {df_filtrado['Date'].max().strftime('%d/%m/%Y')}")
+                    datas = df_filtrado.coluna_selecionada('Date')
+                    st.write(f"• Período: {datas.min().strftime('%d/%m/%Y')} a {datas.max().strftime('%d/%m/%Y')}")
         else:
+            exportacao = st.session_state.pop('exportacao', None)
+            if exportacao:
+                remover_exportacao(exportacao['caminho'])
             st.warning("Nenhum dado disponível para exportação.")
 
     # Footer
@@ -21,7 +21,11 @@ st.set_page_config(
 
 # Importa a função load_data do app.py principal
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from app import load_data
+from app import load_cube
+from filter_index import FiltroIncremental
+from timeseries import GRANULARIDADES, agregar_serie
+from crime_query import CrimeQuery, MotorConsultas
+from stats_summary import resumo_diario
 
 warnings.filterwarnings('ignore')
 
@@ -33,12 +37,12 @@ def main():
     Explore padrões temporais, sazonalidade e tendências dos crimes ao longo do tempo.
     """)
 
-    # Carregar dados
+    # Carregar o cubo de contagens (2014-2024); as séries saem dele, sem ler os registros
     with st.spinner("Carregando dados de 2014-2024..."):
-        df = load_data((2014, 2024))  # Carregar dados de 2014-2024 para análise completa
+        cubo = load_cube()
 
     # Verificar se os dados foram carregados corretamente
-    if df is None or df.empty:
+    if cubo.total() == 0:
         st.error("❌ Não foi possível carregar os dados. Verifique se os arquivos estão na pasta 'data_splits'.")
         return
 
@@ -46,14 +50,14 @@ def main():
     st.sidebar.header("🎯 Controles de Análise")
 
     # Filtros interativos
-    crime_types = sorted(df['Primary Type'].unique())
+    crime_types = cubo.valores('Primary Type')
     selected_crimes = st.sidebar.multiselect(
         "Tipos de Crime:",
         options=crime_types,
         default=['THEFT', 'BATTERY', 'ASSAULT'] if 'THEFT' in crime_types else crime_types[:3]
     )
 
-    available_years = sorted(df['Year'].unique())
+    available_years = cubo.valores('Year')
     selected_years = st.sidebar.multiselect(
         "Anos:",
         options=available_years,
@@ -62,50 +66,29 @@ def main():
 
     analysis_granularity = st.sidebar.radio(
         "Agregação Temporal:",
-        ["Diária", "Mensal", "Anual"],
+        list(GRANULARIDADES),
         index=1
     )
 
-    # Aplicar filtros
-    df_filtered = df[
-        (df['Primary Type'].isin(selected_crimes)) & 
-        (df['Year'].isin(selected_years))
-    ].copy()
+    # Aplicar filtros: a consulta é respondida pelo cubo, reaproveitando o resultado do rerun anterior
+    motor = MotorConsultas(None, cubo=cubo)
+    consulta = CrimeQuery(types=selected_crimes, years=selected_years)
+    filtro = st.session_state.get('filtro_exploratoria')
+    if filtro is None or filtro.indice is not cubo:
+        filtro = FiltroIncremental(cubo)
+        st.session_state.filtro_exploratoria = filtro
+    total_filtrado = motor.total(consulta, filtro)
 
-    st.sidebar.info(f"📊 Registros filtrados: {len(df_filtered):,}")
+    st.sidebar.info(f"📊 Registros filtrados: {total_filtrado:,}")
 
     # Função para preparar dados temporais - CORRIGIDA
-    def prepare_temporal_data(df, granularity):
-        """Prepara dados temporais com agregação correta"""
-        if df.empty:
-            return pd.DataFrame(columns=['ds', 'y'])
-        
-        # Garantir que temos a coluna Date
-        if 'Date' not in df.columns:
-            st.error("Coluna 'Date' não encontrada nos dados")
-            return pd.DataFrame(columns=['ds', 'y'])
-        
-        # Criar cópia para não modificar o original
-        df_temp = df.copy()
-        
-        if granularity == "Diária":
-            # Agrupar por dia
-            temporal_data = df_temp.groupby(df_temp['Date'].dt.date).size().reset_index()
-            temporal_data.columns = ['ds', 'y']
-            temporal_data['ds'] = pd.to_datetime(temporal_data['ds'])
-            
-        elif granularity == "Mensal":
-            # Agrupar por mês (primeiro dia do mês)
-            temporal_data = df_temp.groupby(pd.Grouper(key='Date', freq='ME')).size().reset_index()
-            temporal_data.columns = ['ds', 'y']
-            
-        else:  # Anual
-            # Agrupar por ano
-            temporal_data = df_temp.groupby(df_temp['Date'].dt.year).size().reset_index()
-            temporal_data.columns = ['ds', 'y']
-            temporal_data['ds'] = pd.to_datetime(temporal_data['ds'].astype(str) + '-01-01')
-        
-        return temporal_data.sort_values('ds')
+    def prepare_temporal_data(consulta, granularity):
+        """
+        Prepara dados temporais com agregação correta a partir do cubo.
+        A série diária é calculada uma vez por consulta (ver timeseries.py)
+        e reaproveitada pelas três abas.
+        """
+        return agregar_serie(motor.serie_diaria(consulta), granularity)
 
     # Layout principal com tabs
     tab1, tab2, tab3 = st.tabs(["📊 Série Temporal", "📈 Estatísticas", "🔍 Padrões"])
@@ -113,10 +96,10 @@ def main():
     with tab1:
         st.subheader("Análise da Série Temporal")
         
-        if df_filtered.empty:
+        if total_filtrado == 0:
             st.warning("Nenhum dado encontrado com os filtros selecionados.")
         else:
-            temporal_data = prepare_temporal_data(df_filtered, analysis_granularity)
+            temporal_data = prepare_temporal_data(consulta, analysis_granularity)
             
             if temporal_data.empty:
                 st.warning("Não foi possível gerar dados temporais com os filtros selecionados.")
@@ -153,12 +136,13 @@ def main():
     with tab2:
         st.subheader("Estatísticas Descritivas")
         
-        if df_filtered.empty:
+        if total_filtrado == 0:
             st.warning("Nenhum dado encontrado com os filtros selecionados.")
         else:
-            daily_data = prepare_temporal_data(df_filtered, "Diária")
+            # Estatísticas das contagens diárias combinando os resumos de cada ano
+            resumo = resumo_diario(cubo, selected_crimes, selected_years)
             
-            if daily_data.empty:
+            if resumo.n == 0:
                 st.warning("Não foi possível gerar dados diários com os filtros selecionados.")
             else:
                 col1, col2 = st.columns(2)
@@ -168,12 +152,12 @@ def main():
                     stats = {
                         'Métrica': ['Total', 'Média', 'Mediana', 'Desvio Padrão', 'Máximo', 'Mínimo'],
                         'Valor': [
-                            f"{daily_data['y'].sum():,}",
-                            f"{daily_data['y'].mean():.2f}",
-                            f"{daily_data['y'].median():.2f}",
-                            f"{daily_data['y'].std():.2f}",
-                            f"{daily_data['y'].max():,}",
-                            f"{daily_data['y'].min():,}"
+                            f"{resumo.soma:,}",
+                            f"{resumo.media:.2f}",
+                            f"{resumo.mediana:.2f}",
+                            f"{resumo.desvio_padrao:.2f}",
+                            f"{resumo.maximo:,}",
+                            f"{resumo.minimo:,}"
                         ]
                     }
                     stats_df = pd.DataFrame(stats)
@@ -181,24 +165,25 @@ def main():
                 
                 with col2:
                     st.subheader("📊 Distribuição")
-                    fig_hist = px.histogram(
-                        daily_data, 
-                        x='y', 
-                        nbins=20,
+                    centros, frequencias = resumo.faixas(20)
+                    fig_hist = px.bar(
+                        x=centros,
+                        y=frequencias,
                         title='Distribuição de Crimes por Dia',
-                        labels={'y': 'Número de Crimes'},
+                        labels={'x': 'Número de Crimes', 'y': 'count'},
                         color_discrete_sequence=['#1f77b4']
                     )
+                    fig_hist.update_layout(bargap=0)
                     st.plotly_chart(fig_hist, width='stretch')
 
     with tab3:
         st.subheader("Análise de Padrões")
         
-        if df_filtered.empty:
+        if total_filtrado == 0:
             st.warning("Nenhum dado encontrado com os filtros selecionados.")
         else:
             # Preparar dados diários para análise de padrões
-            daily_data = prepare_temporal_data(df_filtered, "Diária")
+            daily_data = prepare_temporal_data(consulta, "Diária")
             
             if daily_data.empty:
                 st.warning("Não foi possível gerar dados diários para análise de padrões.")
@@ -244,8 +229,9 @@ def main():
                 # SEÇÃO CORRIGIDA - Análise de Outliers
                 st.subheader("🚨 Análise de Valores Atípicos")
                 
-                Q1 = daily_data['y'].quantile(0.25)
-                Q3 = daily_data['y'].quantile(0.75)
+                resumo = resumo_diario(cubo, selected_crimes, selected_years)
+                Q1 = resumo.quantil(0.25)
+                Q3 = resumo.quantil(0.75)
                 IQR = Q3 - Q1
                 limite_superior = Q3 + 1.5 * IQR
                 
@@ -270,15 +256,15 @@ def main():
                 # Distribuição de frequência
                 st.subheader("📊 Distribuição de Frequência")
                 
-                fig_dist = px.histogram(
-                    daily_data,
-                    x='y',
-                    nbins=30,
+                centros, frequencias = resumo.faixas(30)
+                fig_dist = px.bar(
+                    x=centros,
+                    y=frequencias,
                     title='Distribuição de Crimes por Dia',
-                    labels={'y': 'Número de Crimes', 'count': 'Frequência'},
+                    labels={'x': 'Número de Crimes', 'y': 'Frequência'},
                     color_discrete_sequence=['#1f77b4']
                 )
-                fig_dist.update_layout(yaxis_title='Frequência')
+                fig_dist.update_layout(yaxis_title='Frequência', bargap=0)
                 
                 st.plotly_chart(fig_dist, width='stretch')
 
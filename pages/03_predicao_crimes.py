@@ -5,10 +5,6 @@ import numpy as np
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from sklearn.metrics import mean_absolute_error, mean_squared_error, mean_absolute_percentage_error
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import holidays
 from datetime import timedelta
 import warnings
 import sys
@@ -19,10 +15,163 @@ st.set_page_config(page_title="Predição Crimes", layout="wide")
 
 # Importa a função load_data do app.py principal
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from app import load_data
+from app import load_cube
+from crime_query import CrimeQuery, MotorConsultas
+from forecasting import (dividir_treino_teste, preparar_features_rf, prever_prophet, prever_random_forest,
+                         metricas_previsao)
+from model_store import MODELOS
+from batch_forecast import prever_lote, salvar_lote, rotulo_economia
+from backtesting import ESQUEMAS, folds_origem_movel, executar_backtest
+from config import BATCH_WORKERS, BATCH_TIMEOUT
 
 warnings.filterwarnings('ignore')
 
+def mostrar_origem_modelo(info):
+    """Informa se o modelo foi lido do repositório de modelos ou treinado agora"""
+    if info['do_repositorio']:
+        st.info(f"♻️ Modelo já treinado com estes dados e parâmetros, lido do repositório em {info['segundos'] * 1000:.0f} ms")
+    elif 'aquecimento' in info:
+        economia = info['segundos_economizados']
+        st.write(f"🔥 Modelo treinado em {info['segundos']:.1f} s com warm start ({info['aquecimento']}) | "
+                 f"ajuste: {info['segundos_ajuste']:.1f} s, do zero: ~{info['segundos_frio']:.1f} s "
+                 f"({rotulo_economia(info.get('economia_estimada'))}), "
+                 + (f"{economia:.1f} s economizados" if economia > 0 else "sem economia de tempo"))
+    else:
+        st.write(f"⏱️ Modelo treinado em {info['segundos']:.1f} s (salvo no repositório de modelos)")
+
+def mostrar_warm_start(metricas, unidade):
+    """Quantos modelos de um lote/backtest partiram de um modelo salvo e o tempo economizado"""
+    if 'segundos_economizados' not in metricas.columns:
+        return
+    aquecidos = metricas['segundos_economizados'].dropna()
+    if not aquecidos.empty:
+        rotulo = rotulo_economia(metricas.loc[aquecidos.index, 'economia_estimada'])
+        st.info(f"🔥 {len(aquecidos)} {unidade} treinados com warm start a partir de modelos salvos: "
+                f"~{aquecidos.sum():.1f} s economizados em relação ao treino do zero ({rotulo})")
+
+def mostrar_repositorio_modelos():
+    """Resumo do repositório de modelos treinados, com opção de limpá-lo"""
+    with st.sidebar.expander("🗄️ Modelos Salvos"):
+        entradas = MODELOS.entradas()
+        st.write(f"{len(entradas)} modelos | {sum(e['bytes'] for e in entradas) / 1024**2:.1f} MB "
+                 f"de {MODELOS.max_bytes / 1024**2:.0f} MB")
+        if entradas and st.button("Limpar modelos salvos"):
+            MODELOS.limpar()
+            st.rerun()
+
+def mostrar_backtest(modelo, crime, anos, parametros):
+    """Backtesting com origem móvel (ver backtesting.py): métricas por fold e agregadas"""
+    st.markdown("---")
+    st.subheader("🧪 Backtesting (Origem Móvel)")
+    st.write(f"{modelo} para **{crime}**: cada fold treina até um ano e testa no ano seguinte")
+    if len(anos) < 3:
+        # Com dois anos só há um fold possível (e o slider ficaria com mínimo igual ao máximo)
+        st.info("ℹ️ O backtesting precisa de pelo menos 3 anos com dados")
+        return
+
+    col1, col2 = st.columns(2)
+    esquema = col1.radio("Janela de treino", ESQUEMAS, horizontal=True,
+                         help="Expansiva: desde o primeiro ano | Deslizante: tamanho fixo")
+    janela = col2.slider("Anos de treino (primeiro fold)", 1, len(anos) - 1, min(3, len(anos) - 1))
+    folds = folds_origem_movel(anos, janela, esquema)
+    st.caption(f"{len(folds)} folds: testes de {folds[0][1]} a {folds[-1][1]}" if folds else "Sem folds")
+
+    if folds and st.button("🧪 Executar Backtesting"):
+        barra = st.progress(0.0, text="Iniciando processos...")
+
+        def progresso(concluidos, total, linha):
+            barra.progress(concluidos / total, text=f"{concluidos}/{total} folds | último: teste {linha['ano_teste']}")
+
+        metricas, _, resumo = executar_backtest(modelo, crime, anos, janela, esquema, parametros,
+                                                progresso=progresso)
+        st.session_state.backtest = {
+            'descricao': f"{modelo} | {crime} | janela {esquema.lower()} de {janela} anos",
+            'metricas': metricas,
+            'resumo': resumo,
+        }
+
+    backtest = st.session_state.get('backtest')
+    if backtest is None:
+        return
+
+    metricas = backtest['metricas']
+    concluidos = metricas[metricas['status'] == 'ok']
+    st.success(f"✅ {backtest['descricao']}: {len(concluidos)} de {len(metricas)} folds concluídos")
+    if 'do_repositorio' in concluidos.columns and concluidos['do_repositorio'].any():
+        st.info(f"♻️ {int(concluidos['do_repositorio'].sum())} folds reaproveitados do repositório de modelos")
+    mostrar_warm_start(concluidos, 'folds')
+
+    st.markdown("**Métricas agregadas:**")
+    st.dataframe(backtest['resumo'].round(2), width='stretch')
+
+    st.markdown("**Métricas por fold:**")
+    colunas = [coluna for coluna in ['treino_inicio', 'treino_fim', 'ano_teste', 'status', 'mape', 'mae', 'rmse',
+                                     'dias_teste', 'segundos', 'erro'] if coluna in metricas.columns]
+    st.dataframe(metricas[colunas].round(2), width='stretch')
+
+    if not concluidos.empty:
+        fig = go.Figure()
+        for metrica, cor in (('mape', 'red'), ('mae', 'blue'), ('rmse', 'green')):
+            fig.add_trace(go.Scatter(x=concluidos['ano_teste'], y=concluidos[metrica], mode='lines+markers',
+                                     name=metrica.upper(), line=dict(color=cor),
+                                     yaxis='y2' if metrica == 'mape' else 'y'))
+        fig.update_layout(
+            title='Erro por Ano de Teste',
+            xaxis_title='Ano de Teste',
+            yaxis=dict(title='MAE / RMSE (crimes por dia)'),
+            yaxis2=dict(title='MAPE (%)', overlaying='y', side='right'),
+            hovermode='x unified',
+            height=400
+        )
+        st.plotly_chart(fig, width='stretch')
+
+def mostrar_previsao_lote(cubo, modelo, train_years, test_year, parametros):
+    """Previsão de todos os tipos de crime em paralelo (ver batch_forecast.py), com download em Parquet"""
+    st.markdown("---")
+    st.subheader("📦 Previsão em Lote")
+    st.write(f"{modelo} para **todos os tipos de crime** | Treino: {min(train_years)} a {max(train_years)} | "
+             f"Teste: {test_year}")
+
+    col1, col2, col3 = st.columns(3)
+    por_distrito = col1.checkbox("Também por distrito", value=False)
+    workers = col2.number_input("Processos em paralelo", min_value=1, max_value=64, value=min(BATCH_WORKERS, 64))
+    timeout = col3.number_input("Tempo máximo por modelo (s)", min_value=0, value=BATCH_TIMEOUT,
+                                help="0 = sem limite")
+
+    if st.button("🚀 Prever Todos os Tipos"):
+        barra = st.progress(0.0, text="Iniciando processos...")
+
+        def progresso(concluidas, total, linha):
+            barra.progress(concluidas / total, text=f"{concluidas}/{total} modelos | último: {linha['crime']}")
+
+        metricas, previsoes = prever_lote(modelo, train_years, test_year, parametros, por_distrito=por_distrito,
+                                          workers=int(workers), timeout=int(timeout), progresso=progresso,
+                                          cubo=cubo)
+        st.session_state.previsao_lote = {
+            'pasta': salvar_lote(metricas, previsoes, modelo),
+            'metricas': metricas,
+        }
+
+    lote = st.session_state.get('previsao_lote')
+    if lote is None:
+        return
+
+    metricas = lote['metricas']
+    falhas = metricas[metricas['status'] != 'ok']
+    st.success(f"✅ {len(metricas) - len(falhas)} de {len(metricas)} modelos concluídos | salvos em `{lote['pasta']}`")
+    if not falhas.empty:
+        st.warning(f"⚠️ {len(falhas)} modelos não concluídos (erro ou tempo máximo)")
+    mostrar_warm_start(metricas, 'modelos')
+
+    colunas = [coluna for coluna in ['crime', 'distrito', 'status', 'mape', 'mae', 'rmse', 'segundos', 'erro']
+               if coluna in metricas.columns]
+    st.dataframe(metricas[colunas].round(2), width='stretch')
+
+    col1, col2 = st.columns(2)
+    for coluna, arquivo in zip((col1, col2), ('metricas.parquet', 'previsoes.parquet')):
+        with open(os.path.join(lote['pasta'], arquivo), 'rb') as dados:
+            coluna.download_button(f"📥 {arquivo}", dados, file_name=arquivo, key=f"lote_{arquivo}")
+
 def main():
     # Título e navegação
     st.title("🔮 Predição Crimes")
@@ -30,11 +179,12 @@ def main():
         st.switch_page("app.py")
 
     # Carregar dados
+    # As séries diárias saem do cubo de contagens (2014-2024), sem ler os registros
     with st.spinner("Carregando dados de 2014-2024..."):
-        df = load_data((2014, 2024))  # Carregar dados completos para análise
+        cubo = load_cube()
 
     # Verificar se os dados foram carregados corretamente
-    if df is None or df.empty:
+    if cubo.total() == 0:
         st.error("❌ Não foi possível carregar os dados. Verifique se os arquivos estão na pasta 'data_splits'.")
         return
 
@@ -47,14 +197,14 @@ def main():
     )
 
     # Filtros comuns
-    crime_types = sorted(df['Primary Type'].unique())
+    crime_types = cubo.valores('Primary Type')
     selected_crime = st.sidebar.selectbox(
         "Tipo de Crime", 
         crime_types,
         index=crime_types.index('THEFT') if 'THEFT' in crime_types else 0
     )
 
-    available_years = sorted(df['Year'].unique())
+    available_years = cubo.valores('Year')
 
     # CONFIGURAÇÕES PARA AMBOS OS MODELOS (DIÁRIOS)
     st.sidebar.header("📅 Configurações Temporais")
@@ -111,6 +261,8 @@ def main():
         lags_dias = st.sidebar.slider("Lags (dias históricos)", 7, 90, 14)
         include_weekends = st.sidebar.checkbox("Incluir Features de Fim de Semana", value=True)
 
+    mostrar_repositorio_modelos()
+
     # VERIFICAÇÃO DE SEGURANÇA
     if not train_years or not test_year:
         st.error("❌ Selecione anos para treino e teste para continuar.")
@@ -122,46 +274,34 @@ def main():
         return
 
     # Verificar se há dados suficientes
-    df_filtered = df[(df['Primary Type'] == selected_crime) & 
-                     (df['Year'].isin(train_years + [test_year]))]
+    consulta = CrimeQuery(types=[selected_crime], years=train_years + [test_year])
+    dados_diarios = MotorConsultas(None, cubo=cubo).serie_diaria(consulta, preencher=True)
 
-    if df_filtered.empty:
+    if dados_diarios.empty:
         st.error("❌ Não há dados para os anos selecionados!")
         return
 
-    st.sidebar.success(f"✅ Dados carregados: {len(df_filtered):,} registros")
-    st.sidebar.write(f"📊 Período: {df_filtered['Date'].min().strftime('%d/%m/%Y')} a {df_filtered['Date'].max().strftime('%d/%m/%Y')}")
+    st.sidebar.success(f"✅ Dados carregados: {int(dados_diarios['y'].sum()):,} registros")
+    st.sidebar.write(f"📊 Período: {dados_diarios['ds'].min().strftime('%d/%m/%Y')} a {dados_diarios['ds'].max().strftime('%d/%m/%Y')}")
 
     # FUNÇÃO CORRIGIDA: Preparar e dividir dados
-    def preparar_e_dividir_dados(df_filtrado, train_years, test_year):
-        """Prepara dados diários e divide corretamente"""
+    def preparar_e_dividir_dados(dados_diarios, train_years, test_year):
+        """Divide a série diária (ds, y) em treino e teste"""
         # Garantir que temos dados
-        if df_filtrado.empty:
+        if dados_diarios.empty:
             return pd.DataFrame(), pd.DataFrame(), None
         
-        # Criar dados diários
-        dados_diarios = df_filtrado.resample('D', on='Date').size().reset_index()
-        dados_diarios.columns = ['ds', 'y']
-        
-        # Usar o final do último ano de treino como corte
-        ultimo_ano_treino = max(train_years)
-        data_corte = pd.Timestamp(f"{ultimo_ano_treino}-12-31")
-        
-        # Verificar se a data de corte está dentro dos dados
-        if data_corte < dados_diarios['ds'].min() or data_corte > dados_diarios['ds'].max():
-            st.error(f"❌ Data de corte {data_corte.strftime('%d/%m/%Y')} fora do range dos dados")
+        try:
+            return dividir_treino_teste(dados_diarios, train_years)
+        except ValueError as e:
+            st.error(f"❌ {e}")
             return pd.DataFrame(), pd.DataFrame(), None
-        
-        dados_treino = dados_diarios[dados_diarios['ds'] <= data_corte]
-        dados_teste = dados_diarios[dados_diarios['ds'] > data_corte]
-        
-        return dados_treino, dados_teste, data_corte
 
     # Botão para executar previsão
     if st.button(f"🚀 Executar {modelo_selecionado} (Dados Diários)", type="primary"):
         
         # Preparar dados
-        dados_treino, dados_teste, data_corte = preparar_e_dividir_dados(df_filtered, train_years, test_year)
+        dados_treino, dados_teste, data_corte = preparar_e_dividir_dados(dados_diarios, train_years, test_year)
         
         # Verificar se as divisões não estão vazias
         if dados_treino.empty or dados_teste.empty:
@@ -174,35 +314,20 @@ def main():
         if modelo_selecionado == "Prophet":
             with st.spinner("Treinando modelo Prophet..."):
                 try:
-                    # Tentar importar Prophet
+                    # Verificar se o Prophet está instalado
                     try:
-                        from prophet import Prophet
+                        import prophet  # noqa: F401
                     except ImportError:
                         st.error("❌ Biblioteca Prophet não instalada. Execute: pip install prophet")
                         return
                     
-                    # Configurar o modelo Prophet
-                    model = Prophet(
-                        seasonality_mode=seasonality_mode,
-                        yearly_seasonality=True,
-                        weekly_seasonality=True,
-                        daily_seasonality=False
+                    # Treinar o modelo (ou reaproveitar o já treinado com os mesmos dados e configuração)
+                    resultados, artefatos, info_modelo = prever_prophet(
+                        dados_treino, dados_teste, seasonality_mode, include_holidays,
+                        repositorio=MODELOS, crime=selected_crime,
                     )
-                    
-                    # Adicionar feriados se selecionado
-                    if include_holidays:
-                        model.add_country_holidays(country_name='US')
-                    
-                    # Treinar o modelo
-                    model.fit(dados_treino)
-                    
-                    # Criar dataframe futuro para previsão
-                    future = model.make_future_dataframe(periods=len(dados_teste), freq='D', include_history=False)
-                    forecast = model.predict(future)
-                    
-                    # Combinar previsões com dados reais
-                    forecast_test = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
-                    resultados = pd.merge(dados_teste, forecast_test, on='ds', how='left')
+                    model, forecast = artefatos['modelo'], artefatos['previsao']
+                    mostrar_origem_modelo(info_modelo)
                     
                     # Calcular métricas
                     valid_results = resultados.dropna()
@@ -210,10 +335,8 @@ def main():
                         st.error("❌ Não foi possível calcular métricas - dados inválidos")
                         return
                     
-                    mape = mean_absolute_percentage_error(valid_results['y'], valid_results['yhat']) * 100
-                    mae = mean_absolute_error(valid_results['y'], valid_results['yhat'])
-                    mse = mean_squared_error(valid_results['y'], valid_results['yhat'])
-                    rmse = np.sqrt(mse)
+                    metricas = metricas_previsao(valid_results['y'], valid_results['yhat'])
+                    mape, mae, mse, rmse = metricas['mape'], metricas['mae'], metricas['mse'], metricas['rmse']
                     
                     # Exibir métricas
                     st.success("✅ Previsão Prophet concluída!")
@@ -294,105 +417,34 @@ def main():
         else:  # RANDOM FOREST COM DADOS DIÁRIOS
             with st.spinner("Treinando Random Forest (dados diários)..."):
                 try:
-                    # 1. Combinar dados de treino e teste
-                    df_rf = pd.concat([dados_treino, dados_teste]).set_index('ds')
-                    df_rf = df_rf.sort_index()
-
-                    # 2. Função para criar features DIÁRIAS
-                    def criar_features_diarias_sklearn(df, lags_dias=30):
-                        """Cria features temporais DIÁRIAS para scikit-learn"""
-                        
-                        df_features = df.copy()
-                        
-                        # Features básicas de tempo DIÁRIAS
-                        df_features['day_of_week'] = df_features.index.dayofweek
-                        df_features['day_of_month'] = df_features.index.day
-                        df_features['month'] = df_features.index.month
-                        df_features['year'] = df_features.index.year
-                        df_features['quarter'] = df_features.index.quarter
-                        df_features['week_of_year'] = df_features.index.isocalendar().week.astype(int)
-                        
-                        # Fim de semana
-                        df_features['is_weekend'] = (df_features.index.dayofweek >= 5).astype(int)
-                        
-                        # Feriados
-                        us_holidays = holidays.US()
-                        df_features['is_holiday'] = [date in us_holidays for date in df_features.index]
-                        df_features['is_holiday'] = df_features['is_holiday'].astype(int)
-                        
-                        # Estações do ano
-                        def get_season(month):
-                            if month in [12, 1, 2]: return 0  # Inverno
-                            elif month in [3, 4, 5]: return 1  # Primavera
-                            elif month in [6, 7, 8]: return 2  # Verão
-                            else: return 3  # Outono
-                        
-                        df_features['season'] = df_features.index.month.map(get_season)
-                        
-                        # Final de ano
-                        df_features['is_year_end'] = df_features.index.month.isin([11, 12]).astype(int)
-                        
-                        # Lags DIÁRIOS
-                        for lag in range(1, lags_dias + 1):
-                            df_features[f'lag_{lag}d'] = df_features['y'].shift(lag)
-                        
-                        # Médias móveis DIÁRIAS
-                        df_features['rolling_mean_7d'] = df_features['y'].rolling(window=7, min_periods=1).mean()
-                        df_features['rolling_mean_30d'] = df_features['y'].rolling(window=30, min_periods=1).mean()
-                        
-                        return df_features
-
-                    # Criar features diárias
-                    crimes_com_features = criar_features_diarias_sklearn(df_rf, lags_dias)
-                    
-                    # Remover linhas com NaN (devido aos lags)
-                    crimes_com_features = crimes_com_features.dropna()
-                    
-                    if crimes_com_features.empty:
+                    # 1-3. Features diárias da série completa, divididas na data de corte
+                    train, test, feature_columns = preparar_features_rf(dados_treino, dados_teste, data_corte, lags_dias)
+
+                    if train.vazio and test.vazio:
                         st.error("❌ Não foi possível criar features - dados insuficientes após processamento")
                         return
                     
-                    st.write(f"📈 Features diárias criadas: {len(crimes_com_features.columns) - 1} variáveis")
+                    st.write(f"📈 Features diárias criadas: {len(feature_columns)} variáveis")
 
-                    # 3. Split treino/teste
-                    train = crimes_com_features[crimes_com_features.index <= data_corte]
-                    test = crimes_com_features[crimes_com_features.index > data_corte]
-
-                    if train.empty or test.empty:
+                    if train.vazio or test.vazio:
                         st.error("❌ Não há dados suficientes para treino e teste com o período selecionado.")
                         return
 
                     st.write(f"🎯 Treino: {len(train)} dias | Teste: {len(test)} dias")
 
-                    # 4. Preparar features e target
-                    feature_columns = [col for col in crimes_com_features.columns if col != 'y']
-                    X_train = train[feature_columns]
-                    y_train = train['y']
-                    X_test = test[feature_columns]
-                    y_test = test['y']
-
-                    # 5. Normalizar features
-                    scaler = StandardScaler()
-                    X_train_scaled = scaler.fit_transform(X_train)
-                    X_test_scaled = scaler.transform(X_test)
-
-                    # 6. Modelo Random Forest
-                    model_rf = RandomForestRegressor(
-                        n_estimators=n_estimators,
-                        random_state=42,
-                        n_jobs=-1
+                    # 4-7. Normalizar, treinar o Random Forest (ou reaproveitar o já treinado) e prever
+                    resultados, artefatos, info_modelo = prever_random_forest(
+                        train, test, n_estimators, lags_dias,
+                        repositorio=MODELOS, crime=selected_crime,
                     )
-
-                    model_rf.fit(X_train_scaled, y_train)
-
-                    # 7. Previsões
-                    y_pred = model_rf.predict(X_test_scaled)
+                    model_rf = artefatos['modelo']
+                    mostrar_origem_modelo(info_modelo)
+                    y_test = pd.Series(test.y, index=test.datas)
+                    y_pred = resultados['yhat'].to_numpy()
 
                     # 8. Métricas
-                    mape_rf = mean_absolute_percentage_error(y_test, y_pred) * 100
-                    mae_rf = mean_absolute_error(y_test, y_pred)
-                    mse_rf = mean_squared_error(y_test, y_pred)
-                    rmse_rf = np.sqrt(mse_rf)
+                    metricas = metricas_previsao(y_test, y_pred)
+                    mape_rf, mae_rf, mse_rf, rmse_rf = metricas['mape'], metricas['mae'], metricas['mse'], metricas['rmse']
 
                     # Exibir métricas
                     st.success("✅ Previsão Random Forest (Diária) concluída!")
@@ -415,7 +467,7 @@ def main():
                     
                     # Treino
                     fig.add_trace(go.Scatter(
-                        x=train.index, y=train['y'],
+                        x=train.datas, y=train.y,
                         mode='lines', name='Treino',
                         line=dict(color='blue', width=1),
                         opacity=0.7
@@ -517,6 +569,14 @@ def main():
             - Identifica padrões não-lineares complexos
             """)
 
+    # Backtesting do tipo selecionado e previsão em lote de todos os tipos, com o mesmo modelo
+    if modelo_selecionado == "Prophet":
+        parametros_modelo = {'seasonality_mode': seasonality_mode, 'include_holidays': include_holidays}
+    else:
+        parametros_modelo = {'n_estimators': n_estimators, 'lags_dias': lags_dias}
+    mostrar_backtest(modelo_selecionado, selected_crime, available_years_sorted, parametros_modelo)
+    mostrar_previsao_lote(cubo, modelo_selecionado, train_years, test_year, parametros_modelo)
+
     # Footer
     st.markdown("---")
     st.markdown("**Módulo de Predição - Chicago Crime Analytics**")
@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import folium
 from streamlit_folium import st_folium
-from sklearn.cluster import DBSCAN
 import matplotlib.pyplot as plt
 import datetime
 import warnings
@@ -19,7 +17,13 @@ st.set_page_config(
 
 # Importa a função load_data do app.py principal
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from app import load_data
+from app import load_data, load_query_engine
+from data_loader import COLUNAS_PAGINAS
+from crime_cube import LIMITES_CHICAGO
+from crime_query import CrimeQuery
+from spatial import (MAX_PONTOS_DBSCAN, mapa_base, amostrar_pontos, executar_dbscan,
+                     resumo_clusters, estatisticas_clusters, adicionar_mapa_calor, adicionar_clusters,
+                     adicionar_pontos)
 
 warnings.filterwarnings('ignore')
 
@@ -33,7 +37,8 @@ def main():
 
     # Carregar dados
     with st.spinner("Carregando dados de 2014-2024..."):
-        df = load_data((2014, 2024))  # Carregar dados completos para análise
+        df = load_data((2014, 2024), COLUNAS_PAGINAS['analise_espacial'])  # Carregar dados completos para análise
+        motor = load_query_engine((2014, 2024), COLUNAS_PAGINAS['analise_espacial'])
 
     # Verificar se os dados foram carregados corretamente
     if df is None or df.empty:
@@ -51,7 +56,7 @@ def main():
     st.sidebar.subheader("🔍 Filtros de Dados")
 
     # Seleção de tipos de crime
-    crime_types = sorted(df['Primary Type'].unique())
+    crime_types = motor.indice.valores('Primary Type')
     selected_crimes = st.sidebar.multiselect(
         "Tipos de Crime:",
         options=crime_types,
@@ -59,7 +64,7 @@ def main():
     )
 
     # Seleção de ano
-    available_years = sorted(df['Year'].unique())
+    available_years = motor.indice.valores('Year')
     selected_years = st.sidebar.multiselect(
         "Anos:",
         options=available_years,
@@ -89,26 +94,14 @@ def main():
         min_samples_value = st.sidebar.slider("Mínimo de Amostras:", 5, 100, 10)
         use_sampling = st.sidebar.checkbox("Usar amostragem para performance", value=True)
 
-    # Aplicar filtros
-    df_filtered = df[
-        (df['Primary Type'].isin(selected_crimes)) &
-        (df['Year'].isin(selected_years)) &
-        (df['Month'].between(start_month, end_month))
-    ].copy()
-
-    # Remover linhas com coordenadas inválidas
-    df_filtered = df_filtered.dropna(subset=['Latitude', 'Longitude'])
-
-    # Filtrar coordenadas dentro de Chicago
-    chicago_bounds = {
-        'lat_min': 41.6, 'lat_max': 42.1,
-        'lng_min': -88.0, 'lng_max': -87.5
-    }
-
-    df_filtered = df_filtered[
-        (df_filtered['Latitude'].between(chicago_bounds['lat_min'], chicago_bounds['lat_max'])) &
-        (df_filtered['Longitude'].between(chicago_bounds['lng_min'], chicago_bounds['lng_max']))
-    ]
+    # Filtrar coordenadas dentro de Chicago (coordenadas ausentes ficam de fora)
+    consulta = CrimeQuery(
+        types=selected_crimes,
+        years=selected_years,
+        months=range(start_month, end_month + 1),
+        bbox=LIMITES_CHICAGO,
+    )
+    df_filtered = motor.dataframe(consulta)
 
     st.sidebar.info(f"📊 **Dados filtrados:** {len(df_filtered):,} registros")
 
@@ -123,23 +116,17 @@ def main():
         st.subheader("Mapa Interativo de Crimes")
         
         # Criar mapa base
-        chicago_center = [41.8781, -87.6298]
-        m = folium.Map(location=chicago_center, zoom_start=10)
+        m = mapa_base()
         
         # Amostrar para performance se necessário
-        if len(df_filtered) > 10000:
-            display_df = df_filtered.sample(n=10000, random_state=42)
+        display_df = amostrar_pontos(df_filtered)
+        if len(display_df) < len(df_filtered):
             st.info(f"📊 Mostrando 10.000 pontos de {len(df_filtered):,} totais para melhor performance")
-        else:
-            display_df = df_filtered
         
         # Adicionar pontos ao mapa baseado no tipo de análise
         if analysis_type == "Mapa de Calor":
             try:
-                from folium.plugins import HeatMap
-                heat_data = [[row['Latitude'], row['Longitude']] for idx, row in display_df.iterrows()]
-                if heat_data:
-                    HeatMap(heat_data, radius=10, blur=15, max_zoom=13).add_to(m)
+                if adicionar_mapa_calor(m, display_df):
                     st.success("✅ Mapa de calor gerado com sucesso!")
                 else:
                     st.warning("⚠️ Nenhum dado válido para gerar mapa de calor")
@@ -149,62 +136,14 @@ def main():
         elif analysis_type == "Clusters DBSCAN":
             try:
                 # Aplicar DBSCAN diretamente no mapa
-                coords = display_df[['Latitude', 'Longitude']].values
-                
-                if len(coords) > 0:
-                    # Normalizar coordenadas para DBSCAN
-                    coords_normalized = (coords - coords.mean(axis=0)) / coords.std(axis=0)
-                    dbscan = DBSCAN(eps=eps_value, min_samples=min_samples_value)
-                    clusters = dbscan.fit_predict(coords_normalized)
-                    
-                    # Cores para clusters
-                    colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'lightred', 'darkblue', 'lightblue', 'darkgreen']
-                    
-                    for idx, (lat, lng) in enumerate(coords):
-                        cluster_id = clusters[idx]
-                        if cluster_id != -1:  # Ignorar ruído
-                            color = colors[cluster_id % len(colors)]
-                            folium.CircleMarker(
-                                location=[lat, lng],
-                                radius=3,
-                                color=color,
-                                fill=True,
-                                fill_opacity=0.7,
-                                popup=f"Cluster: {cluster_id}"
-                            ).add_to(m)
-                    st.success(f"✅ {len(set(clusters)) - 1} clusters identificados")
+                clusters = adicionar_clusters(m, display_df, eps_value, min_samples_value)
+                if len(clusters) > 0:
+                    st.success(f"✅ {resumo_clusters(clusters)[0]} clusters identificados")
             except Exception as e:
                 st.error(f"❌ Erro no DBSCAN: {e}")
         
         else:  # Pontos individuais ou análise por distrito
-            # Usar cores diferentes para tipos de crime
-            crime_color_map = {
-                'THEFT': 'blue',
-                'BATTERY': 'red', 
-                'ASSAULT': 'orange',
-                'BURGLARY': 'green',
-                'ROBBERY': 'purple',
-                'NARCOTICS': 'darkred',
-                'CRIMINAL DAMAGE': 'gray'
-            }
-            
-            for idx, row in display_df.iterrows():
-                crime_type = row['Primary Type']
-                color = crime_color_map.get(crime_type, 'red')
-                
-                folium.CircleMarker(
-                    location=[row['Latitude'], row['Longitude']],
-                    radius=2,
-                    color=color,
-                    fill=True,
-                    fill_opacity=0.7,
-                    popup=f"""
-                    <b>Tipo:</b> {crime_type}<br>
-                    <b>Data:</b> {row['Date'].strftime('%d/%m/%Y') if pd.notna(row['Date']) else 'N/A'}<br>
-                    <b>Distrito:</b> {row.get('District', 'N/A')}<br>
-                    <b>Arrest:</b> {row.get('Arrest', 'N/A')}
-                    """
-                ).add_to(m)
+            adicionar_pontos(m, display_df)
         
         # Exibir mapa
         st.subheader("📍 Mapa Interativo")
@@ -227,7 +166,8 @@ def main():
             st.warning("⚠️ Coluna 'District' não encontrada nos dados.")
         else:
             # Análise por distrito
-            crime_counts_by_district = df_filtered['District'].value_counts().sort_values(ascending=False)
+            # Contagens da mesma consulta (respondidas pelo cubo)
+            crime_counts_by_district = motor.contar_por(consulta, 'District').sort_values(ascending=False)
             total_crimes = crime_counts_by_district.sum()
             crime_proportion_by_district = (crime_counts_by_district / total_crimes) * 100
             
@@ -287,27 +227,18 @@ def main():
                         return
                     
                     # Amostragem para performance
-                    if use_sampling and len(coords) > 50000:
-                        sample_indices = np.random.choice(len(coords), 50000, replace=False)
+                    if use_sampling and len(coords) > MAX_PONTOS_DBSCAN:
+                        sample_indices = np.random.choice(len(coords), MAX_PONTOS_DBSCAN, replace=False)
                         coords_sample = coords[sample_indices]
                         st.info(f"📊 Usando amostra de 50.000 pontos de {len(coords):,} totais")
                     else:
                         coords_sample = coords
                     
-                    # Normalização para DBSCAN
-                    coords_mean = coords_sample.mean(axis=0)
-                    coords_std = coords_sample.std(axis=0)
-                    coords_normalized = (coords_sample - coords_mean) / coords_std
-                    
-                    # Executar DBSCAN
-                    dbscan = DBSCAN(eps=eps_value, min_samples=min_samples_value)
-                    clusters = dbscan.fit_predict(coords_normalized)
+                    # Executar DBSCAN (coordenadas normalizadas)
+                    clusters = executar_dbscan(coords_sample, eps_value, min_samples_value)
                     
                     # Métricas
-                    unique_clusters = set(clusters)
-                    n_clusters = len(unique_clusters) - (1 if -1 in unique_clusters else 0)
-                    n_noise = list(clusters).count(-1)
-                    noise_percentage = (n_noise / len(clusters)) * 100
+                    n_clusters, n_noise, noise_percentage = resumo_clusters(clusters)
                     
                     # Display metrics
                     col1, col2, col3, col4 = st.columns(4)
@@ -343,21 +274,8 @@ def main():
                     if n_clusters > 0:
                         st.subheader("🔍 Análise Detalhada dos Clusters")
                         
-                        # Adicionar labels de cluster aos dados
-                        cluster_df = pd.DataFrame({
-                            'Latitude': coords_sample[:, 0],
-                            'Longitude': coords_sample[:, 1],
-                            'Cluster': clusters
-                        })
-                        
                         # Estatísticas por cluster
-                        cluster_stats = cluster_df[cluster_df['Cluster'] != -1].groupby('Cluster').agg({
-                            'Latitude': ['count', 'mean'],
-                            'Longitude': 'mean'
-                        }).round(4)
-                        
-                        cluster_stats.columns = ['N_Pontos', 'Latitude_Media', 'Longitude_Media']
-                        cluster_stats = cluster_stats.sort_values('N_Pontos', ascending=False)
+                        cluster_stats = estatisticas_clusters(coords_sample, clusters)
                         
                         st.markdown("**Estatísticas por Cluster:**")
                         st.dataframe(cluster_stats, width='stretch')
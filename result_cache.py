@@ -0,0 +1,93 @@
+# result_cache.py - Cache de resultados compartilhado pelo processo, limitado em bytes
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import RESULT_CACHE_BYTES
+
+
+def tamanho_bytes(objeto):
+    """Estimativa da memória ocupada por um resultado (DataFrame, Series, array ou coleção)"""
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(index=True, deep=True).sum())
+    if isinstance(objeto, (pd.Series, pd.Index)):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, (tuple, list)):
+        return sys.getsizeof(objeto) + sum(tamanho_bytes(item) for item in objeto)
+    return sys.getsizeof(objeto)
+
+
+class ResultCache:
+    """
+    Cache LRU de resultados (linhas filtradas, séries e agregados) compartilhado
+    por todas as sessões do processo. As entradas são chaveadas pela consulta
+    normalizada e o total de bytes é mantido abaixo do orçamento: ao inserir,
+    as entradas usadas há mais tempo são descartadas. Resultados maiores que o
+    orçamento não são guardados.
+    """
+
+    def __init__(self, orcamento_bytes=RESULT_CACHE_BYTES):
+        self.orcamento_bytes = orcamento_bytes
+        self._entradas = OrderedDict()   # chave -> (resultado, bytes)
+        self._trava = threading.Lock()
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave, calcular):
+        """Retorna o resultado da chave, calculando-o (fora da trava) se não estiver no cache"""
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada[0]
+            self.falhas += 1
+
+        resultado = calcular()
+        self.guardar(chave, resultado)
+        return resultado
+
+    def guardar(self, chave, resultado):
+        """Insere (ou substitui) um resultado, descartando os menos recentes além do orçamento"""
+        tamanho = tamanho_bytes(resultado)
+        if tamanho > self.orcamento_bytes:
+            return
+        with self._trava:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self.bytes_usados -= anterior[1]
+            self._entradas[chave] = (resultado, tamanho)
+            self.bytes_usados += tamanho
+            while self.bytes_usados > self.orcamento_bytes:
+                _, (_, tamanho_descartado) = self._entradas.popitem(last=False)
+                self.bytes_usados -= tamanho_descartado
+                self.descartes += 1
+
+    def limpar(self):
+        """Remove todas as entradas (os contadores são mantidos)"""
+        with self._trava:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def estatisticas(self):
+        """Contadores para o painel de diagnóstico"""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'bytes_usados': self.bytes_usados,
+                'orcamento_bytes': self.orcamento_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'descartes': self.descartes,
+            }
+
+
+# Instância única do processo
+CACHE_RESULTADOS = ResultCache()
@@ -0,0 +1,115 @@
+# spatial.py - Mapas (folium) e clusters (DBSCAN) da Análise Espacial
+import numpy as np
+import pandas as pd
+import folium
+from sklearn.cluster import DBSCAN
+
+CENTRO_CHICAGO = [41.8781, -87.6298]
+
+# Pontos desenhados no mapa e pontos usados pelo DBSCAN da aba de clusters
+MAX_PONTOS_MAPA = 10000
+MAX_PONTOS_DBSCAN = 50000
+
+# Cores para clusters
+CORES_CLUSTERS = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'lightred', 'darkblue', 'lightblue', 'darkgreen']
+
+# Cores diferentes para tipos de crime
+CORES_TIPOS_CRIME = {
+    'THEFT': 'blue',
+    'BATTERY': 'red',
+    'ASSAULT': 'orange',
+    'BURGLARY': 'green',
+    'ROBBERY': 'purple',
+    'NARCOTICS': 'darkred',
+    'CRIMINAL DAMAGE': 'gray'
+}
+
+
+def amostrar_pontos(df, limite=MAX_PONTOS_MAPA, random_state=42):
+    """Amostra de no máximo `limite` ocorrências para desenhar no mapa"""
+    if len(df) > limite:
+        return df.sample(n=limite, random_state=random_state)
+    return df
+
+
+def mapa_base():
+    """Mapa de Chicago sem camadas"""
+    return folium.Map(location=CENTRO_CHICAGO, zoom_start=10)
+
+
+def executar_dbscan(coords, eps, min_samples):
+    """DBSCAN sobre coordenadas (lat, lng) normalizadas; retorna o rótulo de cada ponto (-1 = ruído)"""
+    coords_normalized = (coords - coords.mean(axis=0)) / coords.std(axis=0)
+    return DBSCAN(eps=eps, min_samples=min_samples).fit_predict(coords_normalized)
+
+
+def resumo_clusters(clusters):
+    """Número de clusters, pontos de ruído e percentual de ruído"""
+    unique_clusters = set(clusters)
+    n_clusters = len(unique_clusters) - (1 if -1 in unique_clusters else 0)
+    n_noise = int(np.count_nonzero(clusters == -1))
+    return n_clusters, n_noise, (n_noise / len(clusters)) * 100
+
+
+def estatisticas_clusters(coords, clusters):
+    """Número de pontos e centro de cada cluster (sem ruído), do maior para o menor"""
+    cluster_df = pd.DataFrame({
+        'Latitude': coords[:, 0],
+        'Longitude': coords[:, 1],
+        'Cluster': clusters
+    })
+    cluster_stats = cluster_df[cluster_df['Cluster'] != -1].groupby('Cluster').agg({
+        'Latitude': ['count', 'mean'],
+        'Longitude': 'mean'
+    }).round(4)
+    cluster_stats.columns = ['N_Pontos', 'Latitude_Media', 'Longitude_Media']
+    return cluster_stats.sort_values('N_Pontos', ascending=False)
+
+
+def adicionar_mapa_calor(mapa, df):
+    """Camada de mapa de calor; retorna o número de pontos usados"""
+    from folium.plugins import HeatMap
+    heat_data = df[['Latitude', 'Longitude']].to_numpy().tolist()
+    if heat_data:
+        HeatMap(heat_data, radius=10, blur=15, max_zoom=13).add_to(mapa)
+    return len(heat_data)
+
+
+def adicionar_clusters(mapa, df, eps, min_samples):
+    """Marcadores coloridos por cluster DBSCAN (ruído omitido); retorna os rótulos"""
+    coords = df[['Latitude', 'Longitude']].to_numpy()
+    if len(coords) == 0:
+        return np.zeros(0, dtype=int)
+    clusters = executar_dbscan(coords, eps, min_samples)
+    for (lat, lng), cluster_id in zip(coords, clusters):
+        if cluster_id != -1:  # Ignorar ruído
+            folium.CircleMarker(
+                location=[lat, lng],
+                radius=3,
+                color=CORES_CLUSTERS[cluster_id % len(CORES_CLUSTERS)],
+                fill=True,
+                fill_opacity=0.7,
+                popup=f"Cluster: {cluster_id}"
+            ).add_to(mapa)
+    return clusters
+
+
+def adicionar_pontos(mapa, df):
+    """Um marcador por ocorrência, colorido pelo tipo de crime"""
+    distritos = df['District'] if 'District' in df.columns else pd.Series('N/A', index=df.index)
+    prisoes = df['Arrest'] if 'Arrest' in df.columns else pd.Series('N/A', index=df.index)
+    for lat, lng, crime_type, data, distrito, prisao in zip(
+            df['Latitude'], df['Longitude'], df['Primary Type'], df['Date'], distritos, prisoes):
+        folium.CircleMarker(
+            location=[lat, lng],
+            radius=2,
+            color=CORES_TIPOS_CRIME.get(crime_type, 'red'),
+            fill=True,
+            fill_opacity=0.7,
+            popup=f"""
+            <b>Tipo:</b> {crime_type}<br>
+            <b>Data:</b> {data.strftime('%d/%m/%Y') if pd.notna(data) else 'N/A'}<br>
+            <b>Distrito:</b> {distrito}<br>
+            <b>Arrest:</b> {prisao}
+            """
+        ).add_to(mapa)
@@ -0,0 +1,116 @@
+# stats_summary.py - Resumos estatísticos combináveis das séries diárias de ocorrências
+import numpy as np
+from result_cache import CACHE_RESULTADOS
+
+
+class ResumoDiario:
+    """
+    Resumo de uma série de contagens diárias que pode ser combinado com outros
+    resumos de dias disjuntos: número de dias, soma, M2 (soma dos quadrados dos
+    desvios), mínimo, máximo e o histograma exato das contagens (contagens são
+    inteiros pequenos, então o histograma serve como sketch de quantis sem erro).
+    """
+
+    def __init__(self, n=0, soma=0, m2=0.0, minimo=None, maximo=None, histograma=None):
+        self.n = n
+        self.soma = soma
+        self.m2 = m2
+        self.minimo = minimo
+        self.maximo = maximo
+        self.histograma = np.zeros(0, dtype=np.int64) if histograma is None else histograma
+
+    @classmethod
+    def de_valores(cls, valores):
+        """Resumo de um array de contagens diárias"""
+        valores = np.asarray(valores, dtype=np.int64)
+        if len(valores) == 0:
+            return cls()
+        media = valores.mean()
+        return cls(
+            n=len(valores),
+            soma=int(valores.sum()),
+            m2=float(((valores - media) ** 2).sum()),
+            minimo=int(valores.min()),
+            maximo=int(valores.max()),
+            histograma=np.bincount(valores),
+        )
+
+    def combinar(self, outro):
+        """Resumo da união dos dias dos dois resumos (M2 pela fórmula de Chan et al.)"""
+        if outro.n == 0:
+            return self
+        if self.n == 0:
+            return outro
+        n = self.n + outro.n
+        delta = outro.media - self.media
+        tamanho = max(len(self.histograma), len(outro.histograma))
+        histograma = np.zeros(tamanho, dtype=np.int64)
+        histograma[:len(self.histograma)] += self.histograma
+        histograma[:len(outro.histograma)] += outro.histograma
+        return ResumoDiario(
+            n=n,
+            soma=self.soma + outro.soma,
+            m2=self.m2 + outro.m2 + delta ** 2 * self.n * outro.n / n,
+            minimo=min(self.minimo, outro.minimo),
+            maximo=max(self.maximo, outro.maximo),
+            histograma=histograma,
+        )
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.histograma.nbytes
+
+    @property
+    def media(self):
+        return self.soma / self.n if self.n else float('nan')
+
+    @property
+    def desvio_padrao(self):
+        """Desvio padrão amostral (ddof=1, como no pandas)"""
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else float('nan')
+
+    def quantil(self, q):
+        """Quantil com interpolação linear (mesmo resultado de Series.quantile)"""
+        if self.n == 0:
+            return float('nan')
+        acumulado = np.cumsum(self.histograma)
+        posicao = (self.n - 1) * q
+        inferior = int(np.floor(posicao))
+        # k-ésimo menor valor = primeiro valor cujo acumulado passa de k
+        valor_inferior = np.searchsorted(acumulado, inferior, side='right')
+        valor_superior = np.searchsorted(acumulado, min(inferior + 1, self.n - 1), side='right')
+        return float(valor_inferior + (posicao - inferior) * (valor_superior - valor_inferior))
+
+    @property
+    def mediana(self):
+        return self.quantil(0.5)
+
+    def faixas(self, nbins):
+        """Histograma em nbins faixas iguais entre mínimo e máximo: (centros, frequências)"""
+        if self.n == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        valores = np.arange(self.minimo, self.maximo + 1)
+        frequencias, bordas = np.histogram(valores, bins=nbins, weights=self.histograma[self.minimo:])
+        return (bordas[:-1] + bordas[1:]) / 2, frequencias.astype(np.int64)
+
+
+def _resumo_ano(cubo, tipos, ano):
+    """Resumo dos dias de um ano para uma seleção de tipos (guardado no cache de resultados)"""
+    def calcular():
+        celulas = cubo.filtrar({'Primary Type': tipos, 'Year': [ano]})
+        return ResumoDiario.de_valores(cubo.serie_diaria(celulas)['y'].to_numpy())
+    return CACHE_RESULTADOS.obter(('resumo_ano', cubo, tipos, ano), calcular)
+
+
+def resumo_diario(cubo, tipos, anos):
+    """
+    Estatísticas das contagens diárias (somando os tipos selecionados) nos anos
+    escolhidos, combinando os resumos de cada ano calculados uma única vez.
+    Os resumos são combináveis entre anos (dias disjuntos), mas não entre tipos:
+    a soma diária de vários tipos depende de como eles coincidem no mesmo dia,
+    por isso cada seleção de tipos tem os próprios resumos por ano.
+    """
+    tipos = tuple(sorted(tipos))
+    resumo = ResumoDiario()
+    for ano in sorted(set(anos)):
+        resumo = resumo.combinar(_resumo_ano(cubo, tipos, int(ano)))
+    return resumo
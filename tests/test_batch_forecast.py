@@ -0,0 +1,104 @@
+# test_batch_forecast.py - Tempo máximo por modelo na previsão em lote
+import os
+import glob
+import time
+import numpy as np
+import pandas as pd
+import pytest
+import batch_forecast
+from crime_cube import CuboCrimes
+
+prophet = pytest.importorskip('prophet')
+
+
+def _processos_filhos_ativos():
+    """Processos filhos deste processo que ainda estão rodando (zumbis não contam)"""
+    ativos = []
+    for arquivo in glob.glob('/proc/self/task/*/children'):
+        with open(arquivo) as filhos:
+            for pid in filhos.read().split():
+                try:
+                    with open(f'/proc/{pid}/stat') as stat:
+                        estado = stat.read().rsplit(')', 1)[1].split()[0]
+                except OSError:
+                    continue
+                if estado != 'Z':
+                    ativos.append(int(pid))
+    return ativos
+
+
+@pytest.fixture
+def cubo_sintetico(monkeypatch):
+    """Cubo de um único tipo de crime com contagens diárias de 1990 a 2022 (ajuste do Prophet leva alguns segundos)"""
+    dias = pd.date_range('1990-01-01', '2022-12-31', freq='D')
+    contagens = np.random.default_rng(0).poisson(20, len(dias))
+    datas = dias.repeat(contagens)
+    df = pd.DataFrame({
+        'EpochDay': (datas - pd.Timestamp('1970-01-01')).days,
+        'Year': datas.year,
+        'Hour': 12,
+        'Primary Type': 'THEFT',
+        'District': 1,
+        'Arrest': False,
+    })
+    monkeypatch.setattr(batch_forecast, '_cubo_processo', CuboCrimes.construir(df))
+    # Sem repositório: sempre ajuste a frio, sem warm start que encurte o ajuste
+    monkeypatch.setattr(batch_forecast, 'MODELOS', None)
+
+
+@pytest.mark.skipif(not glob.glob('/proc/self/task/*/children'), reason="requer /proc")
+def test_timeout_do_prophet_encerra_o_cmdstan(cubo_sintetico):
+    """Estouro do tempo durante o ajuste: tarefa marcada como timeout e nenhum CmdStan rodando depois
+
+    Aqui o CmdStan roda mais ou menos entre 1,1 s e 2,2 s da tarefa; o limite cai no meio do ajuste.
+    """
+    parametros = batch_forecast.PARAMETROS_PADRAO['Prophet']
+    linha, previsoes = batch_forecast.prever_tarefa('Prophet', 'THEFT', None, list(range(1990, 2022)), 2022,
+                                                    parametros, timeout=1.6)
+
+    assert linha['status'] == 'timeout'
+    assert previsoes is None
+    # O cmdstanpy encerra o processo quando o tempo restante passado ao ajuste acaba, junto com o alarme;
+    # sem isso o CmdStan seguiria até terminar o ajuste
+    limite = time.time() + 2
+    while _processos_filhos_ativos() and time.time() < limite:
+        time.sleep(0.1)
+    assert _processos_filhos_ativos() == []
+
+
+def _tarefa_falsa(modelo, crime, distrito, train_years, test_year, parametros, timeout=None):
+    """Substitui prever_tarefa nos processos do pool; `derrubar` mata o processo no meio da tarefa"""
+    if parametros.get('derrubar'):
+        time.sleep(0.5)
+        os._exit(1)
+    linha = {**batch_forecast._identificacao(modelo, crime, distrito, train_years, test_year), 'status': 'ok'}
+    return linha, None
+
+
+def test_processo_morto_nao_perde_as_tarefas_concluidas(monkeypatch):
+    """Pool quebrado no meio das cadeias: o que terminou fica e o resto sai com status erro"""
+    monkeypatch.setattr(batch_forecast, 'prever_tarefa', _tarefa_falsa)
+
+    def tarefa(ano, **parametros):
+        return {'modelo': 'Prophet', 'crime': 'THEFT', 'distrito': None, 'train_years': [ano - 1],
+                'test_year': ano, 'parametros': parametros}
+
+    cadeias = [[tarefa(2015), tarefa(2016, derrubar=True), tarefa(2017)],
+               [tarefa(2015), tarefa(2016)]]
+    linhas, previsoes = batch_forecast.executar_cadeias(cadeias, workers=2)
+
+    assert previsoes == []
+    assert len(linhas) == 5
+    status = [(linha['ano_teste'], linha['status']) for linha in linhas]
+    assert status.count((2015, 'ok')) == 2
+    assert (2016, 'ok') in status
+    assert sorted(ano for ano, situacao in status if situacao == 'erro') == [2016, 2017]
+
+
+def test_rotulo_da_economia_do_warm_start():
+    """"medido" só quando todos os modelos aquecidos mediram a economia"""
+    assert batch_forecast.rotulo_economia(False) == 'medido'
+    assert batch_forecast.rotulo_economia(True) == 'estimativa'
+    assert batch_forecast.rotulo_economia(None) == 'estimativa'
+    assert batch_forecast.rotulo_economia(pd.Series([False, False])) == 'medido'
+    assert batch_forecast.rotulo_economia(pd.Series([False, None])) == 'estimativa'
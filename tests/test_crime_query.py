@@ -0,0 +1,39 @@
+# test_crime_query.py - Consultas e chaves do cache de resultados
+import numpy as np
+import pandas as pd
+import crime_query
+from crime_query import CrimeQuery, MotorConsultas
+from result_cache import ResultCache
+
+
+def dataset(anos, n):
+    rng = np.random.default_rng(n)
+    return pd.DataFrame({
+        'Year': rng.choice(anos, n),
+        'Primary Type': pd.Categorical(rng.choice(['THEFT', 'BATTERY'], n)),
+        'EpochDay': rng.integers(17000, 18000, n),
+    })
+
+
+def test_datasets_diferentes_nao_compartilham_resultados(monkeypatch):
+    """Dois motores da mesma classe com chaves diferentes: cada um calcula os próprios resultados"""
+    monkeypatch.setattr(crime_query, 'CACHE_RESULTADOS', ResultCache(orcamento_bytes=10 ** 7))
+    df_a, df_b = dataset([2019, 2020], 500), dataset([2020, 2021], 800)
+    motor_a = MotorConsultas(df_a, chave=('dados', (2019, 2020), 500))
+    motor_b = MotorConsultas(df_b, chave=('dados', (2020, 2021), 800))
+    consulta = CrimeQuery(years=[2020], types=['THEFT'])
+
+    esperado_a = np.flatnonzero((df_a['Year'] == 2020) & (df_a['Primary Type'] == 'THEFT'))
+    esperado_b = np.flatnonzero((df_b['Year'] == 2020) & (df_b['Primary Type'] == 'THEFT'))
+    np.testing.assert_array_equal(motor_a.linhas(consulta), esperado_a)
+    np.testing.assert_array_equal(motor_b.linhas(consulta), esperado_b)
+    assert motor_a.total(consulta) == len(esperado_a)
+    assert motor_b.total(consulta) == len(esperado_b)
+    assert motor_a.serie_diaria(consulta)['y'].sum() == len(esperado_a)
+    assert motor_b.serie_diaria(consulta)['y'].sum() == len(esperado_b)
+
+    # Mesma chave (mesmo dataset recarregado): o resultado vem do cache
+    outro_a = MotorConsultas(df_a.copy(), chave=('dados', (2019, 2020), 500))
+    acertos = crime_query.CACHE_RESULTADOS.acertos
+    np.testing.assert_array_equal(outro_a.linhas(consulta), esperado_a)
+    assert crime_query.CACHE_RESULTADOS.acertos == acertos + 1
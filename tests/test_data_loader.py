@@ -0,0 +1,32 @@
+# test_data_loader.py - Conversão dos CSVs de data_splits em blocos
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import data_loader
+
+
+def test_converter_csv_codigo_muda_de_tipo_entre_blocos(tmp_path, monkeypatch):
+    """IUCR/FBI Code numéricos em um bloco e texto no seguinte: o arquivo inteiro entra no cache"""
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', str(tmp_path / 'cache'))
+    metade = 3000
+    pd.DataFrame({
+        'ID': np.arange(2 * metade),
+        'Date': '01/05/2014 03:15:00 PM',
+        'IUCR': ['0820'] * metade + ['041A'] * metade,
+        'Primary Type': ['THEFT'] * metade + [None] * metade,
+        'Arrest': ['true', 'false'] * metade,
+        'District': [1.0] * metade + [np.nan] * metade,
+        'FBI Code': ['06'] * metade + ['08B'] * metade,
+        'X Coordinate': [1] * metade + [np.nan] * metade,
+        'Location': [np.nan] * metade + ['(41.8, -87.6)'] * metade,
+        'Year': 2014,
+    }).to_csv(tmp_path / 'chicago_crimes_2014_2015.csv', index=False)
+
+    arquivo_csv = str(tmp_path / 'chicago_crimes_2014_2015.csv')
+    df, _, total_linhas = data_loader.converter_csv(arquivo_csv, chunk_rows=2000)
+
+    assert total_linhas == len(df) == 2 * metade
+    cache = pq.read_table(data_loader.caminho_cache(arquivo_csv)).to_pandas()
+    assert len(cache) == 2 * metade
+    assert cache['IUCR'].iloc[-1] == '041A'
+    assert cache['FBI Code'].iloc[0] == '06'
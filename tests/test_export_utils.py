@@ -0,0 +1,30 @@
+# test_export_utils.py - Exportação em blocos da seleção
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import export_utils
+from paged_query import ConsultaPaginada
+
+
+def test_exportar_parquet_coluna_so_com_nulos_no_primeiro_bloco(tmp_path, monkeypatch):
+    """Location vazia nas primeiras linhas e preenchida depois: todos os blocos entram no arquivo"""
+    monkeypatch.setattr(export_utils, 'EXPORT_DIR', str(tmp_path))
+    df = pd.DataFrame({
+        'ID': np.arange(6),
+        'Primary Type': pd.Categorical(['THEFT', 'BATTERY', None, 'THEFT', 'ARSON', 'BATTERY']),
+        'Location': [None, None, None, '(41.8, -87.6)', None, '(41.9, -87.7)'],
+        'Date': pd.date_range('2020-01-01', periods=6, freq='h'),
+    })
+
+    caminho = export_utils.exportar_consulta(ConsultaPaginada(df), 'Parquet', chunk_rows=2)
+    try:
+        arquivo = pq.ParquetFile(caminho)
+        assert arquivo.num_row_groups == 3
+        lido = arquivo.read().to_pandas()
+        assert lido['Location'].tolist() == df['Location'].tolist()
+        assert lido['Primary Type'].astype(str).tolist() == df['Primary Type'].astype(str).tolist()
+        pd.testing.assert_series_equal(lido['Date'], df['Date'])
+    finally:
+        export_utils.remover_exportacao(caminho)
+    assert not os.path.exists(caminho)
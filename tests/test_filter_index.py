@@ -0,0 +1,68 @@
+# test_filter_index.py - Avaliação incremental dos filtros da barra lateral
+import numpy as np
+import pandas as pd
+import pytest
+from crime_cube import CuboCrimes
+from filter_index import FiltroIncremental, IndiceFiltros
+
+# (seleções, avaliação esperada): cada passo parte do resultado do anterior
+PASSOS = [
+    ({'Year': [2019, 2020, 2021], 'Primary Type': ['THEFT', 'BATTERY', 'ASSAULT'], 'District': None},
+     'completa'),
+    ({'Year': [2019, 2020], 'Primary Type': ['THEFT', 'BATTERY', 'ASSAULT'], 'District': None}, 'reduzida'),
+    ({'Year': [2019, 2020, 2022], 'Primary Type': ['THEFT', 'BATTERY', 'ASSAULT'], 'District': None},
+     'ampliada'),
+    ({'Year': [2019, 2020, 2022], 'Primary Type': ['THEFT', 'BATTERY', 'ASSAULT'], 'District': None},
+     'reaproveitada'),
+    ({'Year': [2021], 'Primary Type': ['THEFT', 'NARCOTICS'], 'District': None}, 'completa'),
+    ({'Year': [2021], 'Primary Type': ['THEFT', 'NARCOTICS'], 'District': [1, 2]}, 'completa'),
+    ({'Year': [2021], 'Primary Type': ['THEFT', 'NARCOTICS', 'BATTERY'], 'District': [1, 2]}, 'ampliada'),
+    ({'Year': [2021], 'Primary Type': ['THEFT', 'NARCOTICS', 'BATTERY'], 'District': [2]}, 'reduzida'),
+]
+
+
+@pytest.fixture(scope='module')
+def df():
+    rng = np.random.default_rng(0)
+    n = 20000
+    datas = pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit='D')
+    tipos = np.array(['THEFT', 'BATTERY', 'ASSAULT', 'NARCOTICS', None], dtype=object)
+    return pd.DataFrame({
+        'EpochDay': (datas - pd.Timestamp('1970-01-01')).days,
+        'Year': datas.year,
+        'Month': datas.month,
+        'Hour': rng.integers(0, 24, n),
+        'Primary Type': pd.Categorical(tipos[rng.integers(0, len(tipos), n)]),
+        'District': pd.array(rng.choice([1, 2, 3, None], n), dtype='Int16'),
+        'Arrest': rng.random(n) < 0.2,
+    })
+
+
+def mascara_pandas(df, selecoes):
+    """Referência: máscara booleana com isin coluna a coluna"""
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valores in selecoes.items():
+        if valores is not None:
+            mascara &= df[coluna].isin(valores).to_numpy(dtype=bool, na_value=False)
+    return mascara
+
+
+def test_filtro_incremental_sobre_o_indice(df):
+    """Redução, ampliação e troca de ano e tipo: mesmas linhas que a máscara do pandas"""
+    indice = IndiceFiltros(df)
+    filtro = FiltroIncremental(indice)
+    for selecoes, avaliacao in PASSOS:
+        resultado = filtro.avaliar(selecoes)
+        assert filtro.ultima_avaliacao == avaliacao
+        np.testing.assert_array_equal(indice.linhas(resultado), np.flatnonzero(mascara_pandas(df, selecoes)))
+        assert indice.contar(resultado) == mascara_pandas(df, selecoes).sum()
+
+
+def test_filtro_incremental_sobre_o_cubo(df):
+    """Mesmos passos sobre o cubo: o total das células selecionadas é o número de linhas da máscara"""
+    cubo = CuboCrimes.construir(df)
+    filtro = FiltroIncremental(cubo)
+    for selecoes, avaliacao in PASSOS:
+        resultado = filtro.avaliar(selecoes)
+        assert filtro.ultima_avaliacao == avaliacao
+        assert cubo.total(resultado) == mascara_pandas(df, selecoes).sum()
@@ -0,0 +1,83 @@
+# test_forecasting.py - Features diárias do Random Forest e warm start dos modelos
+import holidays
+import numpy as np
+import pandas as pd
+import pytest
+from forecasting import (dividir_treino_teste, matriz_features, nomes_features, preparar_features_rf,
+                         prever_prophet, prever_random_forest)
+from model_store import ModelStore
+
+
+def features_referencia(df, lags_dias):
+    """Construção original das features, coluna a coluna com o pandas (df indexado por dia, coluna y)"""
+    indice = df.index
+    feriados = holidays.US()
+    features = {
+        'day_of_week': indice.dayofweek,
+        'day_of_month': indice.day,
+        'month': indice.month,
+        'year': indice.year,
+        'quarter': indice.quarter,
+        'week_of_year': indice.isocalendar().week.astype(int),
+        'is_weekend': (indice.dayofweek >= 5).astype(int),
+        'is_holiday': [data in feriados for data in indice],
+        'season': indice.month.map({12: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1, 6: 2, 7: 2, 8: 2, 9: 3, 10: 3, 11: 3}),
+        'is_year_end': indice.month.isin([11, 12]).astype(int),
+    }
+    for lag in range(1, lags_dias + 1):
+        features[f'lag_{lag}d'] = df['y'].shift(lag)
+    features['rolling_mean_7d'] = df['y'].rolling(window=7, min_periods=1).mean()
+    features['rolling_mean_30d'] = df['y'].rolling(window=30, min_periods=1).mean()
+    features = pd.DataFrame(features, index=indice)
+    return features.astype(np.float64)
+
+
+@pytest.mark.parametrize('lags_dias', [0, 1, 30, 90])
+def test_matriz_features_igual_a_construcao_com_pandas(lags_dias):
+    """Mesmas colunas e valores (a menos do float32) que a construção original, inclusive os NaN dos lags"""
+    datas = pd.date_range('2018-11-20', '2021-01-10', freq='D')
+    y = np.random.default_rng(lags_dias).poisson(50, len(datas)).astype(float)
+    esperado = features_referencia(pd.DataFrame({'y': y}, index=datas), lags_dias)
+
+    X = matriz_features(datas, y, lags_dias)
+
+    assert X.dtype == np.float32 and X.flags['C_CONTIGUOUS']
+    assert nomes_features(lags_dias) == list(esperado.columns)
+    np.testing.assert_allclose(X, esperado.to_numpy(), rtol=1e-6, equal_nan=True)
+
+
+def test_matriz_features_serie_vazia():
+    X = matriz_features(pd.DatetimeIndex([]), np.zeros(0), 30)
+    assert X.shape == (0, len(nomes_features(30)))
+
+
+def serie_diaria(inicio, fim):
+    datas = pd.date_range(inicio, fim, freq='D')
+    y = np.random.default_rng(0).poisson(50, len(datas)).astype(float)
+    return pd.DataFrame({'ds': datas, 'y': y})
+
+
+def test_economia_do_warm_start_random_forest_e_medida(tmp_path):
+    """Árvores acrescentadas a um modelo salvo: o tempo do zero sai do tempo medido das novas"""
+    repositorio = ModelStore(str(tmp_path))
+    treino, teste, corte = dividir_treino_teste(serie_diaria('2019-01-01', '2021-12-31'), [2019, 2020])
+    train, test, _ = preparar_features_rf(treino, teste, corte, 14)
+    prever_random_forest(train, test, 20, 14, repositorio=repositorio, n_jobs=1)
+    _, _, info = prever_random_forest(train, test, 40, 14, repositorio=repositorio, n_jobs=1)
+
+    assert 'aquecimento' in info
+    assert info['economia_estimada'] is False
+    assert info['segundos_economizados'] == pytest.approx(info['segundos_frio'] - info['segundos_ajuste'])
+
+
+def test_economia_do_warm_start_prophet_e_estimada(tmp_path):
+    """Prophet partindo de um modelo salvo: o tempo do zero é extrapolado do modelo salvo (estimativa)"""
+    pytest.importorskip('prophet')
+    repositorio = ModelStore(str(tmp_path))
+    serie = serie_diaria('2019-01-01', '2021-12-31')
+    for anos in ([2019], [2019, 2020]):
+        treino, teste, _ = dividir_treino_teste(serie[serie['ds'].dt.year <= max(anos) + 1], anos)
+        _, _, info = prever_prophet(treino, teste, repositorio=repositorio, crime='THEFT', distrito=None)
+
+    assert 'aquecimento' in info
+    assert info['economia_estimada'] is True
@@ -0,0 +1,80 @@
+# test_result_cache.py - Cache LRU de resultados limitado em bytes
+import numpy as np
+from result_cache import ResultCache
+
+
+def bloco(n):
+    """Resultado de exatamente n bytes"""
+    return np.zeros(n, dtype=np.uint8)
+
+
+class Calculo:
+    """calcular de ResultCache.obter que conta quantas vezes foi chamado"""
+
+    def __init__(self, resultado):
+        self.resultado = resultado
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        return self.resultado
+
+
+def test_descarta_o_menos_recente_alem_do_orcamento():
+    """Orçamento para duas entradas: a terceira descarta a usada há mais tempo"""
+    cache = ResultCache(orcamento_bytes=250)
+    a, b, c = Calculo(bloco(100)), Calculo(bloco(100)), Calculo(bloco(100))
+    cache.obter('a', a)
+    cache.obter('b', b)
+    cache.obter('a', a)     # 'a' passa a ser a mais recente
+    cache.obter('c', c)     # descarta 'b'
+
+    assert cache.estatisticas()['entradas'] == 2
+    assert cache.bytes_usados == 200
+    assert cache.descartes == 1
+    cache.obter('a', a)
+    cache.obter('c', c)
+    assert (a.chamadas, c.chamadas) == (1, 1)
+    cache.obter('b', b)     # recalculada; agora descarta 'a'
+    assert b.chamadas == 2
+    assert cache.descartes == 2
+    cache.obter('a', a)
+    assert a.chamadas == 2
+
+
+def test_resultado_maior_que_o_orcamento_nao_e_guardado():
+    """Resultado acima do orçamento é devolvido, mas não entra nem descarta as demais entradas"""
+    cache = ResultCache(orcamento_bytes=250)
+    pequeno, grande = Calculo(bloco(100)), Calculo(bloco(300))
+    cache.obter('pequeno', pequeno)
+
+    assert cache.obter('grande', grande) is grande.resultado
+    cache.obter('grande', grande)
+    assert grande.chamadas == 2
+    assert cache.estatisticas()['entradas'] == 1
+    assert cache.bytes_usados == 100
+    assert cache.descartes == 0
+
+    # Substituir uma chave desconta o tamanho anterior
+    cache.guardar('pequeno', bloco(150))
+    assert cache.bytes_usados == 150
+
+
+def test_contadores_de_acertos_e_falhas():
+    """Acertos, falhas e taxa; limpar remove as entradas e mantém os contadores"""
+    cache = ResultCache(orcamento_bytes=1000)
+    calculo = Calculo(bloco(10))
+    for chave in ('x', 'x', 'y', 'x'):
+        cache.obter(chave, calculo)
+
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (2, 2)
+    assert estatisticas['taxa_acerto'] == 0.5
+    assert estatisticas['bytes_usados'] == 20
+
+    cache.limpar()
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['entradas'], estatisticas['bytes_usados']) == (0, 0)
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (2, 2)
+    cache.obter('x', calculo)
+    assert calculo.chamadas == 3
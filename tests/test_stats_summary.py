@@ -0,0 +1,70 @@
+# test_stats_summary.py - Resumos combináveis das contagens diárias
+import numpy as np
+import pandas as pd
+import pytest
+from crime_cube import CuboCrimes
+from stats_summary import ResumoDiario, resumo_diario
+
+
+def comparar_com_describe(resumo, valores):
+    """Estatísticas do resumo iguais às de Series.describe() sobre os mesmos valores"""
+    esperado = pd.Series(valores, dtype='int64').describe()
+    assert resumo.n == esperado['count']
+    assert resumo.media == pytest.approx(esperado['mean'])
+    assert resumo.desvio_padrao == pytest.approx(esperado['std'])
+    assert resumo.minimo == esperado['min']
+    assert resumo.quantil(0.25) == pytest.approx(esperado['25%'])
+    assert resumo.mediana == pytest.approx(esperado['50%'])
+    assert resumo.quantil(0.75) == pytest.approx(esperado['75%'])
+    assert resumo.maximo == esperado['max']
+
+
+def test_combinar_resumos_por_ano():
+    """Resumos de anos com médias e tamanhos diferentes combinados = describe da série inteira"""
+    rng = np.random.default_rng(0)
+    anos = [rng.poisson(media, dias) for media, dias in ((3, 365), (40, 366), (12, 200), (0.5, 31))]
+    resumo = ResumoDiario()
+    for valores in anos:
+        resumo = resumo.combinar(ResumoDiario.de_valores(valores))
+    comparar_com_describe(resumo, np.concatenate(anos))
+
+    centros, frequencias = resumo.faixas(10)
+    assert len(centros) == 10
+    assert frequencias.sum() == resumo.n
+
+
+def test_resumo_diario_do_cubo():
+    """resumo_diario sobre o cubo = contagem por dia dos tipos e anos selecionados no DataFrame"""
+    rng = np.random.default_rng(1)
+    n = 30000
+    datas = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, n), unit='D')
+    df = pd.DataFrame({
+        'EpochDay': (datas - pd.Timestamp('1970-01-01')).days,
+        'Year': datas.year,
+        'Hour': rng.integers(0, 24, n),
+        'Primary Type': pd.Categorical(rng.choice(['THEFT', 'BATTERY', 'ARSON'], n, p=[0.6, 0.38, 0.02])),
+        'District': pd.array(rng.integers(1, 4, n), dtype='Int16'),
+        'Arrest': rng.random(n) < 0.2,
+    })
+    cubo = CuboCrimes.construir(df)
+    tipos, anos = ['ARSON', 'BATTERY'], [2019, 2021]
+
+    selecao = df[df['Primary Type'].isin(tipos) & df['Year'].isin(anos)]
+    comparar_com_describe(resumo_diario(cubo, tipos, anos), selecao.groupby('EpochDay').size().to_numpy())
+
+
+def test_selecao_vazia():
+    """Sem dias: contagem zero, estatísticas NaN e faixas vazias; combinar com vazio não muda o resumo"""
+    vazio = ResumoDiario.de_valores([])
+    assert vazio.n == 0
+    assert np.isnan(vazio.media) and np.isnan(vazio.desvio_padrao) and np.isnan(vazio.mediana)
+    centros, frequencias = vazio.faixas(10)
+    assert len(centros) == len(frequencias) == 0
+
+    resumo = ResumoDiario.de_valores([4, 1, 7])
+    comparar_com_describe(vazio.combinar(resumo).combinar(ResumoDiario()), [4, 1, 7])
+
+    df = pd.DataFrame({'EpochDay': [18000, 18001], 'Year': 2019, 'Hour': 0,
+                       'Primary Type': pd.Categorical(['THEFT', 'THEFT']), 'District': 1, 'Arrest': False})
+    assert resumo_diario(CuboCrimes.construir(df), ['ARSON'], [2019]).n == 0
+    assert resumo_diario(CuboCrimes.construir(df), ['THEFT'], []).n == 0
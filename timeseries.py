@@ -0,0 +1,62 @@
+# timeseries.py - Séries temporais de ocorrências (diária, mensal, anual) a partir do cubo
+import numpy as np
+import pandas as pd
+from result_cache import CACHE_RESULTADOS
+
+GRANULARIDADES = ("Diária", "Mensal", "Anual")
+
+
+def assinatura_filtros(selecoes):
+    """Forma canônica (hashable) de um dict coluna -> valores aceitos; None não filtra"""
+    return tuple(sorted(
+        (coluna, tuple(sorted(valores)))
+        for coluna, valores in selecoes.items() if valores is not None
+    ))
+
+
+def serie_diaria(cubo, selecoes, preencher=False, celulas=None):
+    """
+    Ocorrências por dia (colunas ds, y) das células do cubo que atendem às seleções.
+    preencher: inclui com zero os dias sem ocorrências entre o primeiro e o último.
+    celulas: máscara do cubo já calculada para essas seleções (evita refiltrar).
+    O resultado fica no cache de resultados do processo, chaveado pela
+    assinatura dos filtros; cada chamada recebe uma cópia rasa, que pode
+    ganhar colunas sem alterar a série guardada.
+    """
+    def calcular():
+        return cubo.serie_diaria(cubo.filtrar(selecoes) if celulas is None else celulas, preencher=preencher)
+
+    chave = ('serie_diaria', cubo, assinatura_filtros(selecoes), preencher)
+    return CACHE_RESULTADOS.obter(chave, calcular).copy(deep=False)
+
+
+def agregar_serie(diaria, granularidade):
+    """
+    Agrega uma série diária (ds, y):
+    - "Diária": a própria série;
+    - "Mensal": um ponto por mês (último dia do mês), com zero nos meses sem ocorrências;
+    - "Anual": um ponto por ano com ocorrências (1º de janeiro).
+    """
+    if granularidade == "Diária" or diaria.empty:
+        return diaria
+
+    dias = diaria['ds'].to_numpy().astype('datetime64[D]')
+    y = diaria['y'].to_numpy()
+    if granularidade == "Mensal":
+        periodos = dias.astype('datetime64[M]').astype(np.int64)
+    else:
+        periodos = dias.astype('datetime64[Y]').astype(np.int64)
+
+    inicio = periodos.min()
+    totais = np.bincount(periodos - inicio, weights=y).astype(np.int64)
+    indices = np.arange(inicio, inicio + len(totais))
+
+    if granularidade == "Mensal":
+        # Último dia de cada mês
+        datas = (indices.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+    else:
+        manter = totais > 0
+        totais, indices = totais[manter], indices[manter]
+        datas = indices.astype('datetime64[Y]').astype('datetime64[D]')
+
+    return pd.DataFrame({'ds': pd.to_datetime(datas), 'y': totais})